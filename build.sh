@@ -10,6 +10,12 @@ pip install -r requirements.txt
 python manage.py collectstatic --no-input
 python manage.py migrate
 
+# サムネイルがない写真（追加前に登録されたもの）のサムネイルを作成する
+python manage.py generate_thumbnails
+
+# アルバムの公開写真の枚数と一覧用のカバーを計算する（追加前に作成されたアルバム用）
+python manage.py refresh_album_summaries
+
 # 本番環境用スーパーユーザーを作成
 echo "スーパーユーザーを作成中..."
 python create_superuser.py
@@ -5,12 +5,26 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+
+起動例（uvicorn ワーカーの gunicorn）:
+    gunicorn family_app.asgi:application -c family_app/gunicorn_asgi.py
+
+静的ファイルは WSGI と同じく WhiteNoiseMiddleware（本番設定）が配信する。
 """
 
 import os
+import warnings
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'family_app.settings')
+# ASGIでは読み取り中心のビューを非同期版にする（main/urls.py）
+os.environ.setdefault('ASYNC_VIEWS', 'true')
 
 from django.core.asgi import get_asgi_application
 
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'family_app.settings')
+# WhiteNoise の FileResponse は同期のイテレーターのため、ASGIでは静的ファイルごとに警告が出る
+# （Django がスレッドで読み出すので動作には問題ない）
+warnings.filterwarnings(
+    'ignore', message='StreamingHttpResponse must consume synchronous iterators', category=Warning,
+)
 
 application = get_asgi_application()
@@ -0,0 +1,26 @@
+"""
+gunicorn の設定（ASGI / uvicorn ワーカー）
+
+    gunicorn family_app.asgi:application -c family_app/gunicorn_asgi.py
+
+同期ワーカーは通信の遅いクライアントへの送受信の間もワーカーを占有するが、
+uvicorn ワーカーは待ち時間に他のリクエストを処理できる。
+"""
+
+import os
+import tempfile
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+worker_class = 'uvicorn.workers.UvicornWorker'
+workers = int(os.environ.get('WEB_CONCURRENCY', '2'))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '30'))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', '5'))
+# メモリの断片化を防ぐため、一定数のリクエストごとにワーカーを再起動する
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', '2000'))
+max_requests_jitter = max_requests // 10
+
+# ライブ更新（/live/）の通知をワーカー間で中継する（main.live）
+if workers > 1:
+    os.environ.setdefault(
+        'LIVE_UPDATES_SOCKET_DIR', os.path.join(tempfile.gettempdir(), 'family_live')
+    )
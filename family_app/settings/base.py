@@ -6,6 +6,8 @@ Base settings shared across all environments.
 from pathlib import Path
 import os
 
+from .database import sqlite_database, replica_databases
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
 
@@ -32,19 +34,23 @@ INSTALLED_APPS = DJANGO_APPS + LOCAL_APPS + THIRD_PARTY_APPS
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'main.middleware.RequestTimingMiddleware',
+    'main.middleware.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'main.middleware.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'family_app.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # 描画時間を計測する DjangoTemplates（main.middleware.RequestTimingMiddleware 用）
+        'BACKEND': 'main.utils.timing.TimedDjangoTemplates',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -63,12 +69,96 @@ WSGI_APPLICATION = 'family_app.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': sqlite_database(BASE_DIR / 'db.sqlite3'),
+    **replica_databases(),
 }
 
+# 読み込みをレプリカに振り分ける（レプリカ未設定時は全てdefault）
+DATABASE_ROUTERS = ['main.routers.ReplicaRouter']
+# 書き込み後、同じブラウザからの読み込みをプライマリに固定する秒数
+REPLICA_PIN_SECONDS = int(os.environ.get('REPLICA_PIN_SECONDS', '5'))
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# CACHE_BACKEND: locmem（デフォルト・プロセス単位） / file / redis
+# 複数ワーカー構成では無効化を全ワーカーで共有するため file か redis を使用してください
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'locmem')
+CACHE_TIMEOUT = int(os.environ.get('CACHE_TIMEOUT', '300'))
+
+if CACHE_BACKEND == 'file':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('CACHE_LOCATION', str(BASE_DIR / '.cache')),
+            'TIMEOUT': CACHE_TIMEOUT,
+            'OPTIONS': {
+                'MAX_ENTRIES': int(os.environ.get('CACHE_MAX_ENTRIES', '10000')),
+            },
+        }
+    }
+elif CACHE_BACKEND == 'redis':
+    # Redis互換サーバー（ローカルのredis-server / valkey等）
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ.get('CACHE_LOCATION', 'redis://127.0.0.1:6379/1'),
+            'TIMEOUT': CACHE_TIMEOUT,
+            'KEY_PREFIX': 'family_app',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'family-app',
+            'TIMEOUT': CACHE_TIMEOUT,
+            'OPTIONS': {
+                'MAX_ENTRIES': int(os.environ.get('CACHE_MAX_ENTRIES', '10000')),
+            },
+        }
+    }
+
+# 匿名ユーザー向けページキャッシュ（main.utils.cache.cache_public_page）
+PAGE_CACHE_ENABLED = os.environ.get('PAGE_CACHE_ENABLED', 'true').lower() == 'true'
+PAGE_CACHE_TIMEOUT = int(os.environ.get('PAGE_CACHE_TIMEOUT', '600'))
+
+# リクエストの計測（main.middleware.RequestTimingMiddleware）
+# SERVER_TIMING_HEADER: all（全員） / staff（スタッフのみ） / off
+# REQUEST_LOG_SLOW_MS: これ以上かかったリクエストだけを WARNING で記録する（他は DEBUG）
+SERVER_TIMING_HEADER = os.environ.get('SERVER_TIMING_HEADER', 'all')
+REQUEST_LOG_SLOW_MS = int(os.environ.get('REQUEST_LOG_SLOW_MS', '1000'))
+
+# プロファイリング（main.middleware.ProfilingMiddleware）
+# スタッフは ?_profile=1 または X-Profile: 1 で、任意のリクエストをプロファイルできる
+PROFILING_DIR = Path(os.environ.get('PROFILING_DIR', str(BASE_DIR / 'profiles')))
+PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', '0'))
+PROFILING_MAX_FILES = int(os.environ.get('PROFILING_MAX_FILES', '200'))
+
+# メトリクス（/metrics）
+# gunicorn など複数プロセスで動かす場合は METRICS_MULTIPROC_DIR を設定して全ワーカーの値を合算する
+METRICS_ALLOWED_IPS = os.environ.get('METRICS_ALLOWED_IPS', '127.0.0.1,::1').split(',')
+METRICS_MULTIPROC_DIR = os.environ.get('METRICS_MULTIPROC_DIR') or None
+METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', '1'))
+
+# アルバム詳細を仮想スクロールのグリッド（表示中の行だけをDOMに置く）にする写真の枚数
+VIRTUAL_GRID_MIN_PHOTOS = int(os.environ.get('VIRTUAL_GRID_MIN_PHOTOS', '200'))
+
+# ASGI（uvicorn ワーカー）で動かす場合に、読み取り中心のビューを非同期版（main.async_views）にする
+# family_app/asgi.py が既定で true にする
+ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS', 'false').lower() == 'true'
+
+# ライブ更新（Server-Sent Events、/live/ と main.live）
+# 接続を保持し続けるため、既定では ASGI（ASYNC_VIEWS）の場合だけ有効にする
+# 複数のワーカープロセスで動かす場合は LIVE_UPDATES_SOCKET_DIR を設定してプロセス間で中継する
+LIVE_UPDATES = os.environ.get('LIVE_UPDATES', str(ASYNC_VIEWS)).lower() == 'true'
+LIVE_UPDATES_SOCKET_DIR = os.environ.get('LIVE_UPDATES_SOCKET_DIR') or None
+LIVE_UPDATES_KEEPALIVE = float(os.environ.get('LIVE_UPDATES_KEEPALIVE', '15'))
+
+# 差分同期（/api/v1/sync/）で、未コミットかもしれない変更履歴の欠番を待つ秒数
+# 変更を記録してからコミットするまでにこれより長くかかるトランザクション（大きな import_family など）の
+# 実行中に同期したクライアントは、その変更を取りこぼすことがある（実行後に全件を取得し直す）
+SYNC_SAFETY_LAG = float(os.environ.get('SYNC_SAFETY_LAG', '60'))
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 AUTH_PASSWORD_VALIDATORS = [
@@ -0,0 +1,99 @@
+"""
+Database connection settings for family_app project.
+Builds DATABASES entries with connection tuning read from environment variables.
+"""
+
+import os
+
+
+def _env_bool(name, default):
+    return os.environ.get(name, str(default)).lower() in ('1', 'true', 'yes', 'on')
+
+
+def sqlite_database(path):
+    """
+    SQLite用の設定（接続時にPRAGMAを適用）
+
+    環境変数:
+        SQLITE_JOURNAL_MODE: ジャーナルモード（デフォルト: WAL。読み込みが書き込みを待たない）
+        SQLITE_SYNCHRONOUS: 同期モード（デフォルト: NORMAL。WALでは安全かつ高速）
+        SQLITE_MMAP_SIZE: メモリマップのサイズ（バイト、デフォルト: 256MB）
+        SQLITE_CACHE_SIZE: ページキャッシュ（負の値はKB、デフォルト: -20000 = 約20MB）
+        SQLITE_BUSY_TIMEOUT: ロック待ちの最大時間（ミリ秒、デフォルト: 5000）
+        SQLITE_TRANSACTION_MODE: トランザクション開始モード（デフォルト: IMMEDIATE）
+    """
+    pragmas = {
+        'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE', 'WAL'),
+        'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+        'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024))),
+        'cache_size': int(os.environ.get('SQLITE_CACHE_SIZE', '-20000')),
+        'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT', '5000')),
+        'temp_store': 'MEMORY',
+    }
+    return {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': path,
+        'OPTIONS': {
+            'init_command': ''.join(
+                f'PRAGMA {name}={value};' for name, value in pragmas.items()
+            ),
+            # busy_timeoutと同じ値をPythonのsqlite3側にも設定する（秒）
+            'timeout': pragmas['busy_timeout'] / 1000,
+            # 読み込みから書き込みへの昇格時のSQLITE_BUSYを避ける
+            'transaction_mode': os.environ.get('SQLITE_TRANSACTION_MODE', 'IMMEDIATE'),
+        },
+    }
+
+
+def postgres_database(url):
+    """
+    DATABASE_URL用の設定（持続的接続）
+
+    接続はワーカーのスレッドごとに DB_CONN_MAX_AGE 秒まで使い回す（gunicorn の同期ワーカーでは
+    ワーカー数がそのまま接続数になる）。ASGI（uvicorn）で動かす場合は、非同期ビューの
+    スレッドごとに接続が残らないよう DB_CONN_MAX_AGE=0 にし、接続の再利用が必要なら
+    PgBouncer などのプーラーを前に置く。
+
+    環境変数:
+        DB_CONN_MAX_AGE: 接続を使い回す秒数（デフォルト: 600、0で毎リクエスト接続）
+        DB_CONN_HEALTH_CHECKS: 使い回す前に接続を確認する（デフォルト: true）
+        DB_CONNECT_TIMEOUT: 接続タイムアウト（秒、デフォルト: 10）
+    """
+    import dj_database_url
+
+    database = dj_database_url.parse(
+        url,
+        conn_max_age=int(os.environ.get('DB_CONN_MAX_AGE', '600')),
+        conn_health_checks=_env_bool('DB_CONN_HEALTH_CHECKS', True),
+    )
+
+    options = database.setdefault('OPTIONS', {})
+    if database['ENGINE'] == 'django.db.backends.postgresql':
+        options.setdefault('connect_timeout', int(os.environ.get('DB_CONNECT_TIMEOUT', '10')))
+    return database
+
+
+def replica_databases():
+    """
+    読み込み専用レプリカの設定（main.routers.ReplicaRouter が使用）
+
+    環境変数:
+        SQLITE_REPLICA_PATHS: SQLiteのレプリカファイル（カンマ区切り）。
+            ローカル検証用で、manage.py sync_replicas でプライマリから複製する
+        DATABASE_REPLICA_URLS: レプリカのデータベースURL（カンマ区切り）
+
+    Returns:
+        dict: エイリアス（replica1, replica2, ...） -> 設定
+    """
+    replicas = []
+    for path in filter(None, os.environ.get('SQLITE_REPLICA_PATHS', '').split(',')):
+        replicas.append(sqlite_database(path.strip()))
+    for url in filter(None, os.environ.get('DATABASE_REPLICA_URLS', '').split(',')):
+        replicas.append(postgres_database(url.strip()))
+
+    databases = {}
+    for index, database in enumerate(replicas, start=1):
+        # テストではプライマリをそのまま参照する
+        database['TEST'] = {'MIRROR': 'default'}
+        databases[f'replica{index}'] = database
+    return databases
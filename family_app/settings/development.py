@@ -16,10 +16,8 @@ INSTALLED_APPS += [
 
 # Database for development
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': sqlite_database(BASE_DIR / 'db.sqlite3'),
+    **replica_databases(),
 }
 
 # Email backend for development (console)
@@ -25,18 +25,32 @@ if RENDER_EXTERNAL_HOSTNAME:
     ALLOWED_HOSTS.append(RENDER_EXTERNAL_HOSTNAME)
 
 # Production middleware
+# WhiteNoise は ASGI（ASYNC_VIEWS）でも使い、圧縮済みの .gz/.br とハッシュ付きファイルの
+# 長期キャッシュのヘッダーをそのまま配信する
 MIDDLEWARE.insert(1, 'whitenoise.middleware.WhiteNoiseMiddleware')
 
+# 処理時間の内訳はスタッフにだけ返す
+SERVER_TIMING_HEADER = os.environ.get('SERVER_TIMING_HEADER', 'staff')
+
 # Static files for production
 STATIC_ROOT = BASE_DIR / 'staticfiles'
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+# CSS/JSを圧縮し、ハッシュ付きファイル名で長期キャッシュ可能にする
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'main.storage.MinifiedManifestStaticFilesStorage',
+    },
+}
 
 # Database for production (can be configured via environment variables)
 DATABASE_URL = os.environ.get('DATABASE_URL')
 if DATABASE_URL:
-    import dj_database_url
+    from .database import postgres_database
     DATABASES = {
-        'default': dj_database_url.parse(DATABASE_URL)
+        'default': postgres_database(DATABASE_URL),
+        **replica_databases(),
     }
 
 # Email settings for production
@@ -1,7 +1,12 @@
 from django.contrib import admin
+from django.contrib.admin import helpers
+from django.template.response import TemplateResponse
 from django.utils.html import format_html
 from .models import FamilyMember, FamilyPhoto, PhotoTag, PhotoAlbum, EventCategory, FamilyEvent
 from .utils.helpers import get_role_emoji
+from .signals import invalidate_model
+from .forms import PhotoBulkEditForm
+from .bulk import apply_bulk_action, BulkEditError
 
 # Register your models here.
 
@@ -85,13 +90,19 @@ class FamilyMemberAdmin(admin.ModelAdmin):
                 f'家族メンバー「{obj.name}」が更新されました。'
             )
         
-        super().save_model(request, obj, form, change)
+        if change:
+            # フォームで検証済みのため、変更したフィールドだけを保存する
+            obj.save_changed(form.changed_data)
+        else:
+            super().save_model(request, obj, form, change)
     
     actions = ['make_active', 'make_inactive']
     
     def make_active(self, request, queryset):
         """選択されたメンバーをアクティブにする"""
-        updated = queryset.update(is_active=True)
+        pks = list(queryset.values_list('pk', flat=True))
+        updated = FamilyMember.objects.filter(pk__in=pks).update(is_active=True)
+        invalidate_model(FamilyMember, pks)
         self.message_user(
             request,
             f'{updated} 人のメンバーをアクティブにしました。'
@@ -100,7 +111,9 @@ class FamilyMemberAdmin(admin.ModelAdmin):
     
     def make_inactive(self, request, queryset):
         """選択されたメンバーを非アクティブにする"""
-        updated = queryset.update(is_active=False)
+        pks = list(queryset.values_list('pk', flat=True))
+        updated = FamilyMember.objects.filter(pk__in=pks).update(is_active=False)
+        invalidate_model(FamilyMember, pks)
         self.message_user(
             request,
             f'{updated} 人のメンバーを非表示にしました。'
@@ -147,7 +160,7 @@ class PhotoAlbumAdmin(admin.ModelAdmin):
             'fields': ('title', 'description', 'is_public')
         }),
         ('カバー写真', {
-            'fields': ('cover_photo',),
+            'fields': ('cover_photo', 'cover_style'),
             'classes': ('collapse',)
         }),
     )
@@ -176,13 +189,12 @@ class FamilyPhotoAdmin(admin.ModelAdmin):
         'family_members_display',
         'tags_display',
         'album',
-        'is_favorite',
+        'favorite_count',
         'is_public',
         'created_at'
     ]
     list_filter = [
         'taken_date', 
-        'is_favorite', 
         'is_public', 
         'album',
         'tags',
@@ -205,12 +217,12 @@ class FamilyPhotoAdmin(admin.ModelAdmin):
             'fields': ('family_members', 'tags', 'album')
         }),
         ('設定', {
-            'fields': ('is_favorite', 'is_public'),
+            'fields': ('is_public',),
             'classes': ('collapse',)
         }),
     )
     
-    actions = ['make_favorite', 'remove_favorite', 'make_public', 'make_private']
+    actions = ['make_public', 'make_private', 'bulk_edit']
     
     def image_preview(self, obj):
         """画像のプレビューを表示"""
@@ -246,35 +258,64 @@ class FamilyPhotoAdmin(admin.ModelAdmin):
         return "タグなし"
     tags_display.short_description = 'タグ'
     
-    def make_favorite(self, request, queryset):
-        """選択された写真をお気に入りにする"""
-        updated = queryset.update(is_favorite=True)
-        self.message_user(request, f'{updated}枚の写真をお気に入りにしました。')
-    make_favorite.short_description = '選択された写真をお気に入りにする'
-    
-    def remove_favorite(self, request, queryset):
-        """選択された写真のお気に入りを解除する"""
-        updated = queryset.update(is_favorite=False)
-        self.message_user(request, f'{updated}枚の写真のお気に入りを解除しました。')
-    remove_favorite.short_description = 'お気に入りを解除する'
-    
     def make_public(self, request, queryset):
         """選択された写真を公開する"""
-        updated = queryset.update(is_public=True)
+        pks = list(queryset.values_list('pk', flat=True))
+        updated = FamilyPhoto.objects.filter(pk__in=pks).update(is_public=True)
+        invalidate_model(FamilyPhoto, pks)
         self.message_user(request, f'{updated}枚の写真を公開しました。')
     make_public.short_description = '選択された写真を公開する'
     
     def make_private(self, request, queryset):
         """選択された写真を非公開にする"""
-        updated = queryset.update(is_public=False)
+        pks = list(queryset.values_list('pk', flat=True))
+        updated = FamilyPhoto.objects.filter(pk__in=pks).update(is_public=False)
+        invalidate_model(FamilyPhoto, pks)
         self.message_user(request, f'{updated}枚の写真を非公開にしました。')
     make_private.short_description = '選択された写真を非公開にする'
     
+    def bulk_edit(self, request, queryset):
+        """選択された写真のタグ・家族メンバー・アルバムを一括で変更する"""
+        form = PhotoBulkEditForm(request.POST if 'apply' in request.POST else None, prefix='bulk')
+        
+        if form.is_valid():
+            pks = list(queryset.values_list('pk', flat=True))
+            try:
+                changed = apply_bulk_action(
+                    form.cleaned_data['action'],
+                    pks,
+                    target_ids=form.target_ids(),
+                    album_id=form.cleaned_data['album'].pk if form.cleaned_data['album'] else None,
+                )
+            except BulkEditError as e:
+                self.message_user(request, str(e), level='error')
+                return None
+            
+            action_label = dict(form.fields['action'].choices)[form.cleaned_data['action']]
+            self.message_user(request, f'{len(pks)}枚の写真に「{action_label}」を実行しました（{changed}件変更）。')
+            return None
+        
+        # 確認画面を表示（選択された写真はhiddenで引き継ぐ）
+        context = {
+            **self.admin_site.each_context(request),
+            'title': '写真の一括編集',
+            'opts': self.model._meta,
+            'form': form,
+            'photo_ids': list(queryset.values_list('pk', flat=True)),
+            'preview_photos': queryset[:20],
+            'action_checkbox_name': helpers.ACTION_CHECKBOX_NAME,
+        }
+        return TemplateResponse(request, 'admin/main/familyphoto/bulk_edit.html', context)
+    bulk_edit.short_description = 'タグ・家族メンバー・アルバムを一括編集する'
+    
     def save_model(self, request, obj, form, change):
         """保存時にuploaded_byを自動設定"""
         if not change:  # 新規作成時
             obj.uploaded_by = request.user
-        super().save_model(request, obj, form, change)
+            super().save_model(request, obj, form, change)
+        else:
+            # フォームで検証済みのため、変更したフィールドだけを保存する
+            obj.save_changed(form.changed_data)
 
 
 @admin.register(EventCategory)
@@ -433,25 +474,33 @@ class FamilyEventAdmin(admin.ModelAdmin):
     
     def enable_reminder(self, request, queryset):
         """選択されたイベントのリマインダーを有効にする"""
-        updated = queryset.update(is_reminder_enabled=True)
+        pks = list(queryset.values_list('pk', flat=True))
+        updated = FamilyEvent.objects.filter(pk__in=pks).update(is_reminder_enabled=True)
+        invalidate_model(FamilyEvent, pks)
         self.message_user(request, f'{updated}件のイベントのリマインダーを有効にしました。')
     enable_reminder.short_description = 'リマインダーを有効にする'
     
     def disable_reminder(self, request, queryset):
         """選択されたイベントのリマインダーを無効にする"""
-        updated = queryset.update(is_reminder_enabled=False)
+        pks = list(queryset.values_list('pk', flat=True))
+        updated = FamilyEvent.objects.filter(pk__in=pks).update(is_reminder_enabled=False)
+        invalidate_model(FamilyEvent, pks)
         self.message_user(request, f'{updated}件のイベントのリマインダーを無効にしました。')
     disable_reminder.short_description = 'リマインダーを無効にする'
     
     def set_high_priority(self, request, queryset):
         """選択されたイベントを高優先度に設定"""
-        updated = queryset.update(priority='high')
+        pks = list(queryset.values_list('pk', flat=True))
+        updated = FamilyEvent.objects.filter(pk__in=pks).update(priority='high')
+        invalidate_model(FamilyEvent, pks)
         self.message_user(request, f'{updated}件のイベントを高優先度に設定しました。')
     set_high_priority.short_description = '高優先度に設定'
     
     def set_normal_priority(self, request, queryset):
         """選択されたイベントを通常優先度に設定"""
-        updated = queryset.update(priority='normal')
+        pks = list(queryset.values_list('pk', flat=True))
+        updated = FamilyEvent.objects.filter(pk__in=pks).update(priority='normal')
+        invalidate_model(FamilyEvent, pks)
         self.message_user(request, f'{updated}件のイベントを通常優先度に設定しました。')
     set_normal_priority.short_description = '通常優先度に設定'
     
@@ -0,0 +1,937 @@
+"""
+JSON API（/api/v1/）
+
+写真・アルバム・家族メンバー・イベント・タグ・カテゴリの読み書きを行う。
+URLは /api/v1/<リソース名>/（一覧・作成）、/api/v1/<リソース名>/<id>/（取得・更新・削除）、
+/api/v1/<リソース名>/bulk/（一括の作成・更新・削除）、/api/v1/sync/（差分同期）。
+
+一覧・取得のクエリパラメータ:
+    fields=id,title      出力するフィールドを絞る（指定したフィールドの列だけを読み込む）
+    include=tags,album   関連するオブジェクトを埋め込む（関連ごとに1クエリでまとめて読み込む）
+    limit=50             1ページの件数（最大 MAX_LIMIT）
+    cursor=...           前のページの next（並び順のキーによるカーソル。OFFSETを使わない）
+
+一覧・取得のレスポンスには本文のハッシュをETagとして付け、If-None-Match が一致すれば
+304を返す（転送量を減らす。クエリは実行する）。
+書き込みは既存のフォーム（main.forms）で検証し、セッション認証とCSRFトークン
+（X-CSRFToken ヘッダー）が必要。写真・アルバム・メンバー・タグはスタッフのみ、
+イベントはログイン中のユーザーが書き込める。カテゴリはログイン中のユーザーが作成でき、
+更新・削除はスタッフのみ（画面と同じ）。
+画像のアップロードは multipart/form-data の POST で行う。
+
+orjson がインストールされていればJSONの出力に使う。
+"""
+
+import hashlib
+import json
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import FileField
+from django.forms.models import model_to_dict
+from django.http import HttpResponse, HttpResponseNotModified, QueryDict
+from django.urls import reverse
+from django.utils.cache import patch_cache_control
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from django.utils.http import parse_etags, quote_etag
+
+from .forms import (
+    FamilyMemberForm, FamilyPhotoForm, PhotoTagForm, PhotoAlbumForm,
+    EventCategoryForm, FamilyEventForm,
+)
+from .models import (
+    ChangeLog, FamilyMember, FamilyPhoto, PhotoTag, PhotoAlbum, EventCategory, FamilyEvent,
+)
+from .utils.pagination import decode_cursor, encode_cursor, keyset_filter
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+API_VERSION = 'v1'
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+# 一括操作の1リクエストあたりの最大件数（作成・更新・削除の合計）
+MAX_BULK_ITEMS = 500
+
+
+class ApiError(Exception):
+    """APIのエラー（ビューがJSONのエラーレスポンスにする）"""
+
+    def __init__(self, message, status=400, errors=None):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+        self.errors = errors
+
+
+# ========== シリアライズ ==========
+
+def dumps(data):
+    """
+    JSONにする（orjson があれば使う）
+
+    Args:
+        data: 出力するデータ（日付・時刻を含んでよい）
+
+    Returns:
+        bytes: UTF-8のJSON
+    """
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(
+        data, cls=DjangoJSONEncoder, ensure_ascii=False, separators=(',', ':')
+    ).encode('utf-8')
+
+
+def json_response(request, data, status=200):
+    """
+    JSONのレスポンスを作成する
+
+    GETの場合は本文のハッシュをETagにし、If-None-Match が一致すれば304を返す。
+    """
+    body = dumps(data)
+    if request.method not in ('GET', 'HEAD') or status != 200:
+        return HttpResponse(body, content_type='application/json', status=status)
+
+    etag = quote_etag(hashlib.md5(body).hexdigest())
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    # ログイン状態で内容が変わるため、共有キャッシュには保存させず毎回再検証させる
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def error_response(request, error):
+    data = {'error': error.message}
+    if error.errors is not None:
+        data['errors'] = error.errors
+    return json_response(request, data, status=error.status)
+
+
+def _parse_int(value):
+    return int(value)
+
+
+def _parse_date(value):
+    parsed = parse_date(value)
+    if parsed is None:
+        raise ValueError(value)
+    return parsed
+
+
+# ========== 関連の一括読み込み（include=） ==========
+
+class ManyToManyInclude:
+    """多対多の関連を、中間テーブルとの結合1クエリでまとめて読み込む"""
+
+    def __init__(self, field_name, target_fields, public_filter=None):
+        self.field_name = field_name
+        self.target_fields = target_fields
+        self.public_filter = public_filter or {}
+
+    def load(self, model, rows, user):
+        """
+        Args:
+            model: 一覧のモデル
+            rows (list): 一覧の行（'id' を含む辞書）
+            user: リクエストのユーザー（スタッフ以外は非公開の関連を除く）
+
+        Returns:
+            dict: 行のID -> 関連オブジェクトの辞書のリスト
+        """
+        field = model._meta.get_field(self.field_name)
+        source = field.m2m_field_name()
+        target = field.m2m_reverse_field_name()
+        links = field.remote_field.through.objects.filter(
+            **{f'{source}_id__in': [row['id'] for row in rows]}
+        )
+        if not user.is_staff:
+            links = links.filter(**{f'{target}__{key}': value for key, value in self.public_filter.items()})
+
+        columns = [f'{target}__{name}' for name in self.target_fields]
+        related = {row['id']: [] for row in rows}
+        for owner_id, *values in links.values_list(f'{source}_id', *columns).order_by(f'{target}_id'):
+            related[owner_id].append(dict(zip(self.target_fields, values)))
+        return related
+
+
+class ForeignKeyInclude:
+    """外部キーの参照先を、IDをまとめた1クエリで読み込む（IDの代わりにオブジェクトを出力する）"""
+
+    def __init__(self, field_name, target_fields, public_filter=None):
+        self.field_name = field_name
+        self.target_fields = target_fields
+        self.public_filter = public_filter or {}
+
+    def load(self, model, rows, user):
+        target_model = model._meta.get_field(self.field_name).related_model
+        ids = {row[self.field_name] for row in rows if row.get(self.field_name)}
+        targets = target_model._default_manager.filter(pk__in=ids)
+        if not user.is_staff:
+            targets = targets.filter(**self.public_filter)
+        objects = {obj['id']: obj for obj in targets.values(*self.target_fields)}
+        return {row['id']: objects.get(row.get(self.field_name)) for row in rows}
+
+
+# ========== リソース ==========
+
+class Resource:
+    """APIで公開するモデルの定義"""
+
+    model = None
+    form_class = None
+    # 出力するフィールド（'id' 以外はモデルのフィールド名。外部キーはIDを出力する）
+    fields = ()
+    # 画像のフィールド（ファイル名の代わりにURLを出力する）
+    image_fields = ()
+    # include= で埋め込める関連
+    includes = {}
+    # 並び順（カーソルのキー。NULLにならないフィールドにし、最後は 'pk' にする）
+    ordering = ('pk',)
+    # スタッフ以外に公開するオブジェクトの条件
+    public_filter = {}
+    # 一覧の絞り込み（クエリパラメータ -> (lookup, 値の変換関数)）
+    filters = {}
+    # 書き込みにスタッフ権限が必要かどうか（Falseならログイン中のユーザー）
+    staff_only = True
+    # staff_only でもログイン中のユーザーに許可する操作（'create'・'update'・'delete'）
+    member_operations = ()
+    # 作成時に作成者を設定するフィールド
+    owner_field = None
+
+    def __init__(self, name):
+        self.name = name
+
+    def get_queryset(self, user):
+        queryset = self.model._default_manager.all()
+        if not user.is_staff:
+            queryset = queryset.filter(**self.public_filter)
+        return queryset
+
+    def column(self, name):
+        """出力するフィールド名 -> values() の列名"""
+        if name == 'id':
+            return 'pk'
+        field = self.model._meta.get_field(name)
+        return field.attname
+
+    def serialize(self, values, fields):
+        row = {}
+        for name in fields:
+            value = values[self.column(name)]
+            if name in self.image_fields:
+                value = default_storage.url(value) if value else None
+            row[name] = value
+        return row
+
+    def check_write_permission(self, user, operations):
+        """
+        書き込みの権限を確認する
+
+        Args:
+            user: リクエストのユーザー
+            operations (iterable): 行う操作（'create'・'update'・'delete'）
+        """
+        if not user.is_authenticated:
+            raise ApiError('ログインが必要です', status=401)
+        if self.staff_only and not user.is_staff and not set(operations) <= set(self.member_operations):
+            raise ApiError('この操作を行う権限がありません', status=403)
+
+
+class PhotoResource(Resource):
+    model = FamilyPhoto
+    form_class = FamilyPhotoForm
+    fields = (
+        'id', 'title', 'description', 'image', 'thumbnail', 'width', 'height',
+        'taken_date', 'location', 'album',
+        'favorite_count', 'is_public', 'created_at', 'updated_at',
+    )
+    image_fields = ('image', 'thumbnail')
+    includes = {
+        'tags': ManyToManyInclude('tags', ('id', 'name', 'color')),
+        'members': ManyToManyInclude('family_members', ('id', 'name', 'role'), {'is_active': True}),
+        'album': ForeignKeyInclude('album', ('id', 'title'), {'is_public': True}),
+    }
+    # 画面（views.PHOTO_ORDERING）・インデックスと同じ並び順
+    ordering = ('-taken_date', '-created_at', '-pk')
+    public_filter = {'is_public': True}
+    filters = {
+        'album': ('album_id', _parse_int),
+        'tag': ('tags', _parse_int),
+        'member': ('family_members', _parse_int),
+        'taken_from': ('taken_date__gte', _parse_date),
+        'taken_to': ('taken_date__lte', _parse_date),
+    }
+    owner_field = 'uploaded_by'
+
+
+class AlbumResource(Resource):
+    model = PhotoAlbum
+    form_class = PhotoAlbumForm
+    fields = (
+        'id', 'title', 'description', 'cover_photo', 'cover_style', 'cover_thumbnail',
+        'public_photo_count', 'is_public', 'created_at', 'updated_at',
+    )
+    image_fields = ('cover_photo', 'cover_thumbnail')
+    ordering = ('-created_at', '-pk')
+    public_filter = {'is_public': True}
+    owner_field = 'created_by'
+
+
+class MemberResource(Resource):
+    model = FamilyMember
+    form_class = FamilyMemberForm
+    fields = (
+        'id', 'name', 'role', 'birthday', 'photo', 'favorite_food', 'hobby',
+        'introduction', 'is_active', 'updated_at',
+    )
+    image_fields = ('photo',)
+    public_filter = {'is_active': True}
+    filters = {
+        'role': ('role', str),
+    }
+
+
+class EventResource(Resource):
+    model = FamilyEvent
+    form_class = FamilyEventForm
+    fields = (
+        'id', 'title', 'description', 'start_date', 'end_date', 'start_time', 'end_time',
+        'is_all_day', 'repeat', 'repeat_until', 'category', 'location', 'priority',
+        'is_reminder_enabled', 'reminder_minutes', 'created_at', 'updated_at',
+    )
+    includes = {
+        'participants': ManyToManyInclude('participants', ('id', 'name', 'role'), {'is_active': True}),
+        'category': ForeignKeyInclude('category', ('id', 'name', 'emoji', 'color')),
+    }
+    ordering = ('start_date', 'pk')
+    filters = {
+        'from': ('start_date__gte', _parse_date),
+        'to': ('start_date__lte', _parse_date),
+        'category': ('category_id', _parse_int),
+        'participant': ('participants', _parse_int),
+    }
+    staff_only = False
+    owner_field = 'created_by'
+
+
+class TagResource(Resource):
+    model = PhotoTag
+    form_class = PhotoTagForm
+    fields = ('id', 'name', 'color', 'created_at')
+    ordering = ('name', 'pk')
+
+
+class CategoryResource(Resource):
+    model = EventCategory
+    form_class = EventCategoryForm
+    fields = ('id', 'name', 'emoji', 'color', 'description', 'created_at')
+    ordering = ('name', 'pk')
+    # 画面と同じく、作成はログイン中のユーザー、更新・削除はスタッフのみ
+    member_operations = ('create',)
+
+
+RESOURCES = {
+    resource.name: resource
+    for resource in [
+        PhotoResource('photos'),
+        AlbumResource('albums'),
+        MemberResource('members'),
+        EventResource('events'),
+        TagResource('tags'),
+        CategoryResource('categories'),
+    ]
+}
+
+
+def get_resource(name):
+    try:
+        return RESOURCES[name]
+    except KeyError:
+        raise ApiError(f'不明なリソースです: {name}', status=404)
+
+
+# ========== 読み込み ==========
+
+def _parse_list(request, param, choices):
+    """カンマ区切りのクエリパラメータを検証して返す（未指定ならNone）"""
+    value = request.GET.get(param)
+    if value is None:
+        return None
+    names = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = [name for name in names if name not in choices]
+    if unknown:
+        raise ApiError(
+            f'{param} に指定できない値です: {", ".join(unknown)}',
+            errors={'choices': list(choices)},
+        )
+    return names
+
+
+def _selected_fields(request, resource):
+    fields = _parse_list(request, 'fields', resource.fields)
+    if fields is None:
+        return list(resource.fields)
+    # カーソル・include の基準にするため id は常に出力する
+    return ['id'] + [name for name in fields if name != 'id']
+
+
+def fetch_rows(request, resource, queryset, fields=None, includes=None):
+    """
+    クエリセットを values() で読み込み、出力する辞書のリストにする
+
+    Args:
+        fields (list): 出力するフィールド（Noneならクエリパラメータ fields=）
+        includes (list): 埋め込む関連（Noneならクエリパラメータ include=）
+
+    Returns:
+        tuple: (行のリスト, 行ごとの並び順のキーの値のリスト)
+    """
+    if fields is None:
+        fields = _selected_fields(request, resource)
+    if includes is None:
+        includes = _parse_list(request, 'include', resource.includes) or []
+
+    # 外部キーを埋め込む場合は、参照先のIDも読み込む
+    output = fields + [name for name in includes if name not in fields and name in resource.fields]
+    order_columns = [key.lstrip('-') for key in resource.ordering]
+    columns = {resource.column(name) for name in output} | set(order_columns)
+
+    values = list(queryset.values(*columns))
+    rows = [resource.serialize(row, output) for row in values]
+    keys = [[row[column] for column in order_columns] for row in values]
+
+    for name in includes:
+        related = resource.includes[name].load(resource.model, rows, request.user)
+        for row in rows:
+            row[name] = related[row['id']]
+    return rows, keys
+
+
+def list_objects(request, resource):
+    try:
+        limit = min(max(int(request.GET.get('limit', DEFAULT_LIMIT)), 1), MAX_LIMIT)
+    except ValueError:
+        raise ApiError('limit は整数で指定してください')
+
+    queryset = resource.get_queryset(request.user)
+    for param, (lookup, parse) in resource.filters.items():
+        value = request.GET.get(param)
+        if value is None:
+            continue
+        try:
+            queryset = queryset.filter(**{lookup: parse(value)})
+        except ValueError:
+            raise ApiError(f'{param} の値が不正です: {value}')
+
+    cursor = request.GET.get('cursor')
+    if cursor:
+        try:
+            values = decode_cursor(resource.model, resource.ordering, cursor)
+        except ValueError:
+            raise ApiError('cursor が不正です')
+        queryset = queryset.filter(keyset_filter(resource.ordering, values))
+
+    # 次のページがあるかどうかを知るため1件多く読み込む
+    rows, keys = fetch_rows(request, resource, queryset.order_by(*resource.ordering)[:limit + 1])
+    next_url = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        params = request.GET.copy()
+        params['cursor'] = encode_cursor(keys[limit - 1])
+        next_url = f'{request.path}?{params.urlencode()}'
+
+    return {'data': rows, 'next': next_url}
+
+
+def get_object_data(request, resource, pk):
+    rows, _ = fetch_rows(request, resource, resource.get_queryset(request.user).filter(pk=pk))
+    if not rows:
+        raise ApiError('指定されたオブジェクトが見つかりません', status=404)
+    return {'data': rows[0]}
+
+
+# ========== 差分同期 ==========
+
+# 変更履歴の object_type -> リソース名
+SYNC_RESOURCES = {
+    'photo': 'photos',
+    'album': 'albums',
+    'member': 'members',
+    'event': 'events',
+}
+DEFAULT_SYNC_LIMIT = 200
+# 1回に読む変更履歴の最大件数（IN句の変数の数がSQLiteの上限を超えないようにする）
+MAX_SYNC_LIMIT = 500
+
+
+def _committed_prefix(since, entries):
+    """
+    変更履歴のうち、未コミットの行を飛ばさずに返せる先頭の部分
+
+    seq は INSERT の時点で採番されるため、PostgreSQL などで後から採番したトランザクションが
+    先にコミットすると、先に採番した未コミットの行が欠番に見える。その後ろまで cursor を
+    進めると、コミットされた後もその行を読まなくなるため、欠番の直後の行が
+    SYNC_SAFETY_LAG 秒より新しい間は欠番の手前で止める（それより古い欠番は
+    ロールバックされたものとみなす）。SQLiteは書き込みが1つずつのため欠番は生じない。
+
+    Args:
+        since (int): 直前の seq
+        entries (list): seq の順の変更履歴（先頭が seq、末尾が changed_at のタプル）
+
+    Returns:
+        list: entries の先頭の部分
+    """
+    threshold = timezone.now() - timedelta(seconds=settings.SYNC_SAFETY_LAG)
+    expected = since + 1
+    for index, entry in enumerate(entries):
+        if entry[0] != expected and entry[-1] > threshold:
+            return entries[:index]
+        expected = entry[0] + 1
+    return entries
+
+
+def sync_changes(request):
+    """
+    since（前回の cursor）より後の変更をまとめる
+
+    同じオブジェクトの変更は最後の1件にまとめ、作成・更新されたオブジェクトは現在の値を、
+    削除された（またはスタッフ以外には非公開になった）オブジェクトはIDだけを返す。
+    未コミットかもしれない欠番があれば、その手前までを返す（_committed_prefix()）。
+    欠番は種類によらないため、resources= を指定した場合も全ての変更履歴を順に読む。
+
+    Raises:
+        ApiError: since が不正な場合・古すぎて変更履歴が削除されている場合（410）
+    """
+    try:
+        since = int(request.GET['since'])
+        limit = min(max(int(request.GET.get('limit', DEFAULT_SYNC_LIMIT)), 1), MAX_SYNC_LIMIT)
+    except (KeyError, ValueError):
+        raise ApiError('since と limit は整数で指定してください')
+
+    types = list(SYNC_RESOURCES)
+    names = _parse_list(request, 'resources', list(SYNC_RESOURCES.values()))
+    if names is not None:
+        types = [object_type for object_type, name in SYNC_RESOURCES.items() if name in names]
+    resources = [RESOURCES[SYNC_RESOURCES[object_type]] for object_type in types]
+    includes = _parse_list(request, 'include', sorted({
+        name for resource in resources for name in resource.includes
+    })) or []
+
+    entries = list(
+        ChangeLog.objects.filter(seq__gt=since)
+        .order_by('seq').values_list('seq', 'object_type', 'object_id', 'action', 'changed_at')[:limit + 1]
+    )
+    # 最初の変更が since の直後でない場合だけ、間の変更履歴が削除されていないかを確認する
+    if (not entries or entries[0][0] > since + 1) and since > 0:
+        oldest = ChangeLog.objects.order_by('seq').values_list('seq', flat=True).first()
+        if oldest is not None and oldest > since + 1:
+            raise ApiError(
+                '変更履歴が削除されているため、全件を取得し直してください', status=410,
+                errors={'cursor': latest_sync_cursor()},
+            )
+
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+    committed = _committed_prefix(since, entries)
+    if len(committed) < len(entries):
+        has_more = True
+        entries = committed
+    # (object_type, object_id) -> (最後の操作, この範囲で作成されたかどうか)
+    latest = {}
+    for _, object_type, object_id, action, _ in entries:
+        if object_type not in types:
+            continue
+        created = action == ChangeLog.CREATED or latest.get((object_type, object_id), (None, False))[1]
+        latest[(object_type, object_id)] = (action, created)
+
+    changes = {}
+    for object_type, resource in zip(types, resources):
+        keys = {object_id: state for (kind, object_id), state in latest.items() if kind == object_type}
+        if not keys:
+            continue
+        alive = [object_id for object_id, (action, _) in keys.items() if action != ChangeLog.DELETED]
+        rows = []
+        if alive:
+            rows, _ = fetch_rows(
+                request, resource, resource.get_queryset(request.user).filter(pk__in=alive),
+                fields=list(resource.fields),
+                includes=[name for name in includes if name in resource.includes],
+            )
+        found = {row['id'] for row in rows}
+        changes[resource.name] = {
+            'created': [row for row in rows if keys[row['id']][1]],
+            'updated': [row for row in rows if not keys[row['id']][1]],
+            'deleted': sorted(object_id for object_id in keys if object_id not in found),
+        }
+
+    return {
+        'changes': changes,
+        'cursor': entries[-1][0] if entries else since,
+        'has_more': has_more,
+    }
+
+
+def latest_sync_cursor():
+    """
+    現在の最新の cursor（全件を取得する直前に取得しておく）
+
+    SYNC_SAFETY_LAG 秒以内の変更履歴に未コミットかもしれない欠番があれば、その手前にする。
+    """
+    threshold = timezone.now() - timedelta(seconds=settings.SYNC_SAFETY_LAG)
+    base = ChangeLog.objects.filter(changed_at__lte=threshold).order_by('-seq').values_list(
+        'seq', flat=True
+    ).first() or 0
+    recent = list(ChangeLog.objects.filter(seq__gt=base).order_by('seq').values_list('seq', 'changed_at'))
+    committed = _committed_prefix(base, recent)
+    return committed[-1][0] if committed else base
+
+
+# ========== 書き込み ==========
+
+def _load_body(request):
+    """JSONの本文を読み込む"""
+    try:
+        return json.loads(request.body or b'null')
+    except ValueError as e:
+        raise ApiError(f'JSONが不正です: {e}')
+
+
+def _merge_data(current, data):
+    """補う値に指定された値を上書きする（multipart の QueryDict にも対応する）"""
+    if isinstance(data, QueryDict):
+        merged = data.copy()
+        for name, value in current.items():
+            if name not in merged:
+                merged[name] = value
+        return merged
+    return {**current, **data}
+
+
+def _foreign_keys(resource):
+    """フォームで選択する外部キーのフィールド"""
+    form_fields = resource.form_class._meta.fields
+    return [
+        field for field in resource.model._meta.concrete_fields
+        if field.many_to_one and field.name in form_fields
+    ]
+
+
+def load_choices(resource, items):
+    """
+    一括操作で指定された外部キーの参照先を、フィールドごとに1クエリでまとめて読み込む
+
+    選択肢はフォームのフィールドの queryset に従う（公開アルバムのみなど）。
+    save_object() に渡すと、項目ごとにフォームで参照先を検索・検証しない。
+
+    Args:
+        items (list): 作成・更新する項目
+
+    Returns:
+        dict: フィールド名 -> {主キー: オブジェクト}
+    """
+    form_fields = resource.form_class().fields
+    choices = {}
+    for field in _foreign_keys(resource):
+        ids = set()
+        for item in items:
+            value = item.get(field.name) if isinstance(item, dict) else None
+            try:
+                ids.add(int(value))
+            except (TypeError, ValueError):
+                # 未指定・空の値や不正な値は save_object() で項目ごとに扱う
+                pass
+        choices[field.name] = form_fields[field.name].queryset.in_bulk(ids) if ids else {}
+    return choices
+
+
+def _resolve_choices(resource, data, choices):
+    """
+    指定された外部キーを load_choices() の結果から選ぶ
+
+    Returns:
+        dict: フィールド名 -> オブジェクト（空の値は None）
+
+    Raises:
+        ApiError: 参照先が選択肢にない場合
+    """
+    selected, errors = {}, {}
+    for field in _foreign_keys(resource):
+        if field.name not in data:
+            continue
+        value = data[field.name]
+        if value in (None, ''):
+            if not field.blank:
+                errors[field.name] = [{'message': 'このフィールドは必須です。', 'code': 'required'}]
+            selected[field.name] = None
+            continue
+        try:
+            obj = choices[field.name].get(int(value))
+        except (TypeError, ValueError):
+            obj = None
+        if obj is None:
+            errors[field.name] = [{
+                'message': '正しく選択してください。選択したものは候補にありません。',
+                'code': 'invalid_choice',
+            }]
+        selected[field.name] = obj
+    if errors:
+        raise ApiError('入力内容が正しくありません', errors=errors)
+    return selected
+
+
+def save_object(request, resource, data, files=None, instance=None, choices=None):
+    """
+    フォームで検証してオブジェクトを保存する
+
+    更新の場合は、指定されたフィールドだけを変更する（部分更新）。
+    作成の場合は、指定されなかったフィールドをモデルの既定値にする。
+
+    Args:
+        choices (dict): load_choices() の結果（一括操作の場合。外部キーを項目ごとに検索しない）
+
+    Raises:
+        ApiError: 検証エラーの場合（errors にフィールドごとのエラー）
+    """
+    if not isinstance(data, (dict, QueryDict)):
+        raise ApiError('オブジェクトを指定してください')
+
+    files = files or {}
+    opts = resource.model._meta
+    form_fields = resource.form_class._meta.fields
+    relations = {field.name for field in opts.many_to_many} | {
+        field.name for field in opts.concrete_fields if isinstance(field, FileField)
+    }
+    creating = instance is None
+    if creating:
+        # 指定されなかったフィールドはモデルの既定値にする（チェックボックスを False にしない）
+        current = {
+            field.name: field.get_default() for field in opts.concrete_fields
+            if field.name in form_fields and field.name not in relations and field.has_default()
+        }
+    else:
+        # 項目間の検証のため、多対多・画像以外は現在の値を補う（クエリは実行しない）
+        current = model_to_dict(instance, fields=[name for name in form_fields if name not in relations])
+
+    selected = {}
+    if choices is not None:
+        # 外部キーは読み込み済みの参照先から設定し、フォームでは検証しない
+        selected = _resolve_choices(resource, data, choices)
+        if creating:
+            instance = resource.model()
+        for name, obj in selected.items():
+            setattr(instance, name, obj)
+    data = _merge_data(current, data)
+
+    form = resource.form_class(data=data, files=files, instance=instance)
+    if not creating:
+        # 多対多・画像は指定された場合だけ置き換える
+        for name in relations & set(form.fields):
+            if name not in data and name not in files:
+                del form.fields[name]
+    for name in choices or ():
+        form.fields.pop(name, None)
+    if not form.is_valid():
+        raise ApiError('入力内容が正しくありません', errors=form.errors.get_json_data())
+
+    obj = form.save(commit=False)
+    if creating and resource.owner_field:
+        setattr(obj, resource.owner_field, request.user)
+    if not creating and hasattr(obj, 'save_changed'):
+        # フォームで検証済みのため、変更したフィールドだけを保存する（モデルでの再検証を省く）
+        obj.save_changed(form.changed_data + list(selected))
+    else:
+        obj.save()
+    form.save_m2m()
+    return obj
+
+
+def _get_for_update(request, resource, pk):
+    obj = resource.get_queryset(request.user).filter(pk=pk).first()
+    if obj is None:
+        raise ApiError('指定されたオブジェクトが見つかりません', status=404)
+    return obj
+
+
+def _item_id(item):
+    try:
+        return int(item['id'])
+    except (KeyError, TypeError, ValueError):
+        raise ApiError('更新するオブジェクトの id を指定してください')
+
+
+def apply_bulk(request, resource, payload):
+    """
+    一括の作成・更新・削除を1つのトランザクションで行う
+
+    1件でも失敗した場合は全てを取り消し、失敗した操作と位置をエラーに含める。
+
+    Returns:
+        dict: 作成・更新したオブジェクトのIDと削除した件数
+    """
+    if not isinstance(payload, dict):
+        raise ApiError('create・update・delete のリストを指定してください')
+    creates = payload.get('create') or []
+    updates = payload.get('update') or []
+    deletes = payload.get('delete') or []
+    if not all(isinstance(items, list) for items in (creates, updates, deletes)):
+        raise ApiError('create・update・delete はリストで指定してください')
+    if len(creates) + len(updates) + len(deletes) > MAX_BULK_ITEMS:
+        raise ApiError(f'一度に操作できるのは{MAX_BULK_ITEMS}件までです')
+
+    result = {'created': [], 'updated': [], 'deleted': 0}
+    with transaction.atomic():
+        # 外部キーの参照先はフィールドごとに1クエリでまとめて確認する
+        choices = load_choices(resource, creates + updates)
+        for index, item in enumerate(creates):
+            try:
+                result['created'].append(save_object(request, resource, item, choices=choices).pk)
+            except ApiError as e:
+                e.errors = {'operation': 'create', 'index': index, 'errors': e.errors}
+                raise
+
+        # 更新するオブジェクトは、フォームの初期値になる多対多の関連と一緒にまとめて読み込む
+        ids = []
+        for item in updates:
+            try:
+                ids.append(_item_id(item))
+            except ApiError:
+                # 下のループで位置を付けてエラーにする
+                pass
+        m2m_fields = [
+            field.name for field in resource.model._meta.many_to_many
+            if field.name in resource.form_class._meta.fields
+        ]
+        objects = resource.get_queryset(request.user).prefetch_related(*m2m_fields).in_bulk(ids)
+        for index, item in enumerate(updates):
+            try:
+                pk = _item_id(item)
+                if pk not in objects:
+                    raise ApiError('指定されたオブジェクトが見つかりません', status=404)
+                fields = {key: value for key, value in item.items() if key != 'id'}
+                result['updated'].append(
+                    save_object(request, resource, fields, instance=objects[pk], choices=choices).pk
+                )
+            except ApiError as e:
+                e.errors = {'operation': 'update', 'index': index, 'errors': e.errors}
+                raise
+
+        try:
+            ids = sorted({int(pk) for pk in deletes})
+        except (TypeError, ValueError):
+            raise ApiError('delete にはIDのリストを指定してください')
+        if ids:
+            # シグナル（キャッシュの無効化・ライブ更新）を発行するため1件ずつ削除する
+            for obj in resource.get_queryset(request.user).filter(pk__in=ids):
+                obj.delete()
+                result['deleted'] += 1
+    return result
+
+
+# ========== ビュー ==========
+
+def collection(request, resource):
+    """一覧（GET）・作成（POST）"""
+    try:
+        resource = get_resource(resource)
+        if request.method in ('GET', 'HEAD'):
+            return json_response(request, list_objects(request, resource))
+        if request.method != 'POST':
+            raise ApiError('許可されていないメソッドです', status=405)
+
+        resource.check_write_permission(request.user, ['create'])
+        if request.content_type == 'multipart/form-data':
+            data, files = request.POST, request.FILES
+        else:
+            data, files = _load_body(request), None
+        with transaction.atomic():
+            obj = save_object(request, resource, data, files)
+        response = json_response(request, get_object_data(request, resource, obj.pk), status=201)
+        response['Location'] = reverse('api_item', kwargs={'resource': resource.name, 'pk': obj.pk})
+        return response
+    except ApiError as e:
+        return error_response(request, e)
+
+
+def item(request, resource, pk):
+    """取得（GET）・部分更新（PATCH）・削除（DELETE）"""
+    try:
+        resource = get_resource(resource)
+        if request.method in ('GET', 'HEAD'):
+            return json_response(request, get_object_data(request, resource, pk))
+        if request.method not in ('PATCH', 'DELETE'):
+            raise ApiError('許可されていないメソッドです', status=405)
+
+        resource.check_write_permission(request.user, ['delete' if request.method == 'DELETE' else 'update'])
+        obj = _get_for_update(request, resource, pk)
+        if request.method == 'DELETE':
+            obj.delete()
+            return HttpResponse(status=204)
+
+        with transaction.atomic():
+            save_object(request, resource, _load_body(request), instance=obj)
+        return json_response(request, get_object_data(request, resource, pk))
+    except ApiError as e:
+        return error_response(request, e)
+
+
+def sync(request):
+    """
+    差分同期（GET）
+
+    since を指定しない場合は、現在の cursor だけを返す。クライアントは cursor を取得してから
+    一覧APIで全件を取得し、以降は since=<cursor> で差分だけを取得する（has_more が true の
+    間は続けて取得する）。
+    """
+    try:
+        if request.method not in ('GET', 'HEAD'):
+            raise ApiError('許可されていないメソッドです', status=405)
+        if 'since' not in request.GET:
+            return json_response(request, {'cursor': latest_sync_cursor()})
+        return json_response(request, sync_changes(request))
+    except ApiError as e:
+        return error_response(request, e)
+
+
+def bulk(request, resource):
+    """
+    一括の作成・更新・削除（POST）
+
+    リクエスト例:
+        {"create": [{"title": ...}, ...],
+         "update": [{"id": 1, "title": ...}, ...],
+         "delete": [3, 4]}
+    """
+    try:
+        resource = get_resource(resource)
+        if request.method != 'POST':
+            raise ApiError('許可されていないメソッドです', status=405)
+        # 本文を解析する前にログインを確認する（操作ごとの権限は本文から判断する）
+        if not request.user.is_authenticated:
+            raise ApiError('ログインが必要です', status=401)
+        payload = _load_body(request)
+        operations = [
+            operation for operation in ('create', 'update', 'delete')
+            if isinstance(payload, dict) and payload.get(operation)
+        ]
+        resource.check_write_permission(request.user, operations)
+        result = apply_bulk(request, resource, payload)
+    except ApiError as e:
+        return error_response(request, e)
+
+    logger.info('APIの一括操作: user=%s resource=%s created=%d updated=%d deleted=%d',
+                request.user.username, resource.name, len(result['created']),
+                len(result['updated']), result['deleted'])
+    return json_response(request, result)
@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class MainConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'main'
+
+    def ready(self):
+        # キャッシュ無効化のシグナルを登録
+        from . import signals  # noqa: F401
+
+        # リクエストごとのクエリ数・DB時間の計測
+        from django.db.backends.signals import connection_created
+        from .utils.timing import install_query_timer
+        connection_created.connect(install_query_timer, dispatch_uid='main.install_query_timer')
@@ -0,0 +1,211 @@
+"""
+読み取り中心のビューの非同期版
+
+ASGI（uvicorn ワーカー）で動かす場合に、main/urls.py が views.py の同名のビューの
+代わりに使う（設定 ASYNC_VIEWS）。クエリセットの組み立ては views.py と共通にし、
+評価は非同期ORM（async for / aget）で行う。
+
+非同期ORMも内部ではスレッドでクエリを実行するため、1リクエストあたりの処理時間は
+同期版と変わらない。通信の遅いクライアントへの送受信の間もワーカーを占有しないことで、
+同時接続数が多い場合のスループットを上げる。
+
+テンプレートの描画は、フォームの選択肢などでクエリを実行する場合があるため
+sync_to_async で行う。
+
+ライブ更新（live_updates）は接続を保持し続けるため、ASYNC_VIEWS に関わらず常に
+非同期のビューとする。
+"""
+
+import logging
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import messages
+from django.core.paginator import Paginator
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.shortcuts import aget_object_or_404, redirect, render
+from django.utils import timezone
+
+from . import live
+from .forms import EventSearchForm
+from .utils.cache import add_cache_tags, cache_public_page, conditional_page
+from .utils.helpers import aget_request_user
+from .views import (
+    PHOTO_BATCH_SIZE,
+    _calendar_events, _category_stats, _event_calendar_error, _event_data,
+    _events_page, _gallery_filter_data, _gallery_next_batch_url, _gallery_queryset,
+    _photo_cache_tags, _photo_detail_queryset, _photo_detail_validators, _related_photos,
+    _upcoming_events, _week_events,
+)
+
+logger = logging.getLogger(__name__)
+
+arender = sync_to_async(render)
+
+
+async def _evaluate(queryset):
+    """クエリセットを評価してリストにする"""
+    return [obj async for obj in queryset]
+
+
+async def _evaluate_page(page):
+    """ページの件数を取得済みの Page のオブジェクトを評価する"""
+    page.object_list = await _evaluate(page.object_list)
+    return page
+
+
+# ========== 写真関連ビュー ==========
+
+@cache_public_page('photo', 'tag', 'member', 'album', 'favorite')
+async def photo_gallery(request):
+    """フォトギャラリー一覧ページ"""
+    try:
+        # お気に入りの判定に使うユーザーを先に取得しておく
+        await aget_request_user(request)
+        photos, search_query, current_filters = _gallery_queryset(request)
+
+        # ページネーション（件数のクエリは get_page が実行する）
+        paginator = Paginator(photos, PHOTO_BATCH_SIZE)
+        page_obj = await _evaluate_page(
+            await sync_to_async(paginator.get_page)(request.GET.get('page'))
+        )
+
+        context = {
+            'page_obj': page_obj,
+            'filter_data': {
+                key: await _evaluate(queryset)
+                for key, queryset in _gallery_filter_data().items()
+            },
+            'search_query': search_query,
+            'current_filters': current_filters,
+            'next_batch_url': _gallery_next_batch_url(request, page_obj),
+        }
+
+        return await arender(request, 'main/photo_gallery.html', context)
+
+    except Exception as e:
+        logger.error(f"フォトギャラリーの表示でエラーが発生しました: {e}")
+        messages.error(request, 'フォトギャラリーの読み込み中にエラーが発生しました。')
+        return await arender(request, 'main/photo_gallery.html', {'page_obj': None})
+
+
+@conditional_page(_photo_detail_validators)
+@cache_public_page('photo:{pk}')
+async def photo_detail(request, pk):
+    """写真詳細ページ"""
+    try:
+        user = await aget_request_user(request)
+        photo = await aget_object_or_404(_photo_detail_queryset(user), pk=pk)
+
+        # アルバム・タグ・メンバーの変更でこのページのキャッシュを無効化する
+        add_cache_tags(request, *_photo_cache_tags(photo))
+
+        context = {
+            'photo': photo,
+            'related_photos': await _evaluate(_related_photos(photo)),
+        }
+
+        return await arender(request, 'main/photo_detail.html', context)
+
+    except Http404:
+        messages.error(request, '指定された写真が見つかりません。')
+        return redirect('photo_gallery')
+
+    except Exception as e:
+        logger.error(f"写真詳細ページでエラーが発生しました: {e}")
+        messages.error(request, '写真詳細の取得中にエラーが発生しました。')
+        return redirect('photo_gallery')
+
+
+# ========== イベント関連ビュー ==========
+
+async def event_calendar(request):
+    """イベントカレンダー"""
+    try:
+        # 検索フォーム（検証でクエリを実行する）
+        search_form = EventSearchForm(request.GET or None)
+        events = await sync_to_async(_calendar_events)(search_form)
+
+        # 今日と今週のイベント
+        today = timezone.now().date()
+        today_events, this_week_events = _week_events(events, today)
+
+        events_page = await sync_to_async(_events_page)(events, request.GET.get('page'))
+
+        context = {
+            'search_form': search_form,
+            'events': await _evaluate_page(events_page),
+            'today_events': await _evaluate(today_events),
+            'this_week_events': await _evaluate(this_week_events),
+            'category_stats': await _evaluate(_category_stats()),
+            'today': today,
+        }
+
+        return await arender(request, 'main/event_calendar.html', context)
+
+    except Exception as e:
+        logger.error(f"イベントカレンダーでエラー: {str(e)}")
+        return _event_calendar_error(e)
+
+
+async def upcoming_events_api(request):
+    """今後のイベントAPI（Ajax用）"""
+    try:
+        days = int(request.GET.get('days', 7))  # デフォルト7日間
+        events_data = [_event_data(event) async for event in _upcoming_events(days)]
+
+        return JsonResponse({
+            'success': True,
+            'events': events_data,
+            'count': len(events_data)
+        })
+
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'message': f'エラーが発生しました: {str(e)}'
+        })
+
+
+# ========== ライブ更新 ==========
+
+# 切断時にブラウザが再接続するまでの時間（ミリ秒）
+LIVE_RETRY_MS = 5000
+
+
+async def _live_stream(last_event_id):
+    """変更通知をSSEの形式で送り続ける"""
+    subscription = live.subscribe(last_event_id)
+    try:
+        yield f'retry: {LIVE_RETRY_MS}\n\n'
+        while True:
+            message = await subscription.get(settings.LIVE_UPDATES_KEEPALIVE)
+            if subscription.overflowed:
+                # 取りこぼした通知があるため、ページの再読み込みを促して切断する
+                yield 'event: reset\ndata: {}\n\n'
+                return
+            if message is None:
+                # プロキシに切断されないよう、通知が無い間もコメントを送る
+                yield ': keepalive\n\n'
+                continue
+            yield live.format_event(message)
+    finally:
+        subscription.close()
+
+
+async def live_updates(request):
+    """写真・アルバム・イベントの変更通知（Server-Sent Events）"""
+    if not settings.LIVE_UPDATES:
+        # 204 を返すと EventSource は再接続しない
+        return HttpResponse(status=204)
+
+    try:
+        last_event_id = int(request.headers.get('Last-Event-ID', ''))
+    except ValueError:
+        last_event_id = None
+
+    response = StreamingHttpResponse(_live_stream(last_event_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # nginx などのプロキシにバッファリングさせない
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,187 @@
+"""
+写真の一括編集
+
+大量の写真に対するタグ・家族メンバー・アルバムの付け外しを、
+中間テーブルへの bulk_create(ignore_conflicts=True) と1回の DELETE で行う。
+シグナルは発行されないため、キャッシュの無効化と同期用の変更履歴の記録はまとめて1回で行う。
+"""
+
+from django.db import transaction
+
+from .models import ChangeLog, FamilyMember, FamilyPhoto, PhotoTag, PhotoAlbum
+from .utils.cache import bump_versions, object_tag
+
+# IN句に渡すIDの最大数（SQLiteの変数上限を超えないように分割する）
+CHUNK_SIZE = 500
+
+# 中間テーブルの写真側の列名
+PHOTO_COLUMN = 'familyphoto_id'
+
+# 多対多の一括操作: アクション名 -> (中間テーブル, 相手側の列名, 相手側モデル, 名前空間)
+M2M_TARGETS = {
+    'tags': (FamilyPhoto.tags.through, 'phototag_id', PhotoTag, 'tag'),
+    'members': (FamilyPhoto.family_members.through, 'familymember_id', FamilyMember, 'member'),
+}
+
+BULK_ACTION_CHOICES = [
+    ('add_tags', 'タグを追加'),
+    ('remove_tags', 'タグを外す'),
+    ('add_members', '家族メンバーを追加'),
+    ('remove_members', '家族メンバーを外す'),
+    ('set_album', 'アルバムを設定'),
+    ('clear_album', 'アルバムから外す'),
+]
+
+
+class BulkEditError(ValueError):
+    """一括編集の指定が不正な場合のエラー"""
+
+
+def _chunks(ids):
+    ids = list(ids)
+    for start in range(0, len(ids), CHUNK_SIZE):
+        yield ids[start:start + CHUNK_SIZE]
+
+
+def _existing_ids(model, ids):
+    """存在するIDだけを返す"""
+    found = []
+    for chunk in _chunks(set(ids)):
+        found += model.objects.filter(pk__in=chunk).values_list('pk', flat=True)
+    return sorted(found)
+
+
+def add_m2m(kind, photo_ids, target_ids):
+    """
+    写真にタグ・家族メンバーを一括で追加する
+
+    Args:
+        kind (str): 'tags' または 'members'
+        photo_ids (iterable): 写真のID
+        target_ids (iterable): タグまたは家族メンバーのID
+
+    Returns:
+        int: 新しく追加した関連の数
+    """
+    through, column, model, namespace = M2M_TARGETS[kind]
+    photo_ids = _existing_ids(FamilyPhoto, photo_ids)
+    target_ids = _existing_ids(model, target_ids)
+    if not photo_ids or not target_ids:
+        return 0
+
+    owner = PHOTO_COLUMN
+    existing = 0
+    for chunk in _chunks(photo_ids):
+        existing += through.objects.filter(
+            **{f'{owner}__in': chunk, f'{column}__in': target_ids}
+        ).count()
+
+    through.objects.bulk_create(
+        [
+            through(**{owner: photo_id, column: target_id})
+            for photo_id in photo_ids
+            for target_id in target_ids
+        ],
+        ignore_conflicts=True,
+        batch_size=CHUNK_SIZE,
+    )
+    _invalidate(photo_ids, namespace, target_ids)
+    return len(photo_ids) * len(target_ids) - existing
+
+
+def remove_m2m(kind, photo_ids, target_ids):
+    """
+    写真からタグ・家族メンバーを一括で外す
+
+    Returns:
+        int: 削除した関連の数
+    """
+    through, column, model, namespace = M2M_TARGETS[kind]
+    photo_ids = sorted(set(photo_ids))
+    target_ids = sorted(set(target_ids))
+    if not photo_ids or not target_ids:
+        return 0
+
+    owner = PHOTO_COLUMN
+    deleted = 0
+    for chunk in _chunks(photo_ids):
+        count, _ = through.objects.filter(
+            **{f'{owner}__in': chunk, f'{column}__in': target_ids}
+        ).delete()
+        deleted += count
+    _invalidate(photo_ids, namespace, target_ids)
+    return deleted
+
+
+def set_album(photo_ids, album_id):
+    """
+    写真のアルバムを一括で変更する
+
+    Args:
+        photo_ids (iterable): 写真のID
+        album_id (int or None): アルバムのID（Noneでアルバムから外す）
+
+    Returns:
+        int: 更新した写真の数
+    """
+    if album_id is not None and not PhotoAlbum.objects.filter(pk=album_id).exists():
+        raise BulkEditError('指定されたアルバムが見つかりません。')
+
+    photo_ids = sorted(set(photo_ids))
+    old_album_ids = set()
+    updated = 0
+    for chunk in _chunks(photo_ids):
+        photos = FamilyPhoto.objects.filter(pk__in=chunk)
+        old_album_ids.update(
+            photos.exclude(album_id=None).values_list('album_id', flat=True).distinct()
+        )
+        updated += photos.update(album_id=album_id)
+
+    album_ids = old_album_ids | ({album_id} if album_id else set())
+    _invalidate(photo_ids, 'album', album_ids)
+    PhotoAlbum.refresh_summaries_on_commit(album_ids)
+    return updated
+
+
+def apply_bulk_action(action, photo_ids, target_ids=(), album_id=None):
+    """
+    一括編集のアクションを実行する
+
+    Args:
+        action (str): BULK_ACTION_CHOICES のいずれか
+        photo_ids (iterable): 写真のID
+        target_ids (iterable): タグまたは家族メンバーのID
+        album_id (int or None): set_album で設定するアルバムのID
+
+    Returns:
+        int: 変更した件数
+
+    Raises:
+        BulkEditError: アクションや指定が不正な場合
+    """
+    with transaction.atomic():
+        if action == 'add_tags':
+            return add_m2m('tags', photo_ids, target_ids)
+        if action == 'remove_tags':
+            return remove_m2m('tags', photo_ids, target_ids)
+        if action == 'add_members':
+            return add_m2m('members', photo_ids, target_ids)
+        if action == 'remove_members':
+            return remove_m2m('members', photo_ids, target_ids)
+        if action == 'set_album':
+            if album_id is None:
+                raise BulkEditError('アルバムを指定してください。')
+            return set_album(photo_ids, album_id)
+        if action == 'clear_album':
+            return set_album(photo_ids, None)
+    raise BulkEditError(f'不明なアクションです: {action}')
+
+
+def _invalidate(photo_ids, namespace, target_ids):
+    """変更した写真と相手側のキャッシュをまとめて無効化し、写真の変更を記録する"""
+    ChangeLog.record('photo', photo_ids, ChangeLog.UPDATED)
+    transaction.on_commit(lambda: bump_versions(
+        'photo', 'album', namespace,
+        *[object_tag('photo', pk) for pk in photo_ids],
+        *[object_tag(namespace, pk) for pk in target_ids],
+    ))
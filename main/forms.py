@@ -2,6 +2,7 @@ from django import forms
 from django.core.exceptions import ValidationError
 from .models import FamilyMember, FamilyPhoto, PhotoTag, PhotoAlbum, EventCategory, FamilyEvent
 from .utils.helpers import validate_image_size, is_image_file
+from .bulk import BULK_ACTION_CHOICES
 
 
 class FamilyMemberForm(forms.ModelForm):
@@ -95,7 +96,7 @@ class PhotoAlbumForm(forms.ModelForm):
     
     class Meta:
         model = PhotoAlbum
-        fields = ['title', 'description', 'cover_photo', 'is_public']
+        fields = ['title', 'description', 'cover_photo', 'cover_style', 'is_public']
         widgets = {
             'title': forms.TextInput(attrs={
                 'class': 'form-control',
@@ -111,6 +112,9 @@ class PhotoAlbumForm(forms.ModelForm):
                 'class': 'form-control',
                 'accept': 'image/*'
             }),
+            'cover_style': forms.Select(attrs={
+                'class': 'form-control'
+            }),
             'is_public': forms.CheckboxInput(attrs={
                 'class': 'form-check-input'
             }),
@@ -137,7 +141,7 @@ class FamilyPhotoForm(forms.ModelForm):
         model = FamilyPhoto
         fields = [
             'title', 'image', 'description', 'taken_date', 'location',
-            'family_members', 'tags', 'album', 'is_favorite', 'is_public'
+            'family_members', 'tags', 'album', 'is_public'
         ]
         widgets = {
             'title': forms.TextInput(attrs={
@@ -172,9 +176,6 @@ class FamilyPhotoForm(forms.ModelForm):
             'album': forms.Select(attrs={
                 'class': 'form-control'
             }),
-            'is_favorite': forms.CheckboxInput(attrs={
-                'class': 'form-check-input'
-            }),
             'is_public': forms.CheckboxInput(attrs={
                 'class': 'form-check-input'
             }),
@@ -485,3 +486,62 @@ class EventSearchForm(forms.Form):
         }),
         label='今後のイベントのみ'
     )
+
+
+class PhotoBulkEditForm(forms.Form):
+    """写真の一括編集フォーム（管理画面のアクション用）"""
+    
+    action = forms.ChoiceField(
+        choices=BULK_ACTION_CHOICES,
+        widget=forms.Select(attrs={
+            'class': 'form-control'
+        }),
+        label='操作'
+    )
+    
+    tags = forms.ModelMultipleChoiceField(
+        queryset=PhotoTag.objects.all(),
+        required=False,
+        widget=forms.CheckboxSelectMultiple,
+        label='タグ'
+    )
+    
+    members = forms.ModelMultipleChoiceField(
+        queryset=FamilyMember.objects.filter(is_active=True),
+        required=False,
+        widget=forms.CheckboxSelectMultiple,
+        label='家族メンバー'
+    )
+    
+    album = forms.ModelChoiceField(
+        queryset=PhotoAlbum.objects.all(),
+        required=False,
+        empty_label='アルバムを選択',
+        widget=forms.Select(attrs={
+            'class': 'form-control'
+        }),
+        label='アルバム'
+    )
+    
+    def clean(self):
+        """操作に必要な項目が選択されているかチェック"""
+        cleaned_data = super().clean()
+        action = cleaned_data.get('action')
+        
+        if action in ('add_tags', 'remove_tags') and not cleaned_data.get('tags'):
+            raise ValidationError('タグを選択してください。')
+        if action in ('add_members', 'remove_members') and not cleaned_data.get('members'):
+            raise ValidationError('家族メンバーを選択してください。')
+        if action == 'set_album' and not cleaned_data.get('album'):
+            raise ValidationError('アルバムを選択してください。')
+        
+        return cleaned_data
+    
+    def target_ids(self):
+        """操作対象のタグ・家族メンバーのIDを返す"""
+        action = self.cleaned_data['action']
+        if action.endswith('_tags'):
+            return [tag.pk for tag in self.cleaned_data['tags']]
+        if action.endswith('_members'):
+            return [member.pk for member in self.cleaned_data['members']]
+        return []
@@ -0,0 +1,297 @@
+"""
+ライブ更新（Server-Sent Events、/live/）の配信
+
+写真・アルバム・イベントの変更は、モデルのシグナル（main.signals）からコミット後に
+publish() される。通知はプロセス内の1つの Broadcaster が、接続中の全てのクライアント
+（接続ごとの asyncio.Queue）に配信する。
+
+gunicorn など複数のワーカープロセスで動かす場合は LIVE_UPDATES_SOCKET_DIR を設定する。
+各プロセスはそのディレクトリの「<pid>.sock」（Unixドメインのデータグラムソケット）で
+待ち受け、publish() した通知を他のプロセスのソケットにも送る（Redis の pub/sub の
+代わりで、同じホスト内のプロセス間のみ）。終了したプロセスのソケットは送信時に削除する。
+"""
+
+import asyncio
+import atexit
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+from django.conf import settings
+
+from .utils.metrics import Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+# Last-Event-ID での再接続時に再送するため、直近の通知を保持する件数
+RECENT_SIZE = 200
+# 接続ごとの未送信の通知の上限（再送分が入るように RECENT_SIZE 以上にする）
+QUEUE_SIZE = 256
+# データグラム1件の最大サイズ
+MAX_DATAGRAM = 64 * 1024
+
+LIVE_CONNECTIONS = Gauge(
+    'family_live_connections', 'ライブ更新（SSE）の接続数',
+)
+LIVE_QUEUED = Gauge(
+    'family_live_queued_messages', 'ライブ更新の接続ごとのキューにある未送信の通知数の合計',
+)
+LIVE_OVERFLOWS = Counter(
+    'family_live_overflows_total', 'キューが一杯で通知を取りこぼした接続数',
+)
+
+
+class Subscription:
+    """1つの接続への配信キュー"""
+
+    def __init__(self, broadcaster, loop):
+        self.broadcaster = broadcaster
+        self.loop = loop
+        self.queue = asyncio.Queue(QUEUE_SIZE)
+        # 送信が追いつかずに通知を取りこぼした場合（クライアントには再読み込みを促す）
+        self.overflowed = False
+        self.closed = False
+
+    def put(self, message):
+        """通知をキューに追加する（接続のイベントループ内で呼び出す）"""
+        if self.closed:
+            return
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            if not self.overflowed:
+                LIVE_OVERFLOWS.inc()
+            self.overflowed = True
+        else:
+            LIVE_QUEUED.inc()
+
+    async def get(self, timeout):
+        """
+        次の通知を待つ
+
+        Args:
+            timeout (float): 待つ秒数
+
+        Returns:
+            dict or None: 通知（時間内に無かった場合はNone）
+        """
+        try:
+            message = await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        LIVE_QUEUED.dec()
+        return message
+
+    def close(self):
+        self.broadcaster.unsubscribe(self)
+
+
+class Broadcaster:
+    """プロセス内の全ての接続に通知を配信する"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = set()
+        self.recent = deque(maxlen=RECENT_SIZE)
+
+    def subscribe(self, last_event_id=None):
+        """
+        接続を登録する（接続のイベントループ内で呼び出す）
+
+        Args:
+            last_event_id (int): クライアントが最後に受け取った通知のID（以降の通知を再送する）
+
+        Returns:
+            Subscription: 配信キュー
+        """
+        subscription = Subscription(self, asyncio.get_running_loop())
+        with self._lock:
+            self._subscriptions.add(subscription)
+            if last_event_id is not None:
+                for message in self.recent:
+                    if message['seq'] > last_event_id:
+                        subscription.put(message)
+        LIVE_CONNECTIONS.inc()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            if subscription not in self._subscriptions:
+                return
+            self._subscriptions.discard(subscription)
+            subscription.closed = True
+        LIVE_CONNECTIONS.dec()
+        # 送信されずに残った通知
+        LIVE_QUEUED.dec(subscription.queue.qsize())
+
+    def dispatch(self, message):
+        """
+        全ての接続に通知を配信する（任意のスレッドから呼び出せる）
+
+        Args:
+            message (dict): 通知
+        """
+        with self._lock:
+            self.recent.append(message)
+            subscriptions = list(self._subscriptions)
+
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.put, message)
+            except RuntimeError:
+                # イベントループが終了している
+                self.unsubscribe(subscription)
+
+
+class SocketRelay:
+    """同じホストの他のワーカープロセスに通知を中継する"""
+
+    def __init__(self, directory, broadcaster):
+        self.directory = Path(directory)
+        self.broadcaster = broadcaster
+        self._lock = threading.Lock()
+        self._pid = None
+        self._sender = None
+
+    @property
+    def path(self):
+        return self.directory / f'{os.getpid()}.sock'
+
+    def start(self):
+        """このプロセスのソケットで受信を始める（fork 後のプロセスごとに1回）"""
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._sender = None
+
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self.path.unlink(missing_ok=True)
+            receiver = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            receiver.bind(str(self.path))
+            atexit.register(self.path.unlink, missing_ok=True)
+            threading.Thread(
+                target=self._receive, args=(receiver,), name='live-relay', daemon=True
+            ).start()
+
+    def _receive(self, receiver):
+        while True:
+            data = receiver.recv(MAX_DATAGRAM)
+            try:
+                message = json.loads(data)
+            except ValueError:
+                logger.warning('ライブ更新の不正な通知を受信しました')
+                continue
+            self.broadcaster.dispatch(message)
+
+    def send(self, message):
+        """
+        他のプロセスのソケットに通知を送る
+
+        Args:
+            message (dict): 通知
+        """
+        self.start()
+        data = json.dumps(message, ensure_ascii=False).encode()
+        if self._sender is None:
+            self._sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            self._sender.setblocking(False)
+
+        own = self.path
+        for path in self.directory.glob('*.sock'):
+            if path == own:
+                continue
+            try:
+                self._sender.sendto(data, str(path))
+            except (ConnectionRefusedError, FileNotFoundError):
+                # 終了したプロセスのソケット
+                path.unlink(missing_ok=True)
+            except BlockingIOError:
+                logger.warning(f'ライブ更新の通知を送れませんでした（受信側の処理の遅れ）: {path.name}')
+
+
+broadcaster = Broadcaster()
+_relay = None
+_last_seq = 0
+_seq_lock = threading.Lock()
+
+
+def get_relay():
+    """LIVE_UPDATES_SOCKET_DIR が設定されている場合の中継（未設定ならNone）"""
+    global _relay
+    if settings.LIVE_UPDATES_SOCKET_DIR and _relay is None:
+        _relay = SocketRelay(settings.LIVE_UPDATES_SOCKET_DIR, broadcaster)
+    return _relay
+
+
+def subscribe(last_event_id=None):
+    """
+    ライブ更新の接続を登録する（接続のイベントループ内で呼び出す）
+
+    Args:
+        last_event_id (int): クライアントが最後に受け取った通知のID
+
+    Returns:
+        Subscription: 配信キュー
+    """
+    relay = get_relay()
+    if relay:
+        relay.start()
+    return broadcaster.subscribe(last_event_id)
+
+
+def next_seq():
+    """
+    通知のIDを採番する
+
+    プロセスをまたいでも概ね順序が保たれるよう、マイクロ秒単位の時刻を使う
+    （同じプロセス内では必ず増加する）。
+    """
+    global _last_seq
+    with _seq_lock:
+        _last_seq = max(_last_seq + 1, time.time_ns() // 1000)
+        return _last_seq
+
+
+def change_message(kind, action, obj):
+    """
+    変更通知を作成する
+
+    Args:
+        kind (str): 'photo'・'album'・'event'
+        action (str): 'created'・'updated'・'deleted'
+        obj: 変更されたオブジェクト
+
+    Returns:
+        dict: 通知（seq は publish() が設定する）
+    """
+    message = {'type': kind, 'action': action, 'pk': obj.pk}
+    if action != 'deleted':
+        message['title'] = obj.title
+        message['url'] = obj.get_absolute_url()
+    return message
+
+
+def publish(message):
+    """
+    変更通知を全ての接続（他のプロセスを含む）に配信する
+
+    Args:
+        message (dict): change_message() の通知
+    """
+    message = {'seq': next_seq(), **message}
+    broadcaster.dispatch(message)
+    relay = get_relay()
+    if relay:
+        relay.send(message)
+
+
+def format_event(message):
+    """通知をSSEのイベントの形式にする"""
+    data = json.dumps(message, ensure_ascii=False, separators=(',', ':'))
+    return f"id: {message['seq']}\nevent: change\ndata: {data}\n\n"
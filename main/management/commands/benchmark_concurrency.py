@@ -0,0 +1,211 @@
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from main.utils.timing import percentile
+
+DEFAULT_PATHS = ['/gallery/', '/events/', '/api/upcoming-events/']
+
+# --start で起動するサーバー（名前 -> gunicorn の引数）
+SERVERS = {
+    'wsgi': ['family_app.wsgi:application'],
+    'asgi': ['family_app.asgi:application', '-k', 'uvicorn.workers.UvicornWorker'],
+}
+
+
+def fetch(host, port, path, line_delay=0.0, timeout=30):
+    """
+    HTTPリクエストを1回送信する
+
+    通信の遅いクライアントを再現するため、line_delay を指定するとヘッダーを
+    1行ずつ間隔を空けて送信する。
+
+    Args:
+        host (str): ホスト
+        port (int): ポート
+        path (str): パス
+        line_delay (float): ヘッダー1行ごとの待ち時間（秒）
+        timeout (float): タイムアウト（秒）
+
+    Returns:
+        tuple: (ステータスコード（接続エラーは0）, 応答時間(ms))
+    """
+    lines = [
+        f'GET {path} HTTP/1.1',
+        f'Host: {host}',
+        'User-Agent: benchmark_concurrency',
+        'Accept: */*',
+        'Connection: close',
+    ]
+    started = time.perf_counter()
+    try:
+        with socket.create_connection((host, port), timeout=timeout) as sock:
+            if line_delay:
+                for line in lines:
+                    sock.sendall(f'{line}\r\n'.encode())
+                    time.sleep(line_delay)
+                sock.sendall(b'\r\n')
+            else:
+                sock.sendall(('\r\n'.join(lines) + '\r\n\r\n').encode())
+
+            chunks = []
+            while True:
+                data = sock.recv(65536)
+                if not data:
+                    break
+                chunks.append(data)
+    except OSError:
+        return 0, (time.perf_counter() - started) * 1000
+
+    response = b''.join(chunks)
+    try:
+        status = int(response.split(b' ', 2)[1])
+    except (IndexError, ValueError):
+        status = 0
+    return status, (time.perf_counter() - started) * 1000
+
+
+class Command(BaseCommand):
+    help = '同時接続数を変えてサーバーのスループットと応答時間を計測します（WSGI と ASGI の比較用）'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--target', action='append', default=[], metavar='NAME=URL',
+            help='計測するサーバー（例: wsgi=http://localhost:8101）。複数指定できる'
+        )
+        parser.add_argument(
+            '--start', action='store_true',
+            help='gunicorn で WSGI（同期ワーカー）と ASGI（uvicorn ワーカー）のサーバーを起動して計測する'
+        )
+        parser.add_argument('--workers', type=int, default=2, help='--start で起動するワーカー数（デフォルト: 2）')
+        parser.add_argument('--base-port', type=int, default=8101, help='--start で使う最初のポート（デフォルト: 8101）')
+        parser.add_argument(
+            '--paths', default=','.join(DEFAULT_PATHS),
+            help=f'計測するパス（カンマ区切り、デフォルト: {",".join(DEFAULT_PATHS)}）'
+        )
+        parser.add_argument('--concurrency', type=int, default=20, help='同時に送信するクライアント数（デフォルト: 20）')
+        parser.add_argument('--requests', type=int, default=200, help='パスごとのリクエスト数（デフォルト: 200）')
+        parser.add_argument(
+            '--slow-clients', type=int, default=0,
+            help='計測中に並行して動かす、通信の遅いクライアントの数（デフォルト: 0）'
+        )
+        parser.add_argument(
+            '--slow-delay-ms', type=int, default=200,
+            help='遅いクライアントがヘッダー1行ごとに待つ時間（ミリ秒、デフォルト: 200）'
+        )
+
+    def handle(self, *args, **options):
+        paths = [path for path in options['paths'].split(',') if path]
+        targets = self.parse_targets(options['target'])
+        processes = []
+        try:
+            if options['start']:
+                for offset, (name, server_args) in enumerate(SERVERS.items()):
+                    port = options['base_port'] + offset
+                    processes.append(self.start_server(server_args, port, options['workers']))
+                    targets.append((name, '127.0.0.1', port))
+            if not targets:
+                raise CommandError('--target または --start を指定してください。')
+
+            self.stdout.write(
+                f'同時接続 {options["concurrency"]} / パスごと {options["requests"]}件 / '
+                f'遅いクライアント {options["slow_clients"]}（{options["slow_delay_ms"]}ms/行）\n'
+            )
+            self.stdout.write(
+                f'{"サーバー":<8}{"パス":<26}{"req/s":>9}{"p50":>9}{"p95":>9}{"p99":>9}{"エラー":>4}'
+            )
+            for name, host, port in targets:
+                for path in paths:
+                    result = self.run(host, port, path, options)
+                    self.stdout.write(
+                        f'{name:<12}{path:<28}{result["rps"]:>9.1f}{result["p50"]:>9.1f}'
+                        f'{result["p95"]:>9.1f}{result["p99"]:>9.1f}{result["errors"]:>7}'
+                    )
+        finally:
+            for process in processes:
+                process.terminate()
+                process.wait(timeout=10)
+
+    def parse_targets(self, values):
+        """NAME=URL の一覧を (名前, ホスト, ポート) にする"""
+        targets = []
+        for value in values:
+            name, sep, url = value.partition('=')
+            parts = urlsplit(url if sep else value)
+            if not parts.hostname:
+                raise CommandError(f'URLが不正です: {value}')
+            targets.append((name if sep else parts.netloc, parts.hostname, parts.port or 80))
+        return targets
+
+    def start_server(self, server_args, port, workers):
+        """gunicorn を起動し、接続できるようになるまで待つ"""
+        command = [
+            sys.executable, '-m', 'gunicorn', *server_args,
+            '--bind', f'127.0.0.1:{port}', '--workers', str(workers), '--log-level', 'warning',
+        ]
+        try:
+            process = subprocess.Popen(command, env=os.environ.copy())
+        except OSError as e:
+            raise CommandError(f'サーバーを起動できません: {e}')
+
+        deadline = time.monotonic() + 20
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise CommandError(f'サーバーが終了しました（gunicorn・uvicorn はインストール済みですか？）: {" ".join(command)}')
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout=1).close()
+                return process
+            except OSError:
+                time.sleep(0.2)
+        process.terminate()
+        raise CommandError(f'サーバーが起動しませんでした: {" ".join(command)}')
+
+    def run(self, host, port, path, options):
+        """
+        1つのパスを計測する
+
+        遅いクライアントは計測が終わるまでリクエストを繰り返し、ワーカーを占有し続ける。
+        """
+        fetch(host, port, path)  # ウォームアップ
+
+        stop = threading.Event()
+        line_delay = options['slow_delay_ms'] / 1000
+
+        def slow_client():
+            while not stop.is_set():
+                fetch(host, port, path, line_delay=line_delay)
+
+        slow_threads = [
+            threading.Thread(target=slow_client, daemon=True)
+            for _ in range(options['slow_clients'])
+        ]
+        for thread in slow_threads:
+            thread.start()
+
+        try:
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+                results = list(executor.map(
+                    lambda _: fetch(host, port, path), range(options['requests'])
+                ))
+            elapsed = time.perf_counter() - started
+        finally:
+            stop.set()
+            for thread in slow_threads:
+                thread.join()
+
+        timings = [timing for status, timing in results if 0 < status < 500]
+        return {
+            'rps': len(timings) / elapsed,
+            'p50': percentile(timings, 50) if timings else 0,
+            'p95': percentile(timings, 95) if timings else 0,
+            'p99': percentile(timings, 99) if timings else 0,
+            'errors': len(results) - len(timings),
+        }
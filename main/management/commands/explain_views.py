@@ -0,0 +1,196 @@
+import re
+from contextlib import ExitStack
+
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from main.utils.view_urls import collect_urls, request_url
+
+# 1つの列だけで並べ替えて LIMIT で件数を絞るクエリ
+# （例: ORDER BY "main_changelog"."seq" DESC LIMIT 1、ORDER BY 1 DESC LIMIT 1）
+SINGLE_ORDER_RE = re.compile(
+    r'ORDER BY (?:"(?P<table>\w+)"\."(?P<column>\w+)"|(?P<position>\d+)) (?:ASC|DESC)\s+LIMIT ', re.I
+)
+SELECT_COLUMNS_RE = re.compile(r'^\s*SELECT (?P<columns>.*?) FROM ', re.I | re.S)
+COLUMN_RE = re.compile(r'^"(?P<table>\w+)"\."(?P<column>\w+)"')
+
+# モデルのテーブル名（中間テーブルを含む）
+TABLES = {model._meta.db_table for model in apps.get_models(include_auto_created=True)}
+
+# テーブル名 -> INTEGER PRIMARY KEY（rowid）の列名
+INTEGER_PRIMARY_KEYS = {
+    model._meta.db_table: model._meta.pk.column
+    for model in apps.get_models()
+    if model._meta.pk.get_internal_type() in ('AutoField', 'BigAutoField', 'SmallAutoField')
+}
+
+class Command(BaseCommand):
+    help = '各ビューが実行するクエリのEXPLAINを取得し、シーケンシャルスキャンを報告します'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'url_names', nargs='*',
+            help='対象のURL名（省略時は main/urls.py の全てのURL）'
+        )
+        parser.add_argument(
+            '--user', default=None,
+            help='ログインして実行するユーザー名（省略時は最初のスーパーユーザー）'
+        )
+        parser.add_argument(
+            '--show-plans', action='store_true',
+            help='全てのクエリの実行計画を表示する'
+        )
+        parser.add_argument(
+            '--fail-on-seq-scan', action='store_true',
+            help='シーケンシャルスキャンがあれば終了コード1で終了する'
+        )
+
+    def handle(self, *args, **options):
+        urls, missing = collect_urls(options['url_names'])
+        for name in missing:
+            self.stdout.write(self.style.WARNING(f'  スキップ: {name}（URLの引数に使うデータがありません）'))
+        client = Client()
+        user = self.get_user(options['user'])
+        if user:
+            client.force_login(user)
+
+        self.stdout.write(self.style.SUCCESS('ビューのクエリを解析中...'))
+        self.stdout.write('（実データに近い件数で実行してください。件数が少ないと、'
+                          'インデックスがあってもスキャンが選ばれることがあります。'
+                          'POSTのURLも実行しますが、変更はURLごとにロールバックします）\n')
+
+        flagged_total = 0
+        # キャッシュを無効にして、毎回ビューのクエリを実行させる
+        with override_settings(
+            ALLOWED_HOSTS=['*'],
+            PAGE_CACHE_ENABLED=False,
+            CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}},
+        ):
+            for name, url in urls:
+                flagged_total += self.explain_url(client, name, url, options['show_plans'])
+
+        if flagged_total:
+            self.stdout.write(self.style.WARNING(
+                f'\n⚠️ シーケンシャルスキャンを含むクエリ: {flagged_total}件'
+            ))
+            if options['fail_on_seq_scan']:
+                raise CommandError('シーケンシャルスキャンが見つかりました。')
+        else:
+            self.stdout.write(self.style.SUCCESS('\n✅ シーケンシャルスキャンは見つかりませんでした'))
+
+    def get_user(self, username):
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f'ユーザー「{username}」が見つかりません。')
+        return User.objects.filter(is_superuser=True).first()
+
+    def explain_url(self, client, name, url, show_plans):
+        """URLを実行して実行計画を確認する（POSTによる変更はURLごとにロールバックする）"""
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(transaction.atomic(using=alias))
+                stack.callback(transaction.set_rollback, True, using=alias)
+            return self.explain_queries(client, name, url, show_plans)
+
+    def explain_queries(self, client, name, url, show_plans):
+        """URLを実行し、クエリごとの実行計画を確認する"""
+        with ExitStack() as stack:
+            captured = {
+                alias: stack.enter_context(CaptureQueriesContext(connections[alias]))
+                for alias in connections
+            }
+            response = request_url(client, name, url)
+
+        queries = [
+            (alias, query['sql'])
+            for alias, context in captured.items()
+            for query in context.captured_queries
+        ]
+        self.stdout.write(f'\n📄 {name} {url} → {response.status_code}（クエリ {len(queries)}件）')
+
+        flagged = 0
+        seen = set()
+        for alias, sql in queries:
+            if not sql.lstrip().upper().startswith('SELECT') or sql in seen:
+                continue
+            seen.add(sql)
+
+            plan = self.explain(connections[alias], sql)
+            vendor = connections[alias].vendor
+            if vendor == 'sqlite':
+                plan = self.mark_rowid_scans(plan, sql)
+            scans = [line for line in plan if self.is_seq_scan(vendor, line)]
+            if scans:
+                flagged += 1
+                self.stdout.write(self.style.WARNING(f'  ⚠️ {"; ".join(scans)}'))
+                self.stdout.write(f'     {sql[:300]}')
+            if show_plans:
+                for line in plan:
+                    self.stdout.write(f'     | {line}')
+        return flagged
+
+    def explain(self, connection, sql):
+        """実行計画を行のリストで取得する"""
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                return [row[-1] for row in cursor.fetchall()]
+            if connection.vendor == 'postgresql':
+                cursor.execute(f'EXPLAIN {sql}')
+                return [row[0] for row in cursor.fetchall()]
+        raise CommandError(f'{connection.vendor} のEXPLAINには対応していません。')
+
+    def mark_rowid_scans(self, plan, sql):
+        """
+        主キー（rowid）の順に LIMIT 件だけ読む走査を「SCAN table USING INTEGER PRIMARY KEY」にする
+
+        SQLiteは「ORDER BY seq DESC LIMIT 1」のような rowid 順の走査も「SCAN table」と
+        表示するが、並べ替えなし（USE TEMP B-TREE FOR ORDER BY がない）で先頭から
+        読むだけなので主キーの検索と同じく速い。
+        """
+        if any('USE TEMP B-TREE FOR ORDER BY' in line for line in plan):
+            return plan
+        table, column = self.order_column(sql)
+        if table is None or INTEGER_PRIMARY_KEYS.get(table) != column:
+            return plan
+        rowid_scan = f'SCAN {table}'
+        return [
+            f'{line} USING INTEGER PRIMARY KEY' if line == rowid_scan else line
+            for line in plan
+        ]
+
+    def order_column(self, sql):
+        """
+        1つの列だけで並べ替えて LIMIT を付けたクエリの、並べ替えの列
+
+        Returns:
+            tuple: (テーブル名, 列名)。該当しない場合は (None, None)
+        """
+        match = SINGLE_ORDER_RE.search(sql)
+        if not match:
+            return None, None
+        if match.group('position') is None:
+            return match.group('table'), match.group('column')
+
+        # ORDER BY 1 は SELECT の1番目の列を指す
+        select = SELECT_COLUMNS_RE.match(sql)
+        columns = select.group('columns').split(', ') if select else []
+        position = int(match.group('position'))
+        column = COLUMN_RE.match(columns[position - 1]) if 0 < position <= len(columns) else None
+        return (column.group('table'), column.group('column')) if column else (None, None)
+
+    def is_seq_scan(self, vendor, line):
+        if vendor == 'sqlite':
+            # 「SCAN table」は全件走査、「SCAN table USING (COVERING) INDEX」はインデックス順の走査、
+            # 「SCAN table USING INTEGER PRIMARY KEY」は rowid 順の走査。
+            # 「SCAN (subquery-1)」などはサブクエリの結果の走査でテーブルの走査ではない
+            if not line.startswith('SCAN ') or 'USING' in line:
+                return False
+            return line.split()[1] in TABLES
+        return 'Seq Scan' in line
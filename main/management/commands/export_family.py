@@ -0,0 +1,93 @@
+import tarfile
+
+from django.contrib.auth.models import User
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from main.utils.archive import (
+    ARCHIVE_FORMAT, ARCHIVE_VERSION, EXPORT_MODELS, USER_DATA_MODELS, USER_FIELDS,
+    model_label, export_fields, media_fields, dumps, open_archive,
+)
+
+
+class Command(BaseCommand):
+    help = '家族アプリの全データをJSONL形式で書き出します（dumpdataより省メモリ）'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'output',
+            help='出力先ファイル（.gzで圧縮、-で標準出力）'
+        )
+        parser.add_argument(
+            '--media', default=None,
+            help='画像ファイルをまとめるtarファイル（.tar.gzで圧縮）'
+        )
+        parser.add_argument(
+            '--no-users', action='store_true',
+            help='ユーザーとユーザーごとのお気に入りを書き出さない（インポート先の既存ユーザーに紐付ける場合）'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=2000,
+            help='1回のクエリで読み込む件数'
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        if chunk_size < 1:
+            raise CommandError('--chunk-size は1以上を指定してください。')
+
+        # 標準出力に書き出す場合は進捗を標準エラーに出す
+        log = self.stderr if options['output'] == '-' else self.stdout
+        counts = {}
+        media_names = set()
+
+        with open_archive(options['output'], 'w') as out:
+            out.write(dumps({
+                'format': ARCHIVE_FORMAT,
+                'version': ARCHIVE_VERSION,
+                'exported_at': timezone.now(),
+            }) + '\n')
+
+            if options['no_users']:
+                models = [model for model in EXPORT_MODELS if model not in USER_DATA_MODELS]
+            else:
+                models = [User] + EXPORT_MODELS
+            for model in models:
+                label = model_label(model)
+                fields = USER_FIELDS if model is User else export_fields(model)
+                files = [] if model is User else media_fields(model)
+
+                count = 0
+                rows = model._default_manager.order_by('pk').values(*fields)
+                for row in rows.iterator(chunk_size=chunk_size):
+                    out.write(dumps({'model': label, 'fields': row}) + '\n')
+                    media_names.update(row[name] for name in files if row[name])
+                    count += 1
+                counts[label] = count
+                log.write(f'  {label}: {count}件')
+
+        if options['media']:
+            self.write_media(options['media'], sorted(media_names), log)
+
+        log.write(self.style.SUCCESS(
+            f'✅ エクスポートが完了しました（{sum(counts.values())}件）'
+        ))
+
+    def write_media(self, path, names, log):
+        """画像ファイルを1つずつtarに追加する"""
+        mode = 'w:gz' if path.endswith('.gz') else 'w'
+        missing = 0
+        with tarfile.open(path, mode) as tar:
+            for name in names:
+                if not default_storage.exists(name):
+                    missing += 1
+                    continue
+                info = tarfile.TarInfo(name)
+                info.size = default_storage.size(name)
+                with default_storage.open(name, 'rb') as f:
+                    tar.addfile(info, f)
+
+        log.write(f'  画像ファイル: {len(names) - missing}件 → {path}')
+        if missing:
+            log.write(self.style.WARNING(f'  ⚠️ 見つからない画像ファイル: {missing}件'))
@@ -0,0 +1,386 @@
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, time, timedelta
+
+from PIL import Image, ImageDraw, ImageFilter
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from main.models import (
+    FamilyMember, PhotoTag, PhotoAlbum, FamilyPhoto, PhotoFavorite, EventCategory, FamilyEvent
+)
+from main.utils.archive import EXPORT_MODELS, insert_raw
+from main.utils.cache import invalidate_all
+from main.utils.helpers import create_thumbnail, thumbnail_name
+
+# 生成する画像のサイズ（保存時のリサイズ後に近い、実際のカメラの縦横比）
+IMAGE_SIZES = [
+    (1920, 1440), (1440, 1920), (1920, 1080), (1080, 1920),
+    (1920, 1280), (1280, 1920), (1600, 1200), (1280, 960),
+]
+
+LAST_NAMES = ['佐藤', '鈴木', '高橋', '田中', '伊藤', '渡辺', '山本', '中村', '小林', '加藤']
+FIRST_NAMES = ['太郎', '花子', '健太', '美咲', '翔', '陽菜', '大輔', '結衣', '蓮', 'さくら', '悠斗', '葵']
+ROLES = [role for role, _ in FamilyMember.ROLE_CHOICES]
+FOODS = ['カレー', 'ラーメン', 'お寿司', 'ハンバーグ', 'オムライス', '焼き肉', 'パスタ', '餃子']
+HOBBIES = ['読書', 'サッカー', 'ピアノ', '料理', 'キャンプ', 'ゲーム', '写真', 'ガーデニング']
+PLACES = ['自宅', '公園', '動物園', '海', '山', '遊園地', 'おじいちゃんの家', '学校', '水族館', '温泉']
+PHOTO_WORDS = ['お出かけ', '誕生日会', '運動会', 'お花見', '夏休み', 'クリスマス', 'お正月', '旅行', 'BBQ', '散歩']
+EVENT_WORDS = ['誕生日', '記念日', '家族旅行', '授業参観', '歯医者', 'ピアノ教室', '家族会議', 'お買い物', '習字', 'サッカー練習']
+TAG_WORDS = ['旅行', '誕生日', '食事', '風景', '子供', 'ペット', '季節', '行事', 'スポーツ', '友達']
+COLORS = ['#e74c3c', '#e91e63', '#9b59b6', '#3498db', '#1abc9c', '#2ecc71', '#f39c12', '#34495e']
+
+# 繰り返し設定の出現比率
+REPEAT_WEIGHTS = {'none': 70, 'daily': 2, 'weekly': 12, 'monthly': 9, 'yearly': 7}
+PRIORITY_WEIGHTS = {'low': 15, 'normal': 60, 'high': 20, 'urgent': 5}
+
+# 1回の bulk_create で保存する件数
+CHUNK_SIZE = 5000
+
+
+def render_image(task):
+    """
+    写真らしい画像を生成して保存する（プロセスプールで実行）
+
+    グラデーション・図形・粗いノイズを重ねて、実際の写真に近い
+    JPEGのファイルサイズになるようにする。乱数はシードから作るため、
+    同じシードなら同じ画像になる。
+
+    サムネイルも一緒に作成する。
+
+    Args:
+        task (tuple): (保存先の絶対パス, サムネイルの保存先の絶対パス, シード, (幅, 高さ))
+
+    Returns:
+        int: ファイルサイズ（バイト）
+    """
+    path, thumbnail_path, seed, (width, height) = task
+    if os.path.exists(path):
+        if not os.path.exists(thumbnail_path):
+            create_thumbnail(path, thumbnail_path, FamilyPhoto.thumbnail_size)
+        return os.path.getsize(path)
+
+    rng = random.Random(seed)
+    top = tuple(rng.randrange(256) for _ in range(3))
+    bottom = tuple(rng.randrange(256) for _ in range(3))
+    mask = Image.linear_gradient('L').resize((width, height))
+    image = Image.composite(Image.new('RGB', (width, height), bottom),
+                            Image.new('RGB', (width, height), top), mask)
+
+    draw = ImageDraw.Draw(image)
+    for _ in range(rng.randint(8, 20)):
+        x, y = rng.randrange(width), rng.randrange(height)
+        radius = rng.randint(width // 20, width // 4)
+        color = tuple(rng.randrange(256) for _ in range(3))
+        box = (x - radius, y - radius, x + radius, y + radius)
+        if rng.random() < 0.5:
+            draw.ellipse(box, fill=color)
+        else:
+            draw.rectangle(box, fill=color)
+    image = image.filter(ImageFilter.GaussianBlur(radius=3))
+
+    # 低解像度のノイズを拡大して重ね、被写体の質感を出す
+    noise_size = (width // 4, height // 4)
+    noise = Image.frombytes('L', noise_size, rng.randbytes(noise_size[0] * noise_size[1]))
+    noise = noise.resize((width, height), Image.Resampling.BILINEAR).convert('RGB')
+    image = Image.blend(image, noise, 0.2)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.tmp'
+    image.save(tmp_path, 'JPEG', quality=85, optimize=True)
+    os.replace(tmp_path, path)
+    create_thumbnail(path, thumbnail_path, FamilyPhoto.thumbnail_size)
+    return os.path.getsize(path)
+
+
+def weighted(rng, weights):
+    return rng.choices(list(weights), weights=list(weights.values()))[0]
+
+
+def bulk_insert(model, objs):
+    """
+    まとめてINSERTして主キーの一覧を返す（作成日・更新日は生成した値のまま保存する）
+
+    主キーを返せないデータベースでは、追加前の最大値より大きいものを取得する。
+    """
+    last_pk = model.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+    insert_raw(model, objs)
+    if all(obj.pk is not None for obj in objs):
+        return [obj.pk for obj in objs]
+    return list(model.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True))
+
+
+class Command(BaseCommand):
+    help = '負荷試験用の大量データを生成します（シードを指定すると同じデータを再現できます）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--members', type=int, default=50, help='家族メンバーの数')
+        parser.add_argument('--photos', type=int, default=200000, help='写真の数')
+        parser.add_argument('--albums', type=int, default=5000, help='アルバムの数')
+        parser.add_argument('--tags', type=int, default=2000, help='タグの数')
+        parser.add_argument('--categories', type=int, default=20, help='イベントカテゴリの数')
+        parser.add_argument('--events', type=int, default=100000, help='イベントの数')
+        parser.add_argument('--seed', type=int, default=1, help='乱数のシード')
+        parser.add_argument(
+            '--image-pool', type=int, default=500,
+            help='生成する画像の種類（写真はこの中から割り当てる。0で写真ごとに生成）'
+        )
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1,
+            help='画像生成のプロセス数'
+        )
+        parser.add_argument(
+            '--today', type=date.fromisoformat, default=None,
+            help='日付の基準日（YYYY-MM-DD、省略時は今日。再現する場合は指定する）'
+        )
+        parser.add_argument(
+            '--clear', action='store_true',
+            help='既存の家族データを削除してから生成する（ユーザーは削除しない）'
+        )
+
+    def handle(self, *args, **options):
+        for name in ('members', 'photos', 'albums', 'tags', 'categories', 'events', 'image_pool'):
+            if options[name] < 0:
+                raise CommandError(f'--{name.replace("_", "-")} は0以上を指定してください。')
+        if options['photos'] and not options['members']:
+            raise CommandError('写真を生成するには --members を1以上にしてください。')
+
+        self.seed = options['seed']
+        self.rng = random.Random(self.seed)
+        self.today = options['today'] or timezone.localdate()
+        self.workers = max(options['workers'], 1)
+
+        self.stdout.write(self.style.SUCCESS(f'負荷試験用データを生成中...（seed={self.seed}）'))
+
+        # 画像はトランザクションの外で先に生成する（書き込みロックを長く持たないため）
+        images = []
+        if options['photos']:
+            images = self.create_images(min(options['image_pool'] or options['photos'], options['photos']))
+
+        with transaction.atomic():
+            if options['clear']:
+                self.clear()
+            self.user = self.get_user()
+            member_ids = self.create_members(options['members'])
+            tag_ids = self.create_tags(options['tags'])
+            album_ids = self.create_albums(options['albums'])
+            category_ids = self.create_categories(options['categories'])
+            if options['photos']:
+                self.create_photos(options['photos'], images, member_ids, tag_ids, album_ids)
+            self.create_events(options['events'], member_ids, category_ids)
+
+        # bulk_createではシグナルが発行されないため、アルバムの枚数・カバーを計算し、キャッシュはまとめて破棄する
+        call_command('refresh_album_summaries', stdout=self.stdout)
+        invalidate_all()
+        self.stdout.write(self.style.SUCCESS('✅ データの生成が完了しました'))
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            for model in reversed(EXPORT_MODELS):
+                cursor.execute(f'DELETE FROM {connection.ops.quote_name(model._meta.db_table)}')
+        self.stdout.write('  既存の家族データを削除しました')
+
+    def get_user(self):
+        user, _ = User.objects.get_or_create(
+            username='loadtest',
+            defaults={'first_name': '負荷試験', 'is_active': False},
+        )
+        return user
+
+    def timestamp(self, day):
+        """日付から作成日時を作る（同じシードなら同じ値になる）"""
+        moment = datetime.combine(day, time(self.rng.randrange(24), self.rng.randrange(60)))
+        return timezone.make_aware(moment)
+
+    def random_date(self, days_before, days_after=0):
+        return self.today + timedelta(days=self.rng.randint(-days_before, days_after))
+
+    def create_members(self, count):
+        members = []
+        for i in range(count):
+            birthday = self.random_date(365 * 80, -365)
+            created = self.timestamp(self.random_date(365 * 3))
+            members.append(FamilyMember(
+                name=f'{self.rng.choice(LAST_NAMES)}{self.rng.choice(FIRST_NAMES)}{i + 1}',
+                role=self.rng.choice(ROLES),
+                birthday=birthday if self.rng.random() < 0.9 else None,
+                favorite_food=self.rng.choice(FOODS),
+                hobby=self.rng.choice(HOBBIES),
+                introduction='よろしくお願いします！',
+                is_active=self.rng.random() < 0.95,
+                created_at=created,
+                updated_at=created,
+            ))
+        ids = bulk_insert(FamilyMember, members)
+        self.stdout.write(f'  家族メンバー: {len(ids)}件')
+        return ids
+
+    def create_tags(self, count):
+        tags = [
+            PhotoTag(
+                name=f'{TAG_WORDS[i % len(TAG_WORDS)]}{i + 1}-{self.seed}',
+                color=self.rng.choice(COLORS),
+                created_at=self.timestamp(self.random_date(365 * 3)),
+            )
+            for i in range(count)
+        ]
+        ids = bulk_insert(PhotoTag, tags)
+        self.stdout.write(f'  タグ: {len(ids)}件')
+        return ids
+
+    def create_albums(self, count):
+        albums = []
+        for i in range(count):
+            created = self.timestamp(self.random_date(365 * 10))
+            albums.append(PhotoAlbum(
+                title=f'{self.rng.choice(PHOTO_WORDS)}アルバム {i + 1}',
+                description=f'{self.rng.choice(PLACES)}での思い出',
+                created_by=self.user,
+                is_public=self.rng.random() < 0.85,
+                created_at=created,
+                updated_at=created,
+            ))
+        ids = bulk_insert(PhotoAlbum, albums)
+        self.stdout.write(f'  アルバム: {len(ids)}件')
+        return ids
+
+    def create_categories(self, count):
+        categories = [
+            EventCategory(
+                name=f'{EVENT_WORDS[i % len(EVENT_WORDS)]}{i + 1}-{self.seed}',
+                emoji=self.rng.choice(['🎂', '❤️', '✈️', '🏫', '🏥', '📚', '🛒', '📅']),
+                color=self.rng.choice(COLORS),
+                created_at=self.timestamp(self.random_date(365 * 3)),
+            )
+            for i in range(count)
+        ]
+        ids = bulk_insert(EventCategory, categories)
+        self.stdout.write(f'  イベントカテゴリ: {len(ids)}件')
+        return ids
+
+    def create_images(self, count):
+        """
+        画像をプロセスプールで生成する
+
+        Returns:
+            list: (ストレージ上の名前, サムネイルの名前, (幅, 高さ)) の一覧
+        """
+        images, tasks = [], []
+        for i in range(count):
+            name = f'gallery/loadtest/{self.seed}/{i // 1000:03d}/img_{i:06d}.jpg'
+            seed = self.rng.getrandbits(64)
+            size = self.rng.choice(IMAGE_SIZES)
+            images.append((name, thumbnail_name(name), size))
+            tasks.append((
+                os.path.join(settings.MEDIA_ROOT, name),
+                os.path.join(settings.MEDIA_ROOT, thumbnail_name(name)),
+                seed,
+                size,
+            ))
+
+        self.stdout.write(f'  画像を生成中: {count}枚（{self.workers}プロセス）')
+        total_size = 0
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            for done, size in enumerate(executor.map(render_image, tasks, chunksize=16), start=1):
+                total_size += size
+                if done % 1000 == 0:
+                    self.stdout.write(f'    {done}/{count}枚')
+        self.stdout.write(f'  画像: {count}枚（平均 {total_size // max(count, 1) // 1024}KB）')
+        return images
+
+    def create_photos(self, count, images, member_ids, tag_ids, album_ids):
+        # よく使うタグに偏らせる（実データに近い分布）
+        tag_weights = [1 / (rank + 1) for rank in range(len(tag_ids))]
+        member_links = FamilyPhoto.family_members.through
+        tag_links = FamilyPhoto.tags.through
+
+        for start in range(0, count, CHUNK_SIZE):
+            size = min(CHUNK_SIZE, count - start)
+            photos = []
+            for i in range(start, start + size):
+                taken = self.random_date(365 * 10)
+                created = self.timestamp(taken + timedelta(days=self.rng.randint(0, 30)))
+                image, thumbnail, (width, height) = images[i % len(images)]
+                photo = FamilyPhoto(
+                    title=f'{self.rng.choice(PHOTO_WORDS)} {i + 1}',
+                    image=image,
+                    thumbnail=thumbnail,
+                    width=width,
+                    height=height,
+                    description=f'{self.rng.choice(PLACES)}で撮影しました',
+                    taken_date=taken,
+                    location=self.rng.choice(PLACES),
+                    album_id=self.rng.choice(album_ids) if album_ids and self.rng.random() < 0.7 else None,
+                    # 負荷試験用のユーザーのお気に入りにする（下で PhotoFavorite を作成する）
+                    favorite_count=int(self.rng.random() < 0.1),
+                    is_public=self.rng.random() < 0.9,
+                    uploaded_by=self.user,
+                    created_at=created,
+                    updated_at=created,
+                )
+                photos.append(photo)
+            photo_ids = bulk_insert(FamilyPhoto, photos)
+
+            members, tags, favorites = [], [], []
+            for photo, photo_id in zip(photos, photo_ids):
+                if photo.favorite_count:
+                    favorites.append(PhotoFavorite(user=self.user, photo_id=photo_id, created_at=photo.created_at))
+                for member_id in self.rng.sample(member_ids, min(self.rng.randint(0, 4), len(member_ids))):
+                    members.append(member_links(familyphoto_id=photo_id, familymember_id=member_id))
+                if tag_ids:
+                    chosen = set(self.rng.choices(tag_ids, weights=tag_weights, k=self.rng.randint(0, 5)))
+                    tags += [tag_links(familyphoto_id=photo_id, phototag_id=tag_id) for tag_id in chosen]
+            member_links.objects.bulk_create(members, batch_size=1000)
+            tag_links.objects.bulk_create(tags, batch_size=1000)
+            insert_raw(PhotoFavorite, favorites)
+            self.stdout.write(f'  写真: {start + size}/{count}件')
+
+    def create_events(self, count, member_ids, category_ids):
+        participant_links = FamilyEvent.participants.through
+
+        for start in range(0, count, CHUNK_SIZE):
+            size = min(CHUNK_SIZE, count - start)
+            events = []
+            for i in range(start, start + size):
+                start_date = self.random_date(365 * 3, 365)
+                repeat = weighted(self.rng, REPEAT_WEIGHTS)
+                is_all_day = self.rng.random() < 0.3
+                start_time = None if is_all_day else time(self.rng.randint(7, 20), self.rng.choice([0, 15, 30, 45]))
+                created = self.timestamp(start_date - timedelta(days=self.rng.randint(1, 60)))
+                events.append(FamilyEvent(
+                    title=f'{self.rng.choice(EVENT_WORDS)} {i + 1}',
+                    description=f'{self.rng.choice(PLACES)}で予定があります',
+                    start_date=start_date,
+                    end_date=start_date + timedelta(days=self.rng.randint(0, 3)) if self.rng.random() < 0.2 else None,
+                    start_time=start_time,
+                    end_time=time(start_time.hour + 1, start_time.minute) if start_time else None,
+                    is_all_day=is_all_day,
+                    repeat=repeat,
+                    repeat_until=(
+                        start_date + timedelta(days=self.rng.randint(30, 730))
+                        if repeat != 'none' and self.rng.random() < 0.5 else None
+                    ),
+                    category_id=self.rng.choice(category_ids) if category_ids and self.rng.random() < 0.9 else None,
+                    location=self.rng.choice(PLACES),
+                    priority=weighted(self.rng, PRIORITY_WEIGHTS),
+                    is_reminder_enabled=self.rng.random() < 0.7,
+                    reminder_minutes=self.rng.choice([10, 30, 60, 1440]),
+                    created_by=self.user,
+                    created_at=created,
+                    updated_at=created,
+                ))
+            event_ids = bulk_insert(FamilyEvent, events)
+
+            participants = [
+                participant_links(familyevent_id=event_id, familymember_id=member_id)
+                for event_id in event_ids
+                for member_id in self.rng.sample(member_ids, min(self.rng.randint(0, 4), len(member_ids)))
+            ]
+            participant_links.objects.bulk_create(participants, batch_size=1000)
+            self.stdout.write(f'  イベント: {start + size}/{count}件')
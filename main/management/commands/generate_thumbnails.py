@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from main.models import FamilyPhoto
+from main.signals import invalidate_model
+
+
+class Command(BaseCommand):
+    help = 'サムネイル・画像のサイズがない写真について作成します（追加前に登録された写真用）'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='作成済みの写真も含めて、全ての写真のサムネイルを作り直す'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=200,
+            help='1回に読み込む写真の数'
+        )
+
+    def handle(self, *args, **options):
+        photos = FamilyPhoto.objects.exclude(image='').only('pk', 'image', 'thumbnail', 'album')
+        if not options['all']:
+            photos = photos.filter(Q(thumbnail='') | Q(width=None))
+
+        done = failed = 0
+        last_pk = 0
+        while True:
+            batch = list(photos.filter(pk__gt=last_pk).order_by('pk')[:options['batch_size']])
+            if not batch:
+                break
+            # アルバムのカバーの計算し直しを、バッチごとのコミット後の1回にまとめる
+            with transaction.atomic():
+                for photo in batch:
+                    photo.image_processed()
+                    if photo.thumbnail:
+                        done += 1
+                    else:
+                        failed += 1
+            last_pk = batch[-1].pk
+            # サムネイルはAPIにも出力するため、キャッシュを無効化して同期用の変更履歴に記録する
+            invalidate_model(FamilyPhoto, [photo.pk for photo in batch])
+            self.stdout.write(f'  {done + failed}枚を処理しました')
+
+        self.stdout.write(self.style.SUCCESS(f'✅ {done}枚のサムネイルを作成しました'))
+        if failed:
+            self.stdout.write(self.style.WARNING(f'⚠️ {failed}枚は画像を読み込めませんでした'))
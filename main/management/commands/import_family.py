@@ -0,0 +1,198 @@
+import json
+import tarfile
+
+from django.contrib.auth.models import User
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+
+from main.models import ChangeLog
+from main.signals import SYNC_MODELS, record_changes
+from main.utils.archive import (
+    ARCHIVE_FORMAT, ARCHIVE_VERSION, EXPORT_MODELS, model_label, open_archive, insert_raw,
+)
+from main.utils.cache import invalidate_all
+
+MODELS_BY_LABEL = {model_label(model): model for model in EXPORT_MODELS}
+USER_LABEL = model_label(User)
+
+
+class Command(BaseCommand):
+    help = 'export_family で書き出したデータを一括で読み込みます（loaddataより高速・省メモリ）'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'input',
+            help='入力ファイル（.gzは圧縮ファイル、-で標準入力）'
+        )
+        parser.add_argument(
+            '--media', default=None,
+            help='export_family --media で作成したtarファイル'
+        )
+        parser.add_argument(
+            '--replace', action='store_true',
+            help='既存の家族データを削除してから読み込む（ユーザーは削除しない）'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='1回のINSERTで保存する件数'
+        )
+
+    def handle(self, *args, **options):
+        self.batch_size = options['batch_size']
+        if self.batch_size < 1:
+            raise CommandError('--batch-size は1以上を指定してください。')
+
+        self.user_ids = {}
+        self.counts = {}
+
+        with open_archive(options['input'], 'r') as archive:
+            self.check_header(archive.readline())
+
+            with transaction.atomic():
+                if options['replace']:
+                    self.delete_existing()
+                elif any(model._default_manager.exists() for model in EXPORT_MODELS):
+                    raise CommandError(
+                        '既に家族データが存在します。--replace を指定すると削除してから読み込みます。'
+                    )
+                self.load_records(archive)
+                self.reset_sequences()
+
+        if options['media']:
+            self.load_media(options['media'])
+
+        # bulk_createではシグナルが発行されないため、アルバムの枚数・カバーを計算し、キャッシュはまとめて破棄する
+        call_command('refresh_album_summaries', stdout=self.stdout)
+        invalidate_all()
+
+        for label, count in self.counts.items():
+            self.stdout.write(f'  {label}: {count}件')
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ インポートが完了しました（{sum(self.counts.values())}件）'
+        ))
+
+    def check_header(self, line):
+        try:
+            header = json.loads(line)
+        except ValueError:
+            header = {}
+        if header.get('format') != ARCHIVE_FORMAT:
+            raise CommandError('export_family で作成したファイルではありません。')
+        if header.get('version') != ARCHIVE_VERSION:
+            raise CommandError(f'対応していないバージョンです: {header.get("version")}')
+
+    def delete_existing(self):
+        """既存データを参照元から順に削除する（オブジェクトを読み込まずにDELETEする）"""
+        # 同期クライアントが削除を受け取れるよう、削除するオブジェクトを変更履歴に記録する
+        for model in EXPORT_MODELS:
+            if model in SYNC_MODELS:
+                record_changes(
+                    model, model._default_manager.values_list('pk', flat=True).iterator(),
+                    ChangeLog.DELETED,
+                )
+        with connection.cursor() as cursor:
+            for model in reversed(EXPORT_MODELS):
+                cursor.execute(f'DELETE FROM {connection.ops.quote_name(model._meta.db_table)}')
+        self.stdout.write('  既存の家族データを削除しました')
+
+    def load_records(self, archive):
+        """同じモデルの行をまとめて bulk_create する"""
+        label, batch = None, []
+        for line_no, line in enumerate(archive, start=2):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                record_label, fields = record['model'], record['fields']
+            except (ValueError, KeyError, TypeError):
+                raise CommandError(f'{line_no}行目の形式が不正です。')
+
+            if record_label != label or len(batch) >= self.batch_size:
+                self.flush(label, batch)
+                label, batch = record_label, []
+            batch.append(fields)
+        self.flush(label, batch)
+
+    def flush(self, label, rows):
+        if not rows:
+            return
+        if label == USER_LABEL:
+            self.load_users(rows)
+        elif label in MODELS_BY_LABEL:
+            model = MODELS_BY_LABEL[label]
+            objs = [model(**self.convert(model, row)) for row in rows]
+            insert_raw(model, objs, batch_size=self.batch_size)
+            # シグナルは発行されないため、同期用の変更履歴はまとめて記録する
+            record_changes(model, [obj.pk for obj in objs], ChangeLog.CREATED)
+        else:
+            raise CommandError(f'不明なモデルです: {label}')
+        self.counts[label] = self.counts.get(label, 0) + len(rows)
+
+    def load_users(self, rows):
+        """ユーザー名で既存のユーザーと照合し、存在しないユーザーだけ作成する"""
+        usernames = [row['username'] for row in rows]
+        existing = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+        User.objects.bulk_create([
+            User(**{
+                field.attname: field.to_python(row[field.attname])
+                for field in User._meta.concrete_fields
+                if field.attname in row and not field.primary_key
+            })
+            for row in rows if row['username'] not in existing
+        ])
+
+        new_ids = dict(User.objects.filter(username__in=usernames).values_list('username', 'pk'))
+        for row in rows:
+            self.user_ids[row['id']] = new_ids[row['username']]
+
+    def convert(self, model, row):
+        """JSONの値をフィールドの型に変換し、ユーザーのIDを読み替える"""
+        values = {}
+        for field in model._meta.concrete_fields:
+            if field.attname not in row:
+                continue
+            value = row[field.attname]
+            if field.is_relation and field.related_model is User and value is not None:
+                value = self.map_user(field, value)
+            values[field.attname] = field.to_python(value) if value is not None else None
+        return values
+
+    def map_user(self, field, user_id):
+        if user_id in self.user_ids:
+            return self.user_ids[user_id]
+        # ユーザーを含まないアーカイブは、同じIDのユーザーが存在すれば紐付ける
+        if User.objects.filter(pk=user_id).exists():
+            self.user_ids[user_id] = user_id
+            return user_id
+        if field.null:
+            return None
+        raise CommandError(
+            f'ユーザー(id={user_id})が見つかりません。ユーザーを含めてエクスポートしてください。'
+        )
+
+    def reset_sequences(self):
+        """主キーを指定して保存したため、自動採番の値を更新する（PostgreSQL）"""
+        statements = connection.ops.sequence_reset_sql(no_style(), EXPORT_MODELS)
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+    def load_media(self, path):
+        """tarの画像ファイルを1つずつストレージに保存する（既存のファイルは上書きしない）"""
+        saved = skipped = 0
+        with tarfile.open(path, 'r:*') as tar:
+            for member in tar:
+                if not member.isfile():
+                    continue
+                if member.name.startswith('/') or '..' in member.name.split('/'):
+                    raise CommandError(f'不正なファイル名が含まれています: {member.name}')
+                if default_storage.exists(member.name):
+                    skipped += 1
+                    continue
+                default_storage.save(member.name, File(tar.extractfile(member)))
+                saved += 1
+        self.stdout.write(f'  画像ファイル: {saved}件保存、{skipped}件は既に存在')
@@ -0,0 +1,28 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from main.models import ChangeLog
+
+
+class Command(BaseCommand):
+    help = '同期用の変更履歴（ChangeLog）の古い行を削除します'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=90,
+            help='残す日数（これより古い変更履歴を削除する。削除された範囲から同期するクライアントは全件を取得し直す）'
+        )
+
+    def handle(self, *args, **options):
+        days = options['days']
+        if days < 1:
+            raise CommandError('--days は1以上を指定してください。')
+
+        # 最新の行は残し、古い cursor からの同期を410で検知できるようにする
+        latest = ChangeLog.objects.order_by('-seq').values_list('seq', flat=True).first()
+        threshold = timezone.now() - timedelta(days=days)
+        deleted, _ = ChangeLog.objects.filter(changed_at__lt=threshold).exclude(seq=latest).delete()
+
+        self.stdout.write(self.style.SUCCESS(f'✅ {deleted}件の変更履歴を削除しました（{days}日より前）'))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from main.models import PhotoAlbum
+
+
+class Command(BaseCommand):
+    help = 'アルバムの公開写真の枚数と一覧用のカバーを計算し直します（追加前に作成されたアルバム・一括読み込みの後用）'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=200,
+            help='1回に計算するアルバムの数'
+        )
+
+    def handle(self, *args, **options):
+        done = 0
+        last_pk = 0
+        while True:
+            album_ids = list(
+                PhotoAlbum.objects.filter(pk__gt=last_pk).order_by('pk')
+                .values_list('pk', flat=True)[:options['batch_size']]
+            )
+            if not album_ids:
+                break
+            PhotoAlbum.refresh_summaries(album_ids)
+            done += len(album_ids)
+            last_pk = album_ids[-1]
+
+        self.stdout.write(self.style.SUCCESS(f'✅ {done}件のアルバムを計算し直しました'))
@@ -0,0 +1,34 @@
+import sqlite3
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from main.routers import PRIMARY, replica_aliases
+
+
+class Command(BaseCommand):
+    help = 'SQLiteのプライマリをレプリカファイルに複製します（ローカルでのレプリカ検証用）'
+
+    def handle(self, *args, **options):
+        primary = connections[PRIMARY]
+        if primary.vendor != 'sqlite':
+            raise CommandError('このコマンドはSQLiteでのみ使用できます。レプリカの複製はデータベース側で設定してください。')
+
+        aliases = [alias for alias in replica_aliases() if connections[alias].vendor == 'sqlite']
+        if not aliases:
+            self.stdout.write(self.style.WARNING('SQLITE_REPLICA_PATHS が設定されていません。'))
+            return
+
+        primary.ensure_connection()
+        for alias in aliases:
+            path = connections[alias].settings_dict['NAME']
+            # 接続中のレプリカを閉じてから、オンラインバックアップで丸ごと複製する
+            connections[alias].close()
+            target = sqlite3.connect(str(path))
+            try:
+                primary.connection.backup(target)
+            finally:
+                target.close()
+            self.stdout.write(f'  複製完了: {alias} ({path})')
+
+        self.stdout.write(self.style.SUCCESS('✅ レプリカの複製が完了しました'))
@@ -0,0 +1,272 @@
+"""
+Custom middleware for the main app.
+"""
+
+import cProfile
+import json
+import logging
+import random
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from . import routers
+from .utils import metrics, timing
+from .utils.helpers import aget_request_user
+from .utils.profiling import save_profile
+
+REPLICA_PIN_COOKIE = 'db_pin'
+
+timing_logger = logging.getLogger('main.timing')
+profiling_logger = logging.getLogger('main.profiling')
+
+
+class ReplicaRoutingMiddleware:
+    """
+    リクエストごとにレプリカへの振り分け状態を管理するミドルウェア
+
+    - GET/HEAD以外のリクエストは最初からプライマリに固定する
+    - 書き込みがあった場合はCookieを設定し、REPLICA_PIN_SECONDS の間
+      同じブラウザからの読み込みもプライマリに固定する（書き込み直後の読み込み対策）
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not routers.replica_aliases():
+            return self.get_response(request)
+
+        token = routers.begin_request(pinned=self.should_pin(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            wrote = routers.end_request(token)
+        return self.set_pin_cookie(response, wrote)
+
+    async def __acall__(self, request):
+        if not routers.replica_aliases():
+            return await self.get_response(request)
+
+        token = routers.begin_request(pinned=self.should_pin(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            wrote = routers.end_request(token)
+        return self.set_pin_cookie(response, wrote)
+
+    def set_pin_cookie(self, response, wrote):
+        if wrote:
+            pin_seconds = settings.REPLICA_PIN_SECONDS
+            response.set_cookie(
+                REPLICA_PIN_COOKIE,
+                str(int(time.time()) + pin_seconds),
+                max_age=pin_seconds,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
+
+    def should_pin(self, request):
+        if request.method not in ('GET', 'HEAD'):
+            return True
+        try:
+            return int(request.COOKIES.get(REPLICA_PIN_COOKIE, 0)) > time.time()
+        except ValueError:
+            return False
+
+
+class RequestTimingMiddleware:
+    """
+    リクエストごとの処理時間を計測するミドルウェア
+
+    全体・DB・テンプレートの時間、クエリ数、キャッシュのヒット・ミス数を
+    Server-Timing ヘッダー（ブラウザの開発者ツールで確認できる）と
+    構造化ログ（main.timing）に出力する。URL名ごとの集計は /metrics でも確認できる。
+
+    SERVER_TIMING_HEADER: all（全員） / staff（スタッフのみ） / off
+    REQUEST_LOG_SLOW_MS: この時間（ミリ秒）以上かかったリクエストは WARNING で記録する
+        （それ以外のリクエストは DEBUG。本番の INFO では遅いリクエストだけが出力される）
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.header_mode = getattr(settings, 'SERVER_TIMING_HEADER', 'all')
+        self.slow_ms = getattr(settings, 'REQUEST_LOG_SLOW_MS', 1000)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+
+        request_metrics, token = timing.start_request()
+        metrics.REQUESTS_IN_FLIGHT.inc()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.REQUESTS_IN_FLIGHT.dec()
+            timing.end_request(token)
+
+        user = getattr(request, 'user', None) if self.header_mode == 'staff' else None
+        return self.finish(request, response, request_metrics, user)
+
+    async def __acall__(self, request):
+        request_metrics, token = timing.start_request()
+        metrics.REQUESTS_IN_FLIGHT.inc()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.REQUESTS_IN_FLIGHT.dec()
+            timing.end_request(token)
+
+        # 非同期ではユーザーの遅延読み込みができないため、必要な場合だけ先に取得する
+        user = None
+        if self.header_mode == 'staff' and hasattr(request, 'auser'):
+            user = await aget_request_user(request)
+        return self.finish(request, response, request_metrics, user)
+
+    def finish(self, request, response, request_metrics, user):
+        """ヘッダー・ログ・メトリクスを出力する"""
+        total_ms = request_metrics.elapsed() * 1000
+        db_ms = request_metrics.db_time * 1000
+        template_ms = request_metrics.template_time * 1000
+        self.record_metrics(request, response, request_metrics)
+
+        if self.should_add_header(user):
+            response['Server-Timing'] = ', '.join([
+                f'total;dur={total_ms:.1f}',
+                f'db;dur={db_ms:.1f};desc="DB ({request_metrics.queries} queries)"',
+                f'tpl;dur={template_ms:.1f};desc="Templates"',
+                f'app;dur={max(total_ms - db_ms - template_ms, 0):.1f};desc="Python"',
+                f'cache;desc="hit={request_metrics.cache_hits} miss={request_metrics.cache_misses}"',
+            ])
+
+        data = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'total_ms': round(total_ms, 1),
+            'db_ms': round(db_ms, 1),
+            'queries': request_metrics.queries,
+            'template_ms': round(template_ms, 1),
+            'cache_hits': request_metrics.cache_hits,
+            'cache_misses': request_metrics.cache_misses,
+        }
+        level = logging.WARNING if total_ms >= self.slow_ms else logging.DEBUG
+        if timing_logger.isEnabledFor(level):
+            timing_logger.log(
+                level, json.dumps(data, ensure_ascii=False), extra={'request_timing': data}
+            )
+        return response
+
+    def record_metrics(self, request, response, request_metrics):
+        """/metrics 用にURL名ごとの値を記録する"""
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match is not None else 'unmatched'
+        metrics.REQUESTS.inc(view=view, method=request.method, status=response.status_code)
+        metrics.REQUEST_DURATION.observe(request_metrics.elapsed(), view=view)
+        metrics.DB_QUERIES.inc(request_metrics.queries, view=view)
+        metrics.DB_TIME.inc(request_metrics.db_time, view=view)
+        metrics.flush()
+
+    def should_add_header(self, user):
+        if self.header_mode == 'all':
+            return True
+        if self.header_mode == 'staff':
+            return bool(user is not None and user.is_staff)
+        return False
+
+
+class ProfilingMiddleware:
+    """
+    リクエストをcProfileでプロファイルするミドルウェア
+
+    以下の場合にビューの実行全体をプロファイルし、PROFILING_DIR に保存する。
+    保存したファイルはスタッフ用の画面（/profiles/）からダウンロードできる。
+
+    - スタッフが ?_profile=1 を付けるか、X-Profile: 1 ヘッダーを送った場合
+    - PROFILING_SAMPLE_RATE（0〜1）の確率でサンプリングされた場合
+
+    request.user を使うため、AuthenticationMiddleware より後に置く。
+    プロファイラは同時に1つしか動かせないため、実行中の場合はプロファイルしない。
+    非同期（ASGI）では同じイベントループで並行して動く他のリクエストも記録される。
+    """
+
+    QUERY_PARAM = '_profile'
+    HEADER = 'X-Profile'
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'PROFILING_SAMPLE_RATE', 0.0)
+        self.lock = threading.Lock()
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+
+        user = getattr(request, 'user', None) if self.is_requested(request) else None
+        if not self.should_profile(request, user) or not self.lock.acquire(blocking=False):
+            return self.get_response(request)
+
+        try:
+            profiler = cProfile.Profile()
+            started = time.perf_counter()
+            response = profiler.runcall(self.get_response, request)
+            elapsed = time.perf_counter() - started
+        finally:
+            self.lock.release()
+        return self.save(request, response, profiler, elapsed)
+
+    async def __acall__(self, request):
+        user = await aget_request_user(request) if self.is_requested(request) else None
+        if not self.should_profile(request, user) or not self.lock.acquire(blocking=False):
+            return await self.get_response(request)
+
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        profiler.enable()
+        try:
+            response = await self.get_response(request)
+        finally:
+            profiler.disable()
+            self.lock.release()
+        return self.save(request, response, profiler, time.perf_counter() - started)
+
+    def save(self, request, response, profiler, elapsed):
+        name = save_profile(profiler, request, elapsed)
+        profiling_logger.info('プロファイルを保存しました: %s %s (%dms) → %s',
+                              request.method, request.path, elapsed * 1000, name)
+        response['X-Profile-Name'] = name
+        return response
+
+    def is_requested(self, request):
+        return (
+            request.GET.get(self.QUERY_PARAM) == '1'
+            or request.headers.get(self.HEADER) == '1'
+        )
+
+    def should_profile(self, request, user):
+        if self.is_requested(request):
+            return bool(user is not None and user.is_staff)
+        return self.sample_rate > 0 and random.random() < self.sample_rate
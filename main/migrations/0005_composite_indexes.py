@@ -0,0 +1,75 @@
+# Generated by Django 5.2.4 on 2026-10-19 00:21
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+# 自動作成される中間テーブルは、(写真, 相手) の一意制約と各外部キーの単独インデックスしか持たない。
+# メンバー・タグ・参加者側から写真・イベントを引くクエリをインデックスだけで解決できるよう、
+# 逆方向の複合インデックスを追加する。
+THROUGH_INDEXES = [
+    ('main_photo_members_rev_idx', 'main_familyphoto_family_members', 'familymember_id, familyphoto_id'),
+    ('main_photo_tags_rev_idx', 'main_familyphoto_tags', 'phototag_id, familyphoto_id'),
+    ('main_event_participants_rev_idx', 'main_familyevent_participants', 'familymember_id, familyevent_id'),
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0004_eventcategory_familyevent'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='familymember',
+            name='main_family_is_acti_7f7ea2_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='familyphoto',
+            name='main_family_is_favo_7b9932_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='familyphoto',
+            name='main_family_is_publ_da23e8_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='familyphoto',
+            name='main_family_album_i_21c636_idx',
+        ),
+        migrations.AddIndex(
+            model_name='familyevent',
+            index=models.Index(fields=['start_date', 'start_time'], name='event_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='familyevent',
+            index=models.Index(fields=['category', 'start_date'], name='event_category_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='familymember',
+            index=models.Index(fields=['is_active', 'role', 'name'], name='member_active_role_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='familyphoto',
+            index=models.Index(fields=['is_public', '-taken_date', '-created_at'], name='photo_public_taken_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='familyphoto',
+            index=models.Index(fields=['is_favorite', 'is_public', '-taken_date'], name='photo_favorite_taken_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='familyphoto',
+            index=models.Index(fields=['album', 'is_public', '-taken_date'], name='photo_album_public_taken_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='photoalbum',
+            index=models.Index(fields=['is_public', '-created_at'], name='album_public_created_idx'),
+        ),
+    ] + [
+        migrations.RunSQL(
+            sql=f'CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns});',
+            reverse_sql=f'DROP INDEX IF EXISTS {name};',
+        )
+        for name, table, columns in THROUGH_INDEXES
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.4 on 2026-10-19 00:43
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0005_composite_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='familyphoto',
+            name='favorite_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='お気に入り数'),
+        ),
+        migrations.CreateModel(
+            name='PhotoFavorite',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='登録日時')),
+                ('photo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='favorites', to='main.familyphoto', verbose_name='写真')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='photo_favorites', to=settings.AUTH_USER_MODEL, verbose_name='ユーザー')),
+            ],
+            options={
+                'verbose_name': 'お気に入り',
+                'verbose_name_plural': 'お気に入り',
+                'constraints': [models.UniqueConstraint(fields=('user', 'photo'), name='unique_photo_favorite')],
+            },
+        ),
+    ]
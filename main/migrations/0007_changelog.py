@@ -0,0 +1,28 @@
+# Generated by Django 5.2.4 on 2026-10-19 00:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0006_photo_favorites'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLog',
+            fields=[
+                ('seq', models.BigAutoField(primary_key=True, serialize=False, verbose_name='シーケンス')),
+                ('object_type', models.CharField(max_length=20, verbose_name='種類')),
+                ('object_id', models.BigIntegerField(verbose_name='オブジェクトID')),
+                ('action', models.CharField(choices=[('created', '作成'), ('updated', '更新'), ('deleted', '削除')], max_length=10, verbose_name='操作')),
+                ('changed_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='変更日時')),
+            ],
+            options={
+                'verbose_name': '変更履歴',
+                'verbose_name_plural': '変更履歴',
+                'ordering': ['seq'],
+            },
+        ),
+    ]
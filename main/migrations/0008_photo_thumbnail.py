@@ -0,0 +1,28 @@
+# Generated by Django 5.2.4 on 2026-10-19 01:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0007_changelog'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='familyphoto',
+            name='height',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='高さ'),
+        ),
+        migrations.AddField(
+            model_name='familyphoto',
+            name='thumbnail',
+            field=models.ImageField(blank=True, editable=False, upload_to='', verbose_name='サムネイル'),
+        ),
+        migrations.AddField(
+            model_name='familyphoto',
+            name='width',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='幅'),
+        ),
+    ]
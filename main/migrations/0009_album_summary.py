@@ -0,0 +1,28 @@
+# Generated by Django 5.2.4 on 2026-10-19 01:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0008_photo_thumbnail'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='photoalbum',
+            name='cover_style',
+            field=models.CharField(choices=[('latest', '最新の写真'), ('mosaic', 'モザイク（最新の4枚）')], default='latest', help_text='カバー写真がない場合に表示するもの', max_length=10, verbose_name='カバーの表示'),
+        ),
+        migrations.AddField(
+            model_name='photoalbum',
+            name='cover_thumbnail',
+            field=models.ImageField(blank=True, editable=False, upload_to='', verbose_name='一覧用のカバー'),
+        ),
+        migrations.AddField(
+            model_name='photoalbum',
+            name='public_photo_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='公開写真の枚数'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-19 01:38
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0009_album_summary'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='familyphoto',
+            name='photo_favorite_taken_idx',
+        ),
+        migrations.AddIndex(
+            model_name='familyphoto',
+            index=models.Index(condition=models.Q(('favorite_count__gt', 0), ('is_public', True)), fields=['-taken_date', '-created_at'], name='photo_favorited_taken_idx'),
+        ),
+    ]
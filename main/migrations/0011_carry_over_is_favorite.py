@@ -0,0 +1,57 @@
+from django.conf import settings
+from django.db import migrations
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def carry_over_favorites(apps, schema_editor):
+    """is_favorite=True の写真をアップロード者の PhotoFavorite に移し、favorite_count を数え直す
+
+    アップロード者がいない写真は最初のスーパーユーザーのお気に入りにする。
+    どちらもいない場合は行を作らずに favorite_count だけを 1 にして、
+    お気に入り一覧から消えないようにする。
+    """
+    FamilyPhoto = apps.get_model('main', 'FamilyPhoto')
+    PhotoFavorite = apps.get_model('main', 'PhotoFavorite')
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    db = schema_editor.connection.alias
+
+    fallback_id = (
+        User.objects.using(db).filter(is_superuser=True)
+        .order_by('pk').values_list('pk', flat=True).first()
+    )
+    legacy = FamilyPhoto.objects.using(db).filter(is_favorite=True)
+    favorites, orphan_ids = [], []
+    for photo_id, user_id in legacy.values_list('pk', 'uploaded_by_id').iterator():
+        user_id = user_id or fallback_id
+        if user_id is None:
+            orphan_ids.append(photo_id)
+        else:
+            favorites.append(PhotoFavorite(user_id=user_id, photo_id=photo_id))
+    PhotoFavorite.objects.using(db).bulk_create(favorites, batch_size=500, ignore_conflicts=True)
+
+    counts = (
+        PhotoFavorite.objects.using(db).filter(photo=OuterRef('pk'))
+        .order_by().values('photo').annotate(count=Count('pk')).values('count')
+    )
+    legacy.update(favorite_count=Coalesce(Subquery(counts), 0))
+    FamilyPhoto.objects.using(db).filter(pk__in=orphan_ids).update(favorite_count=F('favorite_count') + 1)
+
+
+def restore_is_favorite(apps, schema_editor):
+    """お気に入りが 1 件以上ある写真の is_favorite を立て直す（PhotoFavorite は残す）"""
+    FamilyPhoto = apps.get_model('main', 'FamilyPhoto')
+    db = schema_editor.connection.alias
+    FamilyPhoto.objects.using(db).filter(favorite_count__gt=0).update(is_favorite=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0010_favorite_count_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(carry_over_favorites, restore_is_favorite),
+    ]
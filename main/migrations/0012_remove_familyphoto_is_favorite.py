@@ -0,0 +1,17 @@
+# Generated by Django 5.2.4 on 2026-10-19 02:02
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0011_carry_over_is_favorite'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='familyphoto',
+            name='is_favorite',
+        ),
+    ]
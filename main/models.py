@@ -1,13 +1,142 @@
-from django.db import models
+from django.db import models, transaction, IntegrityError
+from django.db.models import Count, F, DEFERRED, Q, Window
+from django.db.models.functions import RowNumber
 from django.urls import reverse
 from django.core.exceptions import ValidationError
 from django.contrib.auth.models import User
-from .utils.helpers import calculate_age, validate_image_size, resize_image
+from .utils.helpers import (
+    calculate_age, validate_image_size, resize_image, create_thumbnail, get_image_info,
+    thumbnail_name, create_mosaic,
+)
+from .utils.cache import bump_versions, object_tag
+import hashlib
 import os
+import threading
 
 # Create your models here.
 
-class FamilyMember(models.Model):
+def _file_name(value):
+    """FieldFile・文字列・None からファイル名を取り出す"""
+    if value is None:
+        return ''
+    if isinstance(value, str):
+        return value
+    return value.name or ''
+
+
+class ImageChangeTrackingMixin:
+    """
+    画像フィールドの変更を追跡するMixin
+    
+    読み込み時の画像のファイル名を覚えておき、画像が変わった保存だけで検証（ファイルサイズ）・
+    古いファイルの削除・リサイズを行う。タイトルなどだけを変更した保存では、
+    古い画像を比べるためのクエリやファイルの読み書き、JPEGの再圧縮を行わない。
+    
+    フォームで検証済みの変更は save_changed() でフィールドを指定して保存できる。
+    """
+    
+    # 追跡する画像フィールド名とリサイズ後の最大サイズ
+    image_field_name = None
+    image_max_size = (800, 800)
+    
+    _loaded_image_name = None
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_image()
+        return instance
+    
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        if fields is None or self.image_field_name in fields:
+            self._remember_image()
+    
+    def _remember_image(self):
+        """保存済みの画像のファイル名を覚える（遅延読み込みの場合は DEFERRED）"""
+        value = self.__dict__.get(self.image_field_name, DEFERRED)
+        self._loaded_image_name = value if value is DEFERRED else _file_name(value)
+    
+    def _stored_image_name(self):
+        """保存済みの画像のファイル名（読み込んでいない場合だけDBから取得する）"""
+        if self._loaded_image_name is DEFERRED:
+            self._loaded_image_name = _file_name(
+                type(self)._base_manager.filter(pk=self.pk).values_list(
+                    self.image_field_name, flat=True
+                ).first()
+            )
+        return self._loaded_image_name
+    
+    def image_changed(self):
+        """
+        読み込み後に画像が変更されたかどうか
+        
+        Returns:
+            bool: 新しいファイルが設定された、または画像が削除された場合はTrue
+        """
+        value = self.__dict__.get(self.image_field_name, DEFERRED)
+        if value is DEFERRED:
+            # 遅延読み込みのまま参照も代入もされていない
+            return False
+        
+        file = getattr(self, self.image_field_name)
+        if self._state.adding:
+            return bool(file)
+        if file and not file._committed:
+            return True
+        return _file_name(file) != self._stored_image_name()
+    
+    def save(self, *args, **kwargs):
+        """
+        保存時の処理
+        
+        update_fields に画像を含めない保存は、呼び出し側で検証済みとして検証も省く。
+        """
+        update_fields = kwargs.get('update_fields')
+        image_changed = (
+            (update_fields is None or self.image_field_name in update_fields)
+            and self.image_changed()
+        )
+        old_name = self._stored_image_name() if image_changed and not self._state.adding else ''
+        
+        # バリデーション実行（遅延読み込みのフィールドは検証のために読み込まない）
+        if update_fields is None or image_changed:
+            self.full_clean(exclude=self.get_deferred_fields())
+        
+        super().save(*args, **kwargs)
+        
+        if image_changed:
+            file = getattr(self, self.image_field_name)
+            # 保存に成功してから、置き換えられた古い画像ファイルを削除する
+            if old_name and old_name != file.name:
+                file.storage.delete(old_name)
+            # 画像をリサイズ
+            if file and os.path.isfile(file.path):
+                resize_image(file.path, max_size=self.image_max_size)
+            self.image_processed()
+        self._remember_image()
+    
+    def image_processed(self):
+        """画像を変更して保存・リサイズした後の処理（サムネイルの作成など）"""
+    
+    def save_changed(self, field_names):
+        """
+        変更したフィールドだけを保存する（フォームで検証済みの場合の高速パス）
+        
+        画像を含まない場合は、指定したフィールドと updated_at だけをUPDATEする。
+        多対多のフィールドは含めない（フォームの save_m2m で保存される）。
+        
+        Args:
+            field_names (iterable): 変更したフィールド名（form.changed_data など）
+        """
+        concrete = {field.name for field in self._meta.concrete_fields}
+        fields = [name for name in field_names if name in concrete]
+        if self._state.adding or self.image_field_name in fields:
+            self.save()
+        else:
+            self.save(update_fields=fields + ['updated_at'])
+
+class FamilyMember(ImageChangeTrackingMixin, models.Model):
     ROLE_CHOICES = [
         ('父', '父'),
         ('母', '母'),
@@ -45,12 +174,15 @@ class FamilyMember(models.Model):
         ordering = ['role', 'name']
         indexes = [
             models.Index(fields=['role']),
-            models.Index(fields=['is_active']),
+            # 一覧表示（is_active=True を role, name 順）用
+            models.Index(fields=['is_active', 'role', 'name'], name='member_active_role_name_idx'),
         ]
     
     def __str__(self):
         return f"{self.name} ({self.role})"
     
+    image_field_name = 'photo'
+    
     def get_absolute_url(self):
         return reverse('family_detail', kwargs={'pk': self.pk})
     
@@ -62,31 +194,10 @@ class FamilyMember(models.Model):
         """モデルの検証"""
         super().clean()
         
-        # 画像ファイルサイズの検証
-        if self.photo:
+        # 画像ファイルサイズの検証（変更された場合のみ）
+        if self.image_changed() and self.photo:
             validate_image_size(self.photo)
     
-    def save(self, *args, **kwargs):
-        """保存時の処理"""
-        # バリデーション実行
-        self.full_clean()
-        
-        # 既存の画像ファイルがある場合は削除
-        if self.pk:
-            try:
-                old_instance = FamilyMember.objects.get(pk=self.pk)
-                if old_instance.photo and old_instance.photo != self.photo:
-                    if os.path.isfile(old_instance.photo.path):
-                        os.remove(old_instance.photo.path)
-            except FamilyMember.DoesNotExist:
-                pass
-        
-        super().save(*args, **kwargs)
-        
-        # 画像をリサイズ
-        if self.photo and os.path.isfile(self.photo.path):
-            resize_image(self.photo.path)
-    
     def delete(self, *args, **kwargs):
         """削除時の処理"""
         # 画像ファイルも削除
@@ -136,6 +247,14 @@ class PhotoAlbum(models.Model):
         null=True, 
         blank=True
     )
+    COVER_STYLE_CHOICES = [
+        ('latest', '最新の写真'),
+        ('mosaic', 'モザイク（最新の4枚）'),
+    ]
+    cover_style = models.CharField(
+        'カバーの表示', max_length=10, choices=COVER_STYLE_CHOICES, default='latest',
+        help_text='カバー写真がない場合に表示するもの'
+    )
     is_public = models.BooleanField('公開する', default=True)
     created_by = models.ForeignKey(
         User, 
@@ -147,10 +266,23 @@ class PhotoAlbum(models.Model):
     created_at = models.DateTimeField('作成日', auto_now_add=True)
     updated_at = models.DateTimeField('更新日', auto_now=True)
     
+    # 一覧用に写真の変更時に計算しておく値（refresh_summaries が UPDATE で書き込む）
+    cover_thumbnail = models.ImageField('一覧用のカバー', blank=True, editable=False)
+    public_photo_count = models.PositiveIntegerField('公開写真の枚数', default=0, editable=False)
+    
+    # モザイクのカバーに並べる枚数（2×2）と、作成した画像の保存先
+    mosaic_photo_count = 4
+    mosaic_size = (400, 400)
+    mosaic_directory = 'album_covers/mosaics/'
+    
     class Meta:
         verbose_name = '写真アルバム'
         verbose_name_plural = '写真アルバム'
         ordering = ['-created_at']
+        indexes = [
+            # 公開アルバムの一覧（新しい順）用
+            models.Index(fields=['is_public', '-created_at'], name='album_public_created_idx'),
+        ]
     
     def __str__(self):
         return self.title
@@ -161,9 +293,143 @@ class PhotoAlbum(models.Model):
     def photo_count(self):
         """アルバム内の写真数"""
         return self.photos.count()
+    
+    def delete(self, *args, **kwargs):
+        """削除時の処理"""
+        # 作成したモザイクのカバーも削除
+        if self._owns_cover_thumbnail(self.cover_thumbnail.name):
+            self.cover_thumbnail.storage.delete(self.cover_thumbnail.name)
+        
+        super().delete(*args, **kwargs)
+    
+    def _owns_cover_thumbnail(self, name):
+        """一覧用のカバーが、このアルバム用に作成したモザイクかどうか"""
+        return bool(name) and name.startswith(self.mosaic_directory)
+    
+    def _mosaic_name(self, photos):
+        """
+        モザイクのカバーのファイル名
+        
+        並べる写真の画像から決まる名前にするため、同じ写真の組み合わせでは作り直さない。
+        """
+        sources = '\n'.join(photo.thumbnail.name or photo.image.name for photo in photos)
+        digest = hashlib.sha1(sources.encode()).hexdigest()[:12]
+        return f'{self.mosaic_directory}{self.pk}-{digest}.jpg'
+    
+    def resolve_cover(self, recent_photos):
+        """
+        一覧用のカバーのファイル名を決める（モザイクは必要な場合だけ作成する）
+        
+        カバー写真 → モザイク（cover_style が 'mosaic' で写真が4枚以上）→ 最新の写真の
+        サムネイル（なければ元の画像）の順に使う。
+        
+        Args:
+            recent_photos (list): アルバム内の公開写真（撮影日の新しい順、最大 mosaic_photo_count 枚）
+        
+        Returns:
+            str: ストレージ上のファイル名（カバーがない場合は空文字）
+        """
+        if self.cover_photo:
+            return self.cover_photo.name
+        
+        if self.cover_style == 'mosaic' and len(recent_photos) >= self.mosaic_photo_count:
+            photos = recent_photos[:self.mosaic_photo_count]
+            name = self._mosaic_name(photos)
+            storage = self.cover_thumbnail.storage
+            sources = [
+                storage.path(photo.thumbnail.name or photo.image.name) for photo in photos
+            ]
+            if storage.exists(name) or create_mosaic(sources, storage.path(name), self.mosaic_size):
+                return name
+        
+        if recent_photos:
+            return recent_photos[0].thumbnail.name or recent_photos[0].image.name
+        return ''
+    
+    @classmethod
+    def refresh_summaries(cls, album_ids):
+        """
+        アルバムの公開写真の枚数と一覧用のカバーを計算し直して保存する
+        
+        枚数は1回の集計で、カバーの候補はアルバムごとの最新の写真に番号を付けて
+        （ROW_NUMBER() OVER (PARTITION BY album_id ...)）1クエリで読み込む。
+        値が変わったアルバムだけを UPDATE し、キャッシュの無効化と同期用の変更履歴の記録を行う。
+        
+        Args:
+            album_ids (iterable): アルバムのID
+        """
+        album_ids = {pk for pk in album_ids if pk}
+        if not album_ids:
+            return
+        
+        public_photos = FamilyPhoto.objects.filter(album_id__in=album_ids, is_public=True)
+        counts = dict(
+            public_photos.order_by().values('album_id').annotate(count=Count('pk'))
+            .values_list('album_id', 'count')
+        )
+        recent = {pk: [] for pk in album_ids}
+        ranked = public_photos.only('pk', 'album_id', 'image', 'thumbnail').annotate(
+            rank=Window(
+                RowNumber(),
+                partition_by=F('album_id'),
+                order_by=[F('taken_date').desc(), F('created_at').desc(), F('pk').desc()],
+            ),
+        ).filter(rank__lte=cls.mosaic_photo_count).order_by('album_id', 'rank')
+        for photo in ranked:
+            recent[photo.album_id].append(photo)
+        
+        changed = []
+        albums = cls._base_manager.filter(pk__in=album_ids).only(
+            'pk', 'cover_photo', 'cover_style', 'cover_thumbnail', 'public_photo_count'
+        )
+        for album in albums:
+            old_cover = album.cover_thumbnail.name
+            cover = album.resolve_cover(recent[album.pk])
+            count = counts.get(album.pk, 0)
+            if cover == old_cover and count == album.public_photo_count:
+                continue
+            cls._base_manager.filter(pk=album.pk).update(
+                cover_thumbnail=cover, public_photo_count=count
+            )
+            if old_cover != cover and album._owns_cover_thumbnail(old_cover):
+                album.cover_thumbnail.storage.delete(old_cover)
+            changed.append(album.pk)
+        
+        if changed:
+            bump_versions('album', *[object_tag('album', pk) for pk in changed])
+            ChangeLog.record('album', changed, ChangeLog.UPDATED)
+    
+    @classmethod
+    def refresh_summaries_on_commit(cls, album_ids):
+        """
+        コミット後に refresh_summaries を実行する
+        
+        同じトランザクション内で何枚の写真を変更しても、最初に実行されたコールバックが
+        溜まったアルバムをまとめて1回で計算し、残りは何もしない。
+        
+        Args:
+            album_ids (iterable): アルバムのID
+        """
+        pending = getattr(_pending_album_refresh, 'album_ids', None)
+        if pending is None:
+            pending = _pending_album_refresh.album_ids = set()
+        pending.update(pk for pk in album_ids if pk)
+        transaction.on_commit(cls._refresh_pending_summaries)
+    
+    @classmethod
+    def _refresh_pending_summaries(cls):
+        album_ids = getattr(_pending_album_refresh, 'album_ids', None)
+        _pending_album_refresh.album_ids = None
+        if album_ids:
+            cls.refresh_summaries(album_ids)
+
+
+# コミット後に計算し直すアルバムのID（スレッドごと）
+# ロールバックで残ったIDは、次にコミットされた時に一緒に計算される
+_pending_album_refresh = threading.local()
 
 
-class FamilyPhoto(models.Model):
+class FamilyPhoto(ImageChangeTrackingMixin, models.Model):
     """家族の写真"""
     title = models.CharField('タイトル', max_length=200)
     image = models.ImageField(
@@ -171,6 +437,10 @@ class FamilyPhoto(models.Model):
         upload_to='gallery/%Y/%m/',
         help_text='推奨サイズ: 10MB以下'
     )
+    # 画像の変更時に作成する一覧用の縮小版と、リサイズ後の画像のサイズ（仮想スクロールの配置に使う）
+    thumbnail = models.ImageField('サムネイル', blank=True, editable=False)
+    width = models.PositiveIntegerField('幅', null=True, blank=True, editable=False)
+    height = models.PositiveIntegerField('高さ', null=True, blank=True, editable=False)
     description = models.TextField('説明・コメント', blank=True)
     taken_date = models.DateField(
         '撮影日', 
@@ -205,7 +475,8 @@ class FamilyPhoto(models.Model):
     )
     
     # メタデータ
-    is_favorite = models.BooleanField('お気に入り', default=False)
+    # PhotoFavorite の件数（PhotoFavorite.toggle が F() で増減する）
+    favorite_count = models.PositiveIntegerField('お気に入り数', default=0, editable=False)
     is_public = models.BooleanField('公開する', default=True)
     uploaded_by = models.ForeignKey(
         User,
@@ -223,14 +494,45 @@ class FamilyPhoto(models.Model):
         ordering = ['-taken_date', '-created_at']
         indexes = [
             models.Index(fields=['taken_date']),
-            models.Index(fields=['is_favorite']),
-            models.Index(fields=['is_public']),
-            models.Index(fields=['album']),
+            # ギャラリー・ホーム（is_public=True を撮影日の新しい順）用
+            models.Index(
+                fields=['is_public', '-taken_date', '-created_at'],
+                name='photo_public_taken_idx',
+            ),
+            # お気に入り一覧用（誰かがお気に入りにしている公開写真）
+            models.Index(
+                fields=['-taken_date', '-created_at'],
+                name='photo_favorited_taken_idx',
+                condition=Q(is_public=True, favorite_count__gt=0),
+            ),
+            # アルバム詳細（アルバム内の公開写真を撮影日の新しい順）用
+            models.Index(
+                fields=['album', 'is_public', '-taken_date'],
+                name='photo_album_public_taken_idx',
+            ),
         ]
     
     def __str__(self):
         return f"{self.title} ({self.taken_date})"
     
+    # ギャラリー用は大きめに保持する
+    image_field_name = 'image'
+    image_max_size = (1920, 1920)
+    thumbnail_size = (400, 400)
+    
+    _loaded_album_id = None
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # アルバムを移動した時に、移動元のアルバムの枚数・カバーも計算し直すため
+        instance._loaded_album_id = instance.__dict__.get('album_id')
+        return instance
+    
+    def album_ids_to_refresh(self):
+        """保存・削除で枚数・カバーが変わりうるアルバムのID（読み込み時と今のアルバム）"""
+        return {self._loaded_album_id, self.__dict__.get('album_id')} - {None}
+    
     def get_absolute_url(self):
         return reverse('photo_detail', kwargs={'pk': self.pk})
     
@@ -238,38 +540,46 @@ class FamilyPhoto(models.Model):
         """モデルの検証"""
         super().clean()
         
-        # 画像ファイルサイズの検証
-        if self.image:
+        # 画像ファイルサイズの検証（変更された場合のみ）
+        if self.image_changed() and self.image:
             max_size = 10 * 1024 * 1024  # 10MB
             if self.image.size > max_size:
                 raise ValidationError('画像ファイルは10MB以下にしてください。')
     
-    def save(self, *args, **kwargs):
-        """保存時の処理"""
-        # バリデーション実行
-        self.full_clean()
-        
-        # 既存の画像ファイルがある場合は削除
-        if self.pk:
-            try:
-                old_instance = FamilyPhoto.objects.get(pk=self.pk)
-                if old_instance.image and old_instance.image != self.image:
-                    if os.path.isfile(old_instance.image.path):
-                        os.remove(old_instance.image.path)
-            except FamilyPhoto.DoesNotExist:
-                pass
-        
-        super().save(*args, **kwargs)
+    def image_processed(self):
+        """
+        サムネイルを作り直し、画像のサイズと一緒に保存する
         
-        # 画像をリサイズ（ギャラリー用は大きめに保持）
+        保存後の処理のため、シグナルを発行しない UPDATE で書き込む。
+        """
+        old_thumbnail = self.thumbnail.name
+        name, info = '', None
         if self.image and os.path.isfile(self.image.path):
-            resize_image(self.image.path, max_size=(1920, 1920))
+            info = get_image_info(self.image.path)
+            name = thumbnail_name(self.image.name)
+            if not info or not create_thumbnail(
+                self.image.path, self.image.storage.path(name), self.thumbnail_size
+            ):
+                name = ''
+        if old_thumbnail and old_thumbnail != name:
+            self.thumbnail.storage.delete(old_thumbnail)
+        
+        self.thumbnail.name = name
+        self.width, self.height = (info['width'], info['height']) if info else (None, None)
+        type(self)._base_manager.filter(pk=self.pk).update(
+            thumbnail=name, width=self.width, height=self.height
+        )
+        # アルバムのカバーがこの写真のサムネイルを指している場合がある
+        if self.album_id:
+            PhotoAlbum.refresh_summaries_on_commit([self.album_id])
     
     def delete(self, *args, **kwargs):
         """削除時の処理"""
-        # 画像ファイルも削除
+        # 画像ファイル・サムネイルも削除
         if self.image and os.path.isfile(self.image.path):
             os.remove(self.image.path)
+        if self.thumbnail:
+            self.thumbnail.storage.delete(self.thumbnail.name)
         
         super().delete(*args, **kwargs)
     
@@ -280,8 +590,107 @@ class FamilyPhoto(models.Model):
     def get_tags_names(self):
         """タグ名のリストを取得"""
         return list(self.tags.values_list('name', flat=True))
+    
+    @classmethod
+    def recent_by_member(cls, member_ids, limit=3):
+        """
+        家族メンバーごとの最新の公開写真をまとめて取得する
+        
+        中間テーブルをメンバーごとに撮影日の新しい順に番号付けし
+        （ROW_NUMBER() OVER (PARTITION BY familymember_id ...)）、上位だけを1クエリで読み込む。
+        
+        Args:
+            member_ids (iterable): 家族メンバーのID
+            limit (int): メンバーあたりの枚数
+        
+        Returns:
+            dict: メンバーのID -> 写真のリスト（写真がないメンバーは空のリスト）
+        """
+        recent = {member_id: [] for member_id in member_ids}
+        if not recent:
+            return recent
+        
+        links = cls.family_members.through.objects.filter(
+            familymember_id__in=recent, familyphoto__is_public=True,
+        ).annotate(
+            rank=Window(
+                RowNumber(),
+                partition_by=F('familymember_id'),
+                order_by=[
+                    F('familyphoto__taken_date').desc(),
+                    F('familyphoto__created_at').desc(),
+                    F('familyphoto_id').desc(),
+                ],
+            ),
+        ).filter(rank__lte=limit).select_related('familyphoto').order_by('familymember_id', 'rank')
+        for link in links:
+            recent[link.familymember_id].append(link.familyphoto)
+        return recent
 
 
+
+class PhotoFavorite(models.Model):
+    """ユーザーごとのお気に入り写真"""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='ユーザー',
+        related_name='photo_favorites'
+    )
+    photo = models.ForeignKey(
+        FamilyPhoto,
+        on_delete=models.CASCADE,
+        verbose_name='写真',
+        related_name='favorites'
+    )
+    created_at = models.DateTimeField('登録日時', auto_now_add=True)
+    
+    class Meta:
+        verbose_name = 'お気に入り'
+        verbose_name_plural = 'お気に入り'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'photo'], name='unique_photo_favorite'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user} ❤️ {self.photo_id}"
+    
+    @classmethod
+    def toggle(cls, user, photo_id):
+        """
+        お気に入りを切り替える
+        
+        写真は読み込まず、お気に入りの削除または追加と、写真の favorite_count の
+        F() による増減だけを行う（画像の処理や updated_at の更新は行わない）。
+        同時に追加された場合は一意制約で検知し、件数を二重に数えない。
+        
+        Args:
+            user (User): ユーザー
+            photo_id (int): 写真のID
+            
+        Returns:
+            tuple: (切り替え後にお気に入りかどうか, 写真の favorite_count)。
+                件数は更新した行のロックを持ったまま読むため、同時の切り替えがあっても
+                この切り替えの直後の値になる。
+        """
+        photos = FamilyPhoto.objects.filter(pk=photo_id)
+        with transaction.atomic():
+            deleted, _ = cls.objects.filter(user=user, photo_id=photo_id).delete()
+            if deleted:
+                photos.update(favorite_count=F('favorite_count') - deleted)
+                is_favorite = False
+            else:
+                try:
+                    with transaction.atomic():
+                        cls.objects.create(user=user, photo_id=photo_id)
+                except IntegrityError:
+                    # 別のリクエストが先に追加した（件数はそのリクエストが増やす）
+                    return True, photos.values_list('favorite_count', flat=True).first()
+                photos.update(favorite_count=F('favorite_count') + 1)
+                is_favorite = True
+            ChangeLog.record('photo', [photo_id], ChangeLog.UPDATED)
+            return is_favorite, photos.values_list('favorite_count', flat=True).first()
+
 class EventCategory(models.Model):
     """イベントカテゴリ"""
     name = models.CharField('カテゴリ名', max_length=50, unique=True)
@@ -364,10 +773,19 @@ class FamilyEvent(models.Model):
         verbose_name = '家族イベント'
         verbose_name_plural = '家族イベント'
         ordering = ['start_date', 'start_time']
+        indexes = [
+            # カレンダー・今後のイベント（開始日の範囲指定と並び替え）用
+            models.Index(fields=['start_date', 'start_time'], name='event_start_idx'),
+            # 関連イベント（同じカテゴリ）用
+            models.Index(fields=['category', 'start_date'], name='event_category_start_idx'),
+        ]
     
     def __str__(self):
         return f"{self.title} ({self.start_date})"
     
+    def get_absolute_url(self):
+        return reverse('event_detail', kwargs={'event_id': self.pk})
+    
     def get_duration_display(self):
         """期間の表示用文字列"""
         if self.is_all_day:
@@ -429,3 +847,53 @@ class FamilyEvent(models.Model):
                 'urgent': '#e74c3c',   # 赤
             }
             return priority_colors.get(self.priority, '#2ecc71')
+
+
+class ChangeLog(models.Model):
+    """
+    同期用の変更履歴（/api/v1/sync/）
+    
+    写真・アルバム・家族メンバー・イベントの作成・更新・削除を、変更と同じトランザクションで
+    記録する（main.signals）。seq は全てのオブジェクトを通して増加するため、クライアントは
+    前回受け取った seq より後の行だけを読めばよい。
+    seq の順とコミットの順は一致しないことがあるため、同期APIは未コミットかもしれない
+    欠番の手前までしか cursor を進めない（main.api._committed_prefix）。
+    """
+    CREATED = 'created'
+    UPDATED = 'updated'
+    DELETED = 'deleted'
+    ACTION_CHOICES = [
+        (CREATED, '作成'),
+        (UPDATED, '更新'),
+        (DELETED, '削除'),
+    ]
+    
+    seq = models.BigAutoField('シーケンス', primary_key=True)
+    # キャッシュの名前空間と同じ（'photo'・'album'・'member'・'event'）
+    object_type = models.CharField('種類', max_length=20)
+    object_id = models.BigIntegerField('オブジェクトID')
+    action = models.CharField('操作', max_length=10, choices=ACTION_CHOICES)
+    changed_at = models.DateTimeField('変更日時', auto_now_add=True, db_index=True)
+    
+    class Meta:
+        verbose_name = '変更履歴'
+        verbose_name_plural = '変更履歴'
+        ordering = ['seq']
+    
+    def __str__(self):
+        return f"#{self.seq} {self.object_type}:{self.object_id} {self.action}"
+    
+    @classmethod
+    def record(cls, object_type, object_ids, action):
+        """
+        変更を記録する
+        
+        Args:
+            object_type (str): 'photo'・'album'・'member'・'event'
+            object_ids (iterable): 変更されたオブジェクトのID
+            action (str): CREATED・UPDATED・DELETED
+        """
+        cls.objects.bulk_create(
+            [cls(object_type=object_type, object_id=pk, action=action) for pk in object_ids],
+            batch_size=500,
+        )
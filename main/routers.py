@@ -0,0 +1,89 @@
+"""
+データベースルーター
+
+リクエスト中の読み込みをレプリカに、書き込みをプライマリ（default）に振り分ける。
+書き込みを行ったリクエストと、その後しばらくの同じブラウザからの
+リクエストは、レプリカの遅延で古いデータを読まないようプライマリに固定する。
+"""
+
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+
+PRIMARY = 'default'
+
+# リクエスト単位の状態（main.middleware.ReplicaRoutingMiddleware が設定する）
+_routing_state = ContextVar('replica_routing_state', default=None)
+
+
+def replica_aliases():
+    """設定されているレプリカのエイリアス一覧"""
+    return [alias for alias in settings.DATABASES if alias != PRIMARY]
+
+
+def begin_request(pinned=False):
+    """
+    リクエストの開始時に状態を初期化する
+
+    Args:
+        pinned (bool): 最初からプライマリに固定するかどうか
+
+    Returns:
+        Token: end_request に渡すトークン
+    """
+    return _routing_state.set({'pinned': pinned, 'wrote': False})
+
+
+def end_request(token):
+    """
+    リクエストの終了時に状態を破棄する
+
+    Returns:
+        bool: リクエスト中に書き込みがあったかどうか
+    """
+    state = _routing_state.get()
+    _routing_state.reset(token)
+    return bool(state and state['wrote'])
+
+
+def pin_to_primary():
+    """以降の読み込みをプライマリに固定する"""
+    state = _routing_state.get()
+    if state is not None:
+        state['pinned'] = True
+
+
+class ReplicaRouter:
+    """読み込みをレプリカに振り分けるルーター"""
+
+    def db_for_read(self, model, **hints):
+        state = _routing_state.get()
+        # リクエスト外（管理コマンド等）とプライマリ固定中はプライマリから読む
+        if state is None or state['pinned']:
+            return PRIMARY
+
+        # 取得済みオブジェクトの関連は同じデータベースから読む
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db
+
+        replicas = replica_aliases()
+        if not replicas:
+            return None
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        state = _routing_state.get()
+        if state is not None:
+            state['pinned'] = True
+            state['wrote'] = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # レプリカはプライマリの複製なので、どの組み合わせでも関連付けを許可する
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # マイグレーションはプライマリにのみ適用し、レプリカには複製で反映する
+        return db == PRIMARY
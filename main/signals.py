@@ -0,0 +1,285 @@
+"""
+モデル変更時のキャッシュ無効化シグナル
+
+各モデルの保存・削除・多対多の変更に応じて、関係するキャッシュタグの
+バージョンを更新する（main.utils.cache を参照）。
+写真・アルバム・イベントの変更は、コミット後にライブ更新（main.live）でも通知する。
+写真・アルバム・家族メンバー・イベントの変更は、同期用の変更履歴（ChangeLog）にも記録する。
+写真・アルバムの変更後は、アルバムの枚数と一覧用のカバーを計算し直す。
+"""
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete, pre_delete, m2m_changed
+from django.dispatch import receiver
+
+from . import live
+from .models import (
+    ChangeLog, FamilyMember, FamilyPhoto, PhotoTag, PhotoAlbum, EventCategory, FamilyEvent,
+)
+from .utils.cache import bump_versions, object_tag
+
+# モデルごとのキャッシュ名前空間
+CACHE_NAMESPACES = {
+    FamilyMember: 'member',
+    FamilyPhoto: 'photo',
+    PhotoTag: 'tag',
+    PhotoAlbum: 'album',
+    EventCategory: 'category',
+    FamilyEvent: 'event',
+}
+
+# 変更されたモデルの一覧表示に影響する他の名前空間
+DEPENDENT_NAMESPACES = {
+    'member': ['photo', 'event'],
+    'photo': ['album', 'tag'],
+    'tag': ['photo'],
+    'album': ['photo'],
+    'category': ['event'],
+    'event': [],
+}
+
+# ライブ更新で通知するモデル
+LIVE_TYPES = {
+    FamilyPhoto: 'photo',
+    PhotoAlbum: 'album',
+    FamilyEvent: 'event',
+}
+
+# 同期用の変更履歴に記録するモデル（object_type はキャッシュの名前空間と同じ）
+SYNC_MODELS = {FamilyPhoto, PhotoAlbum, FamilyMember, FamilyEvent}
+
+# 削除すると、シグナルを発行せずに参照が外れる（SET_NULL・中間テーブルの削除）同期対象
+# 削除されるモデル -> [(参照しているモデル, フィールド名)]
+DELETE_DEPENDENTS = {
+    PhotoAlbum: [(FamilyPhoto, 'album')],
+    EventCategory: [(FamilyEvent, 'category')],
+    PhotoTag: [(FamilyPhoto, 'tags')],
+    FamilyMember: [(FamilyPhoto, 'family_members'), (FamilyEvent, 'participants')],
+}
+
+
+def record_changes(model, pks, action=ChangeLog.UPDATED):
+    """
+    同期用の変更履歴に記録する（同期対象以外のモデルは何もしない）
+
+    Args:
+        model: モデルクラス
+        pks (iterable): 変更されたオブジェクトの主キー
+        action (str): ChangeLog.CREATED・UPDATED・DELETED
+    """
+    if model in SYNC_MODELS:
+        ChangeLog.record(CACHE_NAMESPACES[model], pks, action)
+
+
+def photo_tags(photo):
+    """写真の変更で無効化するタグの一覧"""
+    tags = [object_tag('photo', photo.pk)]
+    if photo.album_id:
+        tags.append(object_tag('album', photo.album_id))
+    if photo.pk:
+        # prefetch_related 済み（APIの一括更新など）ならクエリを実行しない
+        tags += [object_tag('tag', tag.pk) for tag in photo.tags.all()]
+        tags += [object_tag('member', member.pk) for member in photo.family_members.all()]
+    return tags
+
+
+def invalidate_model(model, pks=()):
+    """
+    モデルに関係するキャッシュを無効化する
+
+    queryset.update() などシグナルが発行されない一括更新の後に呼び出す。
+    同期用の変更履歴にも更新として記録する。
+
+    Args:
+        model: モデルクラス
+        pks (iterable): 変更されたオブジェクトの主キー
+    """
+    bump_model_versions(model, pks)
+    record_changes(model, pks)
+
+
+def bump_model_versions(model, pks):
+    """モデルと、変更されたオブジェクトのキャッシュタグのバージョンを更新する"""
+    namespace = CACHE_NAMESPACES[model]
+    bump_versions(
+        namespace,
+        *DEPENDENT_NAMESPACES[namespace],
+        *[object_tag(namespace, pk) for pk in pks]
+    )
+
+
+@receiver(pre_delete, sender=FamilyPhoto)
+def remember_photo_tags(sender, instance, **kwargs):
+    """
+    写真の削除前に、無効化するタグを覚えておく
+
+    post_delete の時点では中間テーブルの行が削除済みで、写っていたメンバーや
+    タグが分からなくなるため。
+    """
+    instance._deleted_cache_tags = photo_tags(instance)
+
+
+@receiver(post_save, sender=FamilyPhoto)
+@receiver(post_delete, sender=FamilyPhoto)
+def invalidate_photo(sender, instance, signal, **kwargs):
+    """写真の保存・削除時"""
+    if signal is post_delete:
+        tags = getattr(instance, '_deleted_cache_tags', None) or photo_tags(instance)
+    else:
+        tags = photo_tags(instance)
+    bump_versions('photo', *DEPENDENT_NAMESPACES['photo'], *tags)
+
+
+@receiver(post_save, sender=FamilyPhoto)
+@receiver(post_delete, sender=FamilyPhoto)
+def refresh_photo_albums(sender, instance, **kwargs):
+    """写真の保存・削除時に、アルバムの枚数・一覧用のカバーをコミット後に計算し直す"""
+    PhotoAlbum.refresh_summaries_on_commit(instance.album_ids_to_refresh())
+    instance._loaded_album_id = instance.album_id
+
+
+@receiver(post_save, sender=PhotoAlbum)
+def refresh_album_summary(sender, instance, **kwargs):
+    """アルバムの保存時（カバー写真・カバーの表示の変更）"""
+    PhotoAlbum.refresh_summaries_on_commit([instance.pk])
+
+
+@receiver(post_save, sender=FamilyMember)
+@receiver(post_delete, sender=FamilyMember)
+@receiver(post_save, sender=PhotoTag)
+@receiver(post_delete, sender=PhotoTag)
+@receiver(post_save, sender=PhotoAlbum)
+@receiver(post_delete, sender=PhotoAlbum)
+@receiver(post_save, sender=EventCategory)
+@receiver(post_delete, sender=EventCategory)
+@receiver(post_save, sender=FamilyEvent)
+@receiver(post_delete, sender=FamilyEvent)
+def invalidate_instance(sender, instance, **kwargs):
+    """写真以外のモデルの保存・削除時"""
+    bump_model_versions(sender, [instance.pk])
+
+
+@receiver(post_save, sender=FamilyPhoto)
+@receiver(post_delete, sender=FamilyPhoto)
+@receiver(post_save, sender=PhotoAlbum)
+@receiver(post_delete, sender=PhotoAlbum)
+@receiver(post_save, sender=FamilyMember)
+@receiver(post_delete, sender=FamilyMember)
+@receiver(post_save, sender=FamilyEvent)
+@receiver(post_delete, sender=FamilyEvent)
+def record_instance_change(sender, instance, signal, created=False, **kwargs):
+    """同期対象の保存・削除を変更履歴に記録する"""
+    if signal is post_delete:
+        action = ChangeLog.DELETED
+    else:
+        action = ChangeLog.CREATED if created else ChangeLog.UPDATED
+    record_changes(sender, [instance.pk], action)
+
+
+@receiver(pre_delete, sender=PhotoAlbum)
+@receiver(pre_delete, sender=EventCategory)
+@receiver(pre_delete, sender=PhotoTag)
+@receiver(pre_delete, sender=FamilyMember)
+def record_dependent_changes(sender, instance, **kwargs):
+    """削除で参照が外れる写真・イベントを、更新として変更履歴に記録する"""
+    for model, field_name in DELETE_DEPENDENTS[sender]:
+        pks = list(model.objects.filter(**{field_name: instance}).values_list('pk', flat=True))
+        record_changes(model, pks)
+
+
+@receiver(post_save, sender=FamilyPhoto)
+@receiver(post_delete, sender=FamilyPhoto)
+@receiver(post_save, sender=PhotoAlbum)
+@receiver(post_delete, sender=PhotoAlbum)
+@receiver(post_save, sender=FamilyEvent)
+@receiver(post_delete, sender=FamilyEvent)
+def publish_change(sender, instance, signal, created=False, **kwargs):
+    """写真・アルバム・イベントの変更をライブ更新で通知する"""
+    if not settings.LIVE_UPDATES:
+        return
+
+    if signal is post_delete:
+        action = 'deleted'
+    elif not getattr(instance, 'is_public', True):
+        # 非公開にされたものは一覧から消えるため、削除として通知する
+        if created:
+            return
+        action = 'deleted'
+    else:
+        action = 'created' if created else 'updated'
+
+    # 通知の内容は今の値で作り、ロールバックされた変更は通知しない
+    message = live.change_message(LIVE_TYPES[sender], action, instance)
+    transaction.on_commit(lambda: live.publish(message))
+
+
+def _m2m_accessor(through, instance, model, reverse):
+    """
+    instance から中間テーブル through の関連オブジェクトを辿る属性名
+
+    Args:
+        through: 多対多の中間テーブルのモデル
+        instance: m2m_changed の instance
+        model: m2m_changed の model（関連オブジェクトのモデル）
+        reverse (bool): instance が多対多フィールドを持たない側かどうか
+
+    Returns:
+        str: 属性名（例: photo.tags なら 'tags'、tag.photos なら 'photos'）
+    """
+    owner = model if reverse else type(instance)
+    field = next(f for f in owner._meta.many_to_many if f.remote_field.through is through)
+    return field.remote_field.get_accessor_name() if reverse else field.name
+
+
+@receiver(m2m_changed, sender=FamilyPhoto.tags.through)
+@receiver(m2m_changed, sender=FamilyPhoto.family_members.through)
+@receiver(m2m_changed, sender=FamilyEvent.participants.through)
+def invalidate_m2m(sender, instance, action, reverse, model, pk_set, **kwargs):
+    """多対多の関係が変更された時"""
+    # post_clear では pk_set が渡されないため、外される関連を pre_clear で控えておく
+    if action == 'pre_clear':
+        cleared = instance.__dict__.setdefault('_m2m_cleared_pks', {})
+        accessor = _m2m_accessor(sender, instance, model, reverse)
+        cleared[sender] = set(getattr(instance, accessor).values_list('pk', flat=True))
+        return
+    if action == 'post_clear':
+        pk_set = instance.__dict__.get('_m2m_cleared_pks', {}).pop(sender, set())
+    if not action.startswith('post_'):
+        return
+
+    # instance側とmodel側の両方のオブジェクトを無効化する
+    instance_namespace = CACHE_NAMESPACES[type(instance)]
+    related_namespace = CACHE_NAMESPACES[model]
+    tags = [
+        instance_namespace,
+        related_namespace,
+        object_tag(instance_namespace, instance.pk),
+    ]
+    tags += [object_tag(related_namespace, pk) for pk in pk_set or ()]
+
+    if isinstance(instance, FamilyPhoto) and instance.album_id:
+        tags.append(object_tag('album', instance.album_id))
+    bump_versions(*tags)
+
+    # 関連の一覧（include=）が変わるため、多対多フィールドを持つ側（写真・イベント）を記録する
+    if reverse:
+        record_changes(model, sorted(pk_set or ()))
+    else:
+        record_changes(type(instance), [instance.pk])
+
+
+@receiver(pre_delete, sender=User)
+def release_user_favorites(sender, instance, **kwargs):
+    """
+    ユーザーの削除時に、そのユーザーのお気に入りの分だけ写真の favorite_count を減らす
+
+    お気に入り自体は CASCADE で削除される。
+    """
+    photo_ids = list(instance.photo_favorites.values_list('photo_id', flat=True))
+    if photo_ids:
+        FamilyPhoto.objects.filter(pk__in=photo_ids).update(favorite_count=F('favorite_count') - 1)
+        bump_versions(*[object_tag('photo', pk) for pk in photo_ids])
+        record_changes(FamilyPhoto, photo_ids)
@@ -0,0 +1,37 @@
+"""
+静的ファイル用のストレージ
+"""
+
+import os
+
+from whitenoise.storage import CompressedManifestStaticFilesStorage
+
+from .utils.assets import MINIFIERS
+
+
+class MinifiedManifestStaticFilesStorage(CompressedManifestStaticFilesStorage):
+    """
+    CSS / JavaScript を圧縮してからハッシュ付きファイル名とgzip/brotliを作成するストレージ
+
+    圧縮済みのファイル（*.min.*）と管理画面のファイルはそのまま配信する。
+    """
+
+    def minify(self, path):
+        """収集済みのファイルを圧縮して上書きする"""
+        minifier = MINIFIERS.get(os.path.splitext(path)[1])
+        if minifier is None or '.min.' in path or path.startswith('admin/'):
+            return
+
+        full_path = self.path(path)
+        with open(full_path, encoding='utf-8') as f:
+            content = f.read()
+        with open(full_path, 'w', encoding='utf-8') as f:
+            f.write(minifier(content))
+
+    def post_process(self, paths, dry_run=False, **options):
+        if not dry_run:
+            for path in paths:
+                self.minify(path)
+                # ハッシュの計算を収集元ではなく圧縮後のファイルから行う
+                paths[path] = (self, path)
+        yield from super().post_process(paths, dry_run=dry_run, **options)
@@ -3,10 +3,13 @@ Custom template tags for the main app.
 """
 
 from django import template
+from django.template.loader import render_to_string
+from django.utils import timezone
 from django.utils.safestring import mark_safe
 from django.db.models import Count
 from ..models import FamilyMember, FamilyPhoto, PhotoTag, PhotoAlbum
 from ..utils.helpers import get_role_emoji, format_date_japanese, calculate_age, truncate_text
+from ..utils.cache import make_key, get_or_set, cached_fragment, cache_stats, object_tag
 
 register = template.Library()
 
@@ -35,25 +38,45 @@ def truncate_chars(value, length):
     return truncate_text(value, int(length))
 
 
-@register.inclusion_tag('main/components/member_card.html')
-def member_card(member, show_detail_link=True, show_photos=False):
-    """家族メンバーカードコンポーネント"""
-    context = {
-        'member': member,
-        'show_detail_link': show_detail_link,
-        'show_photos': show_photos,
-        'role_emoji': get_role_emoji(member.role),
-    }
+@register.simple_tag
+def member_card(member, show_detail_link=True, show_photos=False, recent_photos=None):
+    """
+    家族メンバーカードコンポーネント（断片キャッシュ付き）
+    
+    一覧で show_photos を使う場合は、FamilyPhoto.recent_by_member() でページ分の
+    最新写真をまとめて読み込み、recent_photos に渡す（カードごとのクエリを避ける）。
     
-    if show_photos:
-        # メンバーの最新写真を取得
-        recent_photos = FamilyPhoto.objects.filter(
-            family_members=member,
-            is_public=True
-        ).order_by('-taken_date')[:3]
-        context['recent_photos'] = recent_photos
+    Args:
+        member: 家族メンバー
+        show_detail_link (bool): 詳細ページへのリンクを表示するかどうか
+        show_photos (bool): 最新の写真を表示するかどうか
+        recent_photos (dict): メンバーのID -> 最新の写真のリスト（読み込み済みの場合）
+    """
+    if show_photos and recent_photos is None:
+        recent_photos = FamilyPhoto.recent_by_member([member.pk])
+    photos = recent_photos.get(member.pk, []) if show_photos else []
     
-    return context
+    def render():
+        context = {
+            'member': member,
+            'show_detail_link': show_detail_link,
+            'show_photos': show_photos,
+            'role_emoji': get_role_emoji(member.role),
+            'recent_photos': photos,
+        }
+        return render_to_string('main/components/member_card.html', context)
+    
+    # 年齢表示が日付で変わるため、誕生日がある場合は日付もキーに含める
+    # 写真の削除はメンバーのタグを更新しないため、表示する写真のIDもキーに含める
+    parts = [
+        member.pk, member.updated_at, show_detail_link, show_photos,
+        timezone.localdate() if member.birthday else None,
+        [photo.pk for photo in photos],
+    ]
+    html = cached_fragment(
+        'member_card', parts, [object_tag('member', member.pk)], render
+    )
+    return mark_safe(html)
 
 
 @register.inclusion_tag('main/components/member_avatar.html')
@@ -66,15 +89,24 @@ def member_avatar(member, size='120px'):
     }
 
 
-@register.inclusion_tag('main/components/photo_card.html')
+@register.simple_tag
 def photo_card(photo, show_details=True, card_size='md'):
-    """写真のカードコンポーネント"""
-    return {
-        'photo': photo,
-        'show_details': show_details,
-        'card_size': card_size,
-        'formatted_date': format_date_japanese(photo.taken_date),
-    }
+    """写真のカードコンポーネント（断片キャッシュ付き）"""
+    def render():
+        return render_to_string('main/components/photo_card.html', {
+            'photo': photo,
+            'show_details': show_details,
+            'card_size': card_size,
+            'formatted_date': format_date_japanese(photo.taken_date),
+        })
+    
+    # 表示するタグ・メンバーの名前の変更でも表示が変わるため、それぞれのタグに依存させる
+    # （付け外しは写真のタグが更新される。prefetch_related 済みならクエリは増えない）
+    parts = [photo.pk, photo.updated_at, show_details, card_size]
+    tags = [object_tag('photo', photo.pk)]
+    tags += [object_tag('tag', tag.pk) for tag in photo.tags.all()]
+    tags += [object_tag('member', member.pk) for member in photo.family_members.all()]
+    return mark_safe(cached_fragment('photo_card', parts, tags, render))
 
 
 @register.inclusion_tag('main/components/photo_grid.html')
@@ -106,25 +138,28 @@ def tag_list(tags, show_count=False, max_tags=None):
     }
 
 
-@register.inclusion_tag('main/components/album_card.html')
+@register.simple_tag
 def album_card(album, show_cover=True):
-    """アルバムのカードコンポーネント"""
-    cover_photo = None
-    if show_cover:
-        # カバー写真があればそれを、なければ最新の写真を取得
-        if album.cover_photo:
-            cover_photo = album.cover_photo
-        else:
-            latest_photo = album.photos.filter(is_public=True).first()
-            if latest_photo:
-                cover_photo = latest_photo.image
+    """アルバムのカードコンポーネント（断片キャッシュ付き）"""
+    def render():
+        # カバーと枚数は写真の変更時に計算済み（PhotoAlbum.refresh_summaries）
+        return render_to_string('main/components/album_card.html', {
+            'album': album,
+            'cover_photo': album.cover_thumbnail if show_cover else None,
+            'photo_count': album.public_photo_count,
+            'show_cover': show_cover,
+        })
     
-    return {
-        'album': album,
-        'cover_photo': cover_photo,
-        'photo_count': album.photo_count(),
-        'show_cover': show_cover,
-    }
+    # アルバム内の写真の変更は 'album:<pk>' のバージョンで検知する
+    parts = [album.pk, album.updated_at, show_cover]
+    tags = [object_tag('album', album.pk)]
+    return mark_safe(cached_fragment('album_card', parts, tags, render))
+
+
+@register.simple_tag
+def fragment_cache_stats():
+    """キャッシュのヒット・ミス数を取得するタグ"""
+    return cache_stats()
 
 
 @register.inclusion_tag('main/components/breadcrumb.html')
@@ -161,12 +196,13 @@ def custom_pagination(page_obj, page_range=5):
 @register.simple_tag
 def photo_stats():
     """写真の統計情報を取得するタグ"""
-    return {
+    key = make_key('photo_stats', tags=['photo', 'tag', 'album', 'favorite'])
+    return get_or_set(key, lambda: {
         'total_photos': FamilyPhoto.objects.filter(is_public=True).count(),
-        'favorite_photos': FamilyPhoto.objects.filter(is_favorite=True, is_public=True).count(),
+        'favorite_photos': FamilyPhoto.objects.filter(favorite_count__gt=0, is_public=True).count(),
         'total_tags': PhotoTag.objects.count(),
         'total_albums': PhotoAlbum.objects.filter(is_public=True).count(),
-    }
+    })
 
 
 @register.simple_tag
@@ -174,16 +210,16 @@ def recent_photos(count=6):
     """最新の写真を取得するタグ"""
     return FamilyPhoto.objects.filter(is_public=True).select_related(
         'album'
-    ).prefetch_related('tags', 'family_members').order_by('-taken_date')[:count]
+    ).prefetch_related('tags', 'family_members').order_by('-taken_date', '-created_at')[:count]
 
 
 @register.simple_tag
 def favorite_photos(count=3):
-    """お気に入りの写真を取得するタグ"""
+    """誰かがお気に入りにしている写真を取得するタグ"""
     return FamilyPhoto.objects.filter(
-        is_favorite=True, 
+        favorite_count__gt=0,
         is_public=True
-    ).select_related('album').prefetch_related('tags', 'family_members').order_by('-taken_date')[:count]
+    ).select_related('album').prefetch_related('tags', 'family_members').order_by('-taken_date', '-created_at')[:count]
 
 
 @register.simple_tag
@@ -1,3 +1,1378 @@
-from django.test import TestCase
+"""
+ビューの性能テストと機能ごとのテスト
 
-# Create your tests here.
+- ViewQueryBudgetTests: main/urls.py の全てのURLを実行し、ビューごとのクエリ数が
+  上限（QUERY_BUDGETS）を超えていないかを確認する。常に実行する。
+- AsyncViewTests: ASYNC_VIEWS=true のURL設定を読み込み直し、非同期版のビューを
+  AsyncClient で実行する（環境変数の ASYNC_VIEWS に関係なく実行する）。
+- ViewBenchmarkTests: 大きめのデータでURLごとに複数回計測し、p50/p95/p99 の応答時間・
+  クエリ数・DB時間を記録する。RUN_BENCHMARKS=1 のときだけ実行し、
+  ベースラインのJSONより閾値以上遅くなったビューがあれば失敗する。
+  応答時間はマシンに依存するため、ベースラインはリポジトリに含めない。ない場合は計測せずに
+  失敗するので、最適化前のコードで BENCHMARK_WRITE_BASELINE=1 を付けて作成しておく。
+
+  RUN_BENCHMARKS=1 python manage.py test main.tests.ViewBenchmarkTests
+  RUN_BENCHMARKS=1 BENCHMARK_WRITE_BASELINE=1 python manage.py test main.tests.ViewBenchmarkTests
+
+機能ごとのテスト（キャッシュを有効にして、クエリ数の上限とは別に動作を確認する）:
+- CacheTagTests: タグのバージョンによる無効化
+- FragmentCacheTests: テンプレート断片のキャッシュ
+- PageCacheTests: 匿名ユーザー向けのページキャッシュ（HIT/MISS・Vary: Cookie）
+- ConditionalPageTests: ETag による304（写真の削除後を含む）
+- ReplicaRoutingTests: 読み込みのレプリカへの振り分けと、書き込み後のプライマリへの固定
+- ExportImportTests: export_family で書き出したデータを空のデータベースに読み込み直す
+- GenerateDatasetTests: 負荷試験用データの件数・再現性・お気に入りの整合性
+- MetricsAggregationTests: 複数プロセスのメトリクスの合算と、終了したプロセスのファイルの整理
+- PhotoFavoriteTests: ユーザーごとのお気に入りと favorite_count・'favorite' タグ
+- FavoriteMigrationTests: 以前の is_favorite からお気に入りへの移行（マイグレーション）
+- ImageProcessingTests: save_changed と image_processed（サムネイル・画像のサイズ）
+- LiveUpdateTests: コミットされた変更だけがライブ更新で通知される
+- ApiTests: JSON API の fields=・include=・cursor・ETag・一括操作・カテゴリの書き込み権限
+- SyncApiTests: 差分同期の since=・逆側からの clear()・未コミットかもしれない欠番
+- GalleryScrollTests: 撮影日が同じ写真が続いても、無限スクロールで重複・欠落しない
+- AlbumManifestTests: アルバムの写真一覧のJSON（縦横比・枚数）
+- MemberCardTests: メンバーカードの最新の写真をまとめて読み込み、カードごとにクエリしない
+- AlbumSummaryTests: アルバムの公開写真の枚数・一覧用のカバー
+
+環境変数:
+    BENCHMARK_PHOTOS / BENCHMARK_EVENTS: 生成する写真・イベントの数
+    BENCHMARK_ITERATIONS: URLごとの計測回数（デフォルト: 30）
+    BENCHMARK_BASELINE: ベースラインのJSONファイル（デフォルト: benchmarks/baseline.json）
+    BENCHMARK_THRESHOLD: ベースラインのp95に対して許容する倍率（デフォルト: 1.5）
+    BENCHMARK_MIN_DELTA_MS: 悪化とみなす最小の差（ミリ秒、デフォルト: 5）
+"""
+
+import asyncio
+import cProfile
+import importlib
+import io
+import json
+import logging
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+from contextlib import ExitStack
+from datetime import date, timedelta
+from pathlib import Path
+from unittest import addModuleCleanup, mock, skipUnless
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import DatabaseError, connection, connections, router, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models import Count, Q
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import clear_url_caches, resolve, reverse
+from django.utils import timezone
+from PIL import Image
+
+from . import api, async_views, bulk, live, routers, urls as main_urls, views
+from .middleware import REPLICA_PIN_COOKIE, ReplicaRoutingMiddleware
+from .models import (
+    ChangeLog, EventCategory, FamilyEvent, FamilyMember, FamilyPhoto, PhotoAlbum, PhotoFavorite,
+    PhotoTag,
+)
+from .templatetags.family_tags import member_card, photo_card
+from .utils.cache import (
+    PAGE_CACHE_HEADER, bump_versions, cache_public_page, cache_stats, cached_fragment, get_or_set,
+    get_versions, make_key, object_tag, reset_cache_stats,
+)
+from .utils import metrics
+from .utils.archive import EXPORT_MODELS, export_fields, model_label
+from .utils.timing import percentile
+from .utils.view_urls import collect_urls, request_url
+
+def setUpModule():
+    # リクエストごとの計測（DEBUG）や一括編集の記録（INFO）でテストの出力を埋めない
+    # （実行方法によらないよう、設定ではなくテストでロガーのレベルを変える）
+    logger = logging.getLogger('main')
+    addModuleCleanup(logger.setLevel, logger.level)
+    logger.setLevel(logging.WARNING)
+
+
+# ビューごとのクエリ数の上限（キャッシュなし・スタッフでログインした状態）
+QUERY_BUDGETS = {
+    'home': 6,
+    'about': 0,
+    'family_list': 3,  # 件数・メンバー・カードの最新写真（ページ分をまとめて1クエリ）
+    'family_detail': 4,
+    'photo_gallery': 10,  # ログイン中はお気に入りの判定のためセッション・ユーザーを読む
+    'photo_gallery_more': 5,
+    'photo_detail': 7,
+    'album_list': 1,  # 枚数・カバーは計算済み（アルバム数によらず1クエリ）
+    'album_detail': 8,
+    'album_photos_more': 7,
+    'album_manifest': 5,
+    'event_calendar': 9,
+    'event_detail': 11,
+    'event_create': 4,
+    'event_update': 6,
+    'event_delete': 7,
+    'category_list': 1,
+    'category_create': 2,
+    'toggle_favorite': 12,  # BEGIN・SAVEPOINT・COMMITを含む（書き込みはINSERT/DELETE・UPDATE・変更履歴の3件）
+    'upcoming_events_api': 2,
+    'bulk_edit_photos_api': 11,  # 変更履歴のINSERTを含む
+    'live_updates': 0,
+    'api_collection': 3,
+    'api_bulk': 14,  # 3件の更新（読み込み・多対多の先読みはまとめて3クエリ、1件あたりUPDATE・変更履歴の2クエリ）
+    'api_item': 3,
+    'api_sync': 3,
+    'profile_list': 2,
+    'profile_download': 2,
+    'metrics': 0,
+}
+
+# 計測時はキャッシュを無効にして、毎回ビューのクエリを実行させる
+NO_CACHE = {
+    'PAGE_CACHE_ENABLED': False,
+    'CACHES': {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}},
+}
+
+
+class ViewMeasurementMixin:
+    """データの生成とURLの計測をまとめたMixin"""
+
+    dataset = {}
+
+    @classmethod
+    def setUpClass(cls):
+        # 生成する画像・プロファイルはテスト用の一時ディレクトリに保存する
+        # （クラスの override_settings より後に戻すため、後片付けに先に登録する）
+        cls.media_root = tempfile.mkdtemp(prefix='family-app-test-media-')
+        cls.addClassCleanup(shutil.rmtree, cls.media_root, ignore_errors=True)
+        cls.enterClassContext(override_settings(
+            MEDIA_ROOT=cls.media_root, PROFILING_DIR=Path(cls.media_root) / 'profiles',
+        ))
+        # profile_download の計測用
+        (Path(cls.media_root) / 'profiles').mkdir()
+        cProfile.Profile().dump_stats(
+            Path(cls.media_root) / 'profiles' / '20240101-000000-root-1ms-0123abcd.prof'
+        )
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command(
+            'generate_dataset',
+            seed=1, workers=1, image_pool=4, stdout=open(os.devnull, 'w'),
+            **cls.dataset,
+        )
+        cls.user = User.objects.create_superuser('benchmark', 'benchmark@example.com', 'password')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def collect_urls(self):
+        """(URL名, パス) の一覧を作成する（全てのURLに対象のデータがあることを確認する）"""
+        urls, missing = collect_urls()
+        self.assertEqual(missing, [], 'URLの引数に使うデータがありません')
+        return urls
+
+    def measure(self, name, url):
+        """
+        URLを1回実行し、応答時間・クエリ数・DB時間を計測する
+
+        Returns:
+            tuple: (レスポンス, 応答時間(ms), クエリ数, DB時間(ms))
+        """
+        with ExitStack() as stack:
+            captured = [
+                stack.enter_context(CaptureQueriesContext(connections[alias]))
+                for alias in connections
+            ]
+            started = time.perf_counter()
+            response = request_url(self.client, name, url)
+            elapsed = (time.perf_counter() - started) * 1000
+
+        queries = [query for context in captured for query in context.captured_queries]
+        db_time = sum(float(query['time']) for query in queries) * 1000
+        return response, elapsed, len(queries), db_time
+
+
+@override_settings(**NO_CACHE)
+class ViewQueryBudgetTests(ViewMeasurementMixin, TestCase):
+    """全てのURLのクエリ数が上限以内であることを確認する"""
+
+    # 1ページ分以上のデータを用意し、N+1クエリを検出できるようにする
+    dataset = {
+        'members': 8, 'photos': 60, 'albums': 6, 'tags': 12,
+        'categories': 4, 'events': 40,
+    }
+
+    def test_every_url_has_a_budget(self):
+        names = {pattern.name for pattern in main_urls.urlpatterns}
+        self.assertEqual(names - set(QUERY_BUDGETS), set(), 'QUERY_BUDGETS に上限を追加してください')
+
+    def test_query_budgets(self):
+        for name, url in self.collect_urls():
+            with self.subTest(url=name):
+                response, _, query_count, _ = self.measure(name, url)
+                self.assertLess(response.status_code, 400, f'{url} → {response.status_code}')
+                self.assertLessEqual(
+                    query_count, QUERY_BUDGETS[name],
+                    f'{name} のクエリ数が上限を超えています（{query_count} > {QUERY_BUDGETS[name]}）'
+                )
+
+    def test_redirecting_views_render(self):
+        # エラー時にリダイレクトするビューが、正常に表示されていることを確認する
+        for name in ('family_detail', 'photo_detail', 'album_detail', 'event_detail', 'event_calendar'):
+            with self.subTest(url=name):
+                url = dict(self.collect_urls())[name]
+                self.assertEqual(self.client.get(url).status_code, 200)
+
+
+def reload_urlconf():
+    """ASYNC_VIEWS の変更を反映するため、URL設定を読み込み直す"""
+    importlib.reload(main_urls)
+    importlib.reload(importlib.import_module(settings.ROOT_URLCONF))
+    clear_url_caches()
+
+
+@override_settings(**NO_CACHE)
+class AsyncViewTests(ViewMeasurementMixin, TestCase):
+    """ASGI（ASYNC_VIEWS=true）の非同期版のビューが表示でき、クエリ数が上限以内であることを確認する"""
+
+    dataset = {
+        'members': 4, 'photos': 30, 'albums': 2, 'tags': 6,
+        'categories': 2, 'events': 20,
+    }
+    url_names = ('photo_gallery', 'photo_detail', 'event_calendar', 'upcoming_events_api')
+
+    @classmethod
+    def setUpClass(cls):
+        # 後片付けは登録の逆順のため、設定を戻した後にURL設定を読み込み直す
+        cls.addClassCleanup(reload_urlconf)
+        cls.enterClassContext(override_settings(ASYNC_VIEWS=True))
+        reload_urlconf()
+        super().setUpClass()
+
+    def setUp(self):
+        self.async_client.force_login(self.user)
+
+    def test_async_views(self):
+        urls, missing = collect_urls(self.url_names)
+        self.assertEqual(missing, [])
+        self.assertEqual(len(urls), len(self.url_names))
+        for name, url in urls:
+            with self.subTest(url=name):
+                self.assertIs(resolve(url).func, getattr(async_views, name))
+                with CaptureQueriesContext(connections['default']) as captured:
+                    response = async_to_sync(self.async_client.get)(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertLessEqual(len(captured), QUERY_BUDGETS[name])
+
+
+@skipUnless(os.environ.get('RUN_BENCHMARKS'), 'RUN_BENCHMARKS=1 のときだけ実行します')
+@override_settings(**NO_CACHE)
+class ViewBenchmarkTests(ViewMeasurementMixin, TestCase):
+    """大きめのデータでURLごとの応答時間を計測し、ベースラインと比較する"""
+
+    dataset = {
+        'members': 50,
+        'photos': int(os.environ.get('BENCHMARK_PHOTOS', 20000)),
+        'albums': 500,
+        'tags': 200,
+        'categories': 20,
+        'events': int(os.environ.get('BENCHMARK_EVENTS', 10000)),
+    }
+
+    def test_latency_against_baseline(self):
+        iterations = int(os.environ.get('BENCHMARK_ITERATIONS', 30))
+        threshold = float(os.environ.get('BENCHMARK_THRESHOLD', 1.5))
+        # 数ミリ秒のビューは揺らぎが大きいため、差が小さい場合は悪化とみなさない
+        min_delta = float(os.environ.get('BENCHMARK_MIN_DELTA_MS', 5))
+        baseline_path = Path(os.environ.get(
+            'BENCHMARK_BASELINE', settings.BASE_DIR / 'benchmarks' / 'baseline.json'
+        ))
+        write_baseline = bool(os.environ.get('BENCHMARK_WRITE_BASELINE'))
+        # 比較できないまま計測を終えないよう、先に確認する
+        if not write_baseline and not baseline_path.exists():
+            self.fail(
+                f'ベースラインがありません: {baseline_path}\n'
+                'BENCHMARK_WRITE_BASELINE=1 を付けて実行し、このマシンでのベースラインを作成してください。'
+            )
+
+        results = {}
+        for name, url in self.collect_urls():
+            self.measure(name, url)  # ウォームアップ
+            timings, db_times, query_counts = [], [], []
+            for _ in range(iterations):
+                _, elapsed, query_count, db_time = self.measure(name, url)
+                timings.append(elapsed)
+                db_times.append(db_time)
+                query_counts.append(query_count)
+            results[name] = {
+                'p50': round(percentile(timings, 50), 2),
+                'p95': round(percentile(timings, 95), 2),
+                'p99': round(percentile(timings, 99), 2),
+                'db_ms': round(statistics.mean(db_times), 2),
+                'queries': max(query_counts),
+            }
+
+        self.print_results(results)
+
+        if write_baseline:
+            baseline_path.parent.mkdir(parents=True, exist_ok=True)
+            baseline_path.write_text(json.dumps(results, ensure_ascii=False, indent=2) + '\n')
+            print(f'ベースラインを保存しました: {baseline_path}')
+            return
+
+        baseline = json.loads(baseline_path.read_text())
+        regressions = [
+            f'{name}: p95 {result["p95"]}ms（ベースライン {baseline[name]["p95"]}ms）'
+            for name, result in results.items()
+            if name in baseline
+            and result['p95'] > baseline[name]['p95'] * threshold
+            and result['p95'] - baseline[name]['p95'] > min_delta
+        ]
+        self.assertFalse(regressions, '応答時間が悪化しました:\n' + '\n'.join(regressions))
+
+    def print_results(self, results):
+        print(f'\n{"URL名":<24}{"p50":>9}{"p95":>9}{"p99":>9}{"DB":>9}{"クエリ":>7}')
+        for name, result in results.items():
+            print(
+                f'{name:<24}{result["p50"]:>9.1f}{result["p95"]:>9.1f}{result["p99"]:>9.1f}'
+                f'{result["db_ms"]:>9.1f}{result["queries"]:>7}'
+            )
+
+
+# ========== 機能ごとのテスト ==========
+
+# 機能のテストはキャッシュを有効にして実行する（テストごとに空にする）
+FEATURE_CACHE = {
+    'PAGE_CACHE_ENABLED': True,
+    'CACHES': {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'family-app-tests',
+        }
+    },
+}
+
+
+def image_file(name='photo.jpg', size=(50, 40), color='red'):
+    """アップロード用のJPEG画像を作成する"""
+    buffer = io.BytesIO()
+    Image.new('RGB', size, color).save(buffer, 'JPEG')
+    return ContentFile(buffer.getvalue(), name)
+
+
+class FeatureTestMixin:
+    """機能ごとのテストの共通処理（一時的なMEDIA_ROOT・キャッシュの初期化・写真の作成）"""
+
+    @classmethod
+    def setUpClass(cls):
+        # クラスの override_settings は tearDownClass の後に戻されるため、tearDownClass で
+        # 戻すと上書きが残る。後片付けは登録の逆順なので、先に登録して最後に戻す
+        cls.media_root = tempfile.mkdtemp(prefix='family-app-test-media-')
+        cls.addClassCleanup(shutil.rmtree, cls.media_root, ignore_errors=True)
+        cls.enterClassContext(override_settings(MEDIA_ROOT=cls.media_root))
+        super().setUpClass()
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        reset_cache_stats()
+
+    def create_photo(self, title='写真', taken_date=date(2024, 1, 1), **kwargs):
+        return FamilyPhoto.objects.create(
+            title=title, image=image_file(), taken_date=taken_date, **kwargs
+        )
+
+    def media_exists(self, name):
+        return bool(name) and default_storage.exists(name)
+
+
+@override_settings(**FEATURE_CACHE)
+class CacheTagTests(FeatureTestMixin, TestCase):
+    """タグのバージョンによる無効化"""
+
+    def test_bump_versions_changes_only_dependent_keys(self):
+        key = make_key('test', 1, tags=['photo', 'tag:1'])
+        other = make_key('test', 1, tags=['member'])
+        self.assertEqual(make_key('test', 1, tags=['photo', 'tag:1']), key)
+
+        bump_versions('tag:1')
+        self.assertNotEqual(make_key('test', 1, tags=['photo', 'tag:1']), key)
+        self.assertEqual(make_key('test', 1, tags=['member']), other)
+
+    def test_get_or_set_computes_once(self):
+        calls = []
+        key = make_key('value_test', tags=['photo'])
+        for _ in range(2):
+            self.assertEqual(get_or_set(key, lambda: calls.append(1) or 'value'), 'value')
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(cache_stats()['value:value_test'], {'hits': 1, 'misses': 1})
+
+    def test_photo_delete_bumps_member_and_tag_versions(self):
+        member = FamilyMember.objects.create(name='太郎', role='父')
+        tag = PhotoTag.objects.create(name='旅行')
+        photo = self.create_photo()
+        photo.family_members.add(member)
+        photo.tags.add(tag)
+        tags = [object_tag('member', member.pk), object_tag('tag', tag.pk)]
+        versions = get_versions(tags)
+
+        # 削除後は中間テーブルの行がないため、削除前に覚えたタグを無効化する
+        photo.delete()
+        after = get_versions(tags)
+        for tag_name in tags:
+            self.assertNotEqual(after[tag_name], versions[tag_name])
+
+
+@override_settings(**FEATURE_CACHE)
+class FragmentCacheTests(FeatureTestMixin, TestCase):
+    """テンプレート断片のキャッシュ"""
+
+    def test_cached_fragment_hits_until_tag_bumped(self):
+        renders = []
+
+        def render():
+            renders.append(1)
+            return f'<p>{len(renders)}</p>'
+
+        self.assertEqual(cached_fragment('test', [1], ['photo:1'], render), '<p>1</p>')
+        self.assertEqual(cached_fragment('test', [1], ['photo:1'], render), '<p>1</p>')
+        self.assertEqual(cache_stats()['fragment:test'], {'hits': 1, 'misses': 1})
+
+        bump_versions(object_tag('photo', 1))
+        self.assertEqual(cached_fragment('test', [1], ['photo:1'], render), '<p>2</p>')
+
+    def test_photo_card_rerenders_after_tag_rename(self):
+        tag = PhotoTag.objects.create(name='旅行')
+        photo = self.create_photo()
+        photo.tags.add(tag)
+
+        def card():
+            return photo_card(FamilyPhoto.objects.prefetch_related('tags', 'family_members').get(pk=photo.pk))
+
+        self.assertIn('旅行', card())
+        self.assertIn('旅行', card())
+        self.assertEqual(cache_stats()['fragment:photo_card'], {'hits': 1, 'misses': 1})
+
+        tag.name = '家族旅行'
+        tag.save()
+        self.assertIn('家族旅行', card())
+        self.assertEqual(cache_stats()['fragment:photo_card'], {'hits': 1, 'misses': 2})
+
+
+@override_settings(**FEATURE_CACHE)
+class PageCacheTests(FeatureTestMixin, TestCase):
+    """匿名ユーザー向けのページキャッシュ"""
+
+    def test_anonymous_pages_hit_until_tag_bumped(self):
+        url = reverse('home')
+        response = self.client.get(url)
+        self.assertEqual(response[PAGE_CACHE_HEADER], 'MISS')
+        self.assertIn('Cookie', response['Vary'])
+
+        response = self.client.get(url)
+        self.assertEqual(response[PAGE_CACHE_HEADER], 'HIT')
+        self.assertIn('Cookie', response['Vary'])
+
+        PhotoTag.objects.create(name='新しいタグ')
+        self.assertEqual(self.client.get(url)[PAGE_CACHE_HEADER], 'MISS')
+
+    def test_logged_in_users_bypass_cache(self):
+        self.client.get(reverse('home'))
+        self.client.force_login(User.objects.create_user('member', password='password'))
+        self.assertNotIn(PAGE_CACHE_HEADER, self.client.get(reverse('home')))
+
+    def test_requests_with_messages_bypass_cache(self):
+        self.client.cookies['messages'] = 'pending'
+        self.assertNotIn(PAGE_CACHE_HEADER, self.client.get(reverse('home')))
+
+
+@override_settings(**FEATURE_CACHE)
+class ConditionalPageTests(FeatureTestMixin, TestCase):
+    """ETag による条件付きGET（304）"""
+
+    def setUp(self):
+        super().setUp()
+        self.member = FamilyMember.objects.create(name='太郎', role='父')
+        self.photos = [
+            self.create_photo(title=f'写真{day}', taken_date=date(2024, 1, day)) for day in (1, 2)
+        ]
+        for photo in self.photos:
+            photo.family_members.add(self.member)
+        self.url = reverse('family_detail', kwargs={'pk': self.member.pk})
+
+    def test_not_modified_until_photo_deleted(self):
+        etag = self.client.get(self.url)['ETag']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # 最新ではない写真の削除でも、更新日時の最大値は変わらないがETagは変わる
+        self.photos[0].delete()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_etag_depends_on_user(self):
+        etag = self.client.get(self.url)['ETag']
+        self.client.force_login(User.objects.create_user('member', password='password'))
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_hidden_member_is_not_revalidated(self):
+        etag = self.client.get(self.url)['ETag']
+        self.member.is_active = False
+        self.member.save()
+        # 検証子がないため304にせず、ビューが「見つかりません」を表示する
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('ETag', response)
+
+
+@override_settings(REPLICA_PIN_SECONDS=5, **FEATURE_CACHE)
+class ReplicaRoutingTests(TestCase):
+    """
+    読み込みのレプリカへの振り分けと、書き込み後のプライマリへの固定
+
+    TestCase のトランザクション内のデータはレプリカの接続からは見えないため、
+    レプリカ（'replica'）は設定にだけ追加し、読み込み先は実行前の QuerySet.db で確認する。
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        databases = {**settings.DATABASES, 'replica': settings.DATABASES['default']}
+        with warnings.catch_warnings():
+            # DATABASES の上書きは接続を作り直さない（ルーターが参照するエイリアスだけが増える）
+            warnings.simplefilter('ignore')
+            cls.enterClassContext(override_settings(DATABASES=databases))
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+
+    def read_db_view(self, write=False):
+        """読み込み先のエイリアスを返すビュー（write=True なら先に書き込む）"""
+        def view(request):
+            if write:
+                PhotoTag.objects.create(name='書き込み')
+            return HttpResponse(FamilyPhoto.objects.all().db)
+        return view
+
+    def call(self, view, request, user=None):
+        request.user = user or AnonymousUser()
+        response = ReplicaRoutingMiddleware(view)(request)
+        return response.content.decode(), response
+
+    def test_reads_outside_requests_use_primary(self):
+        self.assertEqual(router.db_for_read(FamilyPhoto), routers.PRIMARY)
+
+    def test_get_reads_from_replica(self):
+        db, response = self.call(self.read_db_view(), self.factory.get('/'))
+        self.assertEqual(db, 'replica')
+        self.assertNotIn(REPLICA_PIN_COOKIE, response.cookies)
+
+    def test_write_pins_request_and_sets_cookie(self):
+        db, response = self.call(self.read_db_view(write=True), self.factory.get('/'))
+        self.assertEqual(db, routers.PRIMARY)
+        self.assertEqual(response.cookies[REPLICA_PIN_COOKIE]['max-age'], 5)
+
+        # POST は書き込みの前から固定する
+        db, _ = self.call(self.read_db_view(), self.factory.post('/'))
+        self.assertEqual(db, routers.PRIMARY)
+
+    def test_pin_cookie_routes_reads_to_primary(self):
+        request = self.factory.get('/')
+        request.COOKIES[REPLICA_PIN_COOKIE] = str(int(time.time()) + 5)
+        self.assertEqual(self.call(self.read_db_view(), request)[0], routers.PRIMARY)
+
+        request = self.factory.get('/')
+        request.COOKIES[REPLICA_PIN_COOKIE] = str(int(time.time()) - 1)
+        self.assertEqual(self.call(self.read_db_view(), request)[0], 'replica')
+
+    def test_page_cache_miss_reads_from_primary(self):
+        view = cache_public_page('photo')(self.read_db_view())
+        db, response = self.call(view, self.factory.get('/'))
+        self.assertEqual((db, response[PAGE_CACHE_HEADER]), (routers.PRIMARY, 'MISS'))
+
+        # キャッシュを使わないログイン中のユーザーは、レプリカから読む
+        user = User(username='member')
+        self.assertEqual(self.call(view, self.factory.get('/'), user=user)[0], 'replica')
+
+
+@override_settings(**FEATURE_CACHE)
+class ExportImportTests(FeatureTestMixin, TestCase):
+    """export_family で書き出したデータを空のデータベースに読み込み直す"""
+
+    def setUp(self):
+        super().setUp()
+        call_command(
+            'generate_dataset',
+            members=4, photos=12, albums=2, tags=4, categories=2, events=6,
+            seed=1, workers=1, image_pool=2, today=date(2024, 6, 1), stdout=io.StringIO(),
+        )
+        # 一括編集で付けたタグ（既に付いている組み合わせは ignore_conflicts で飛ばされる）
+        photo_ids = list(FamilyPhoto.objects.values_list('pk', flat=True))
+        tag_ids = list(PhotoTag.objects.values_list('pk', flat=True)[:2])
+        links = FamilyPhoto.tags.through.objects
+        before = links.count()
+        added = bulk.add_m2m('tags', photo_ids, tag_ids)
+        self.assertLess(added, len(photo_ids) * len(tag_ids))
+        self.assertEqual(links.count(), before + added)
+
+        self.archive = os.path.join(self.media_root, 'export.jsonl.gz')
+        self.media_archive = os.path.join(self.media_root, 'media.tar')
+
+    def snapshot(self):
+        """全ての行（中間テーブルを含む）。ユーザーのIDは読み込み先で変わるためユーザー名にする"""
+        usernames = dict(User.objects.values_list('pk', 'username'))
+        data = {'users': sorted(User.objects.values_list('username', 'email', 'is_staff', 'is_active'))}
+        for model in EXPORT_MODELS:
+            fields = export_fields(model)
+            user_fields = {
+                field.attname for field in model._meta.concrete_fields
+                if field.is_relation and field.related_model is User
+            }
+            rows = [
+                tuple(usernames[value] if name in user_fields and value else value
+                      for name, value in zip(fields, row))
+                for row in model._base_manager.values_list(*fields)
+            ]
+            data[model_label(model)] = sorted(rows, key=repr)
+        return data
+
+    def clear_database(self):
+        for model in reversed(EXPORT_MODELS):
+            model._base_manager.all().delete()
+        User.objects.all().delete()
+        ChangeLog.objects.all().delete()
+        shutil.rmtree(os.path.join(self.media_root, 'gallery'))
+
+    def import_family(self, **options):
+        call_command(
+            'import_family', self.archive, media=self.media_archive, stdout=io.StringIO(), **options
+        )
+
+    def test_round_trip(self):
+        expected = self.snapshot()
+        self.assertTrue(expected[model_label(FamilyPhoto.tags.through)])
+        call_command('export_family', self.archive, media=self.media_archive, stdout=io.StringIO())
+
+        self.clear_database()
+        self.import_family()
+
+        self.assertEqual(self.snapshot(), expected)
+        for photo in FamilyPhoto.objects.all():
+            self.assertTrue(self.media_exists(photo.image.name), photo.image.name)
+        # 読み込んだオブジェクトは同期用の変更履歴に作成として記録する
+        self.assertEqual(
+            ChangeLog.objects.filter(object_type='photo', action=ChangeLog.CREATED).count(),
+            FamilyPhoto.objects.count(),
+        )
+
+    def test_existing_data_requires_replace(self):
+        expected = self.snapshot()
+        call_command('export_family', self.archive, media=self.media_archive, stdout=io.StringIO())
+
+        with self.assertRaises(CommandError):
+            self.import_family()
+        FamilyPhoto.objects.update(title='変更')
+        self.import_family(replace=True)
+        self.assertEqual(self.snapshot(), expected)
+
+
+@override_settings(**FEATURE_CACHE)
+class GenerateDatasetTests(FeatureTestMixin, TestCase):
+    """負荷試験用データの生成（generate_dataset）"""
+
+    counts = {
+        FamilyMember: 5, FamilyPhoto: 30, PhotoAlbum: 3, PhotoTag: 6,
+        EventCategory: 2, FamilyEvent: 10,
+    }
+
+    def generate(self, **options):
+        call_command(
+            'generate_dataset',
+            members=5, photos=30, albums=3, tags=6, categories=2, events=10,
+            workers=1, image_pool=3, today=date(2024, 6, 1), stdout=io.StringIO(), **options,
+        )
+
+    def photo_rows(self):
+        return list(FamilyPhoto.objects.order_by('title').values_list(
+            'title', 'taken_date', 'created_at', 'width', 'height', 'is_public', 'favorite_count',
+        ))
+
+    def test_counts_and_files(self):
+        self.generate(seed=1)
+        for model, count in self.counts.items():
+            self.assertEqual(model.objects.count(), count, model.__name__)
+        for photo in FamilyPhoto.objects.all():
+            self.assertTrue(self.media_exists(photo.image.name))
+            self.assertTrue(self.media_exists(photo.thumbnail.name))
+
+    def test_same_seed_reproduces_data(self):
+        self.generate(seed=1)
+        first = self.photo_rows()
+        self.generate(seed=1, clear=True)
+        self.assertEqual(self.photo_rows(), first)
+        self.generate(seed=2, clear=True)
+        self.assertNotEqual(self.photo_rows(), first)
+
+    def test_favorites_and_album_summaries_are_consistent(self):
+        self.generate(seed=1)
+        self.assertTrue(PhotoFavorite.objects.exists())
+        favorites = dict(
+            PhotoFavorite.objects.values('photo').annotate(count=Count('pk')).values_list('photo', 'count')
+        )
+        for pk, favorite_count in FamilyPhoto.objects.values_list('pk', 'favorite_count'):
+            self.assertEqual(favorite_count, favorites.get(pk, 0))
+
+        # 生成後に refresh_album_summaries で枚数を計算している
+        for album in PhotoAlbum.objects.annotate(
+            public=Count('photos', filter=Q(photos__is_public=True))
+        ):
+            self.assertEqual(album.public_photo_count, album.public)
+
+
+@skipUnless(os.name == 'posix', '複数プロセスでの集計はPOSIXのみ対応しています')
+class MetricsAggregationTests(TestCase):
+    """複数プロセスのメトリクスの合算と、終了したプロセスのファイルの整理"""
+
+    request_key = json.dumps(['test_view', 'GET', '200'])
+
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp(prefix='family-app-test-metrics-'))
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        settings_override = override_settings(METRICS_MULTIPROC_DIR=str(self.directory))
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def write_worker(self, pid, start, requests, in_flight):
+        """ワーカープロセスが書き出すファイルを作る"""
+        (self.directory / f'{pid}.json').write_text(json.dumps({
+            'start': start,
+            'metrics': {
+                metrics.REQUESTS.name: {self.request_key: requests},
+                metrics.REQUESTS_IN_FLIGHT.name: {json.dumps([]): in_flight},
+            },
+        }))
+
+    def dead_pid(self):
+        process = subprocess.Popen([sys.executable, '-c', ''])
+        process.wait()
+        return process.pid
+
+    def totals(self):
+        totals = metrics.collect()
+        return (
+            totals[metrics.REQUESTS.name].get(('test_view', 'GET', '200'), 0),
+            totals[metrics.REQUESTS_IN_FLIGHT.name].get((), 0),
+        )
+
+    def test_dead_workers_are_retired_into_aggregate(self):
+        live_pid = os.getppid()
+        self.write_worker(live_pid, metrics._process_start(live_pid), requests=3, in_flight=2)
+        dead_pid = self.dead_pid()
+        self.write_worker(dead_pid, None, requests=5, in_flight=4)
+
+        response = self.client.get(reverse('metrics'))
+        self.assertContains(
+            response, 'family_http_requests_total{view="test_view",method="GET",status="200"} 8.0'
+        )
+        self.assertFalse((self.directory / f'{dead_pid}.json').exists())
+        self.assertTrue((self.directory / f'{live_pid}.json').exists())
+        self.assertTrue((self.directory / 'aggregate.json').exists())
+
+        # 合算済みのファイルを二重に数えず、終了したプロセスのゲージは捨てる
+        own_in_flight = metrics.REQUESTS_IN_FLIGHT.values.get((), 0)
+        self.assertEqual(self.totals(), (8, own_in_flight + 2))
+
+    @skipUnless(Path('/proc/self/stat').exists(), '/proc がない環境ではPIDの再利用を検知できません')
+    def test_reused_pid_is_retired(self):
+        live_pid = os.getppid()
+        self.write_worker(live_pid, metrics._process_start(live_pid) + 1, requests=7, in_flight=1)
+        self.assertEqual(self.totals()[0], 7)
+        self.assertFalse((self.directory / f'{live_pid}.json').exists())
+
+    def test_own_file_is_not_counted_twice(self):
+        metrics.REQUESTS.inc(view='test_own', method='GET', status='200')
+        own = metrics.collect()[metrics.REQUESTS.name][('test_own', 'GET', '200')]
+        metrics.flush(force=True)
+        self.assertTrue((self.directory / f'{os.getpid()}.json').exists())
+        self.assertEqual(metrics.collect()[metrics.REQUESTS.name][('test_own', 'GET', '200')], own)
+
+
+@override_settings(**FEATURE_CACHE)
+class PhotoFavoriteTests(FeatureTestMixin, TestCase):
+    """ユーザーごとのお気に入りと favorite_count"""
+
+    def setUp(self):
+        super().setUp()
+        self.photo = self.create_photo()
+        self.users = [User.objects.create_user(f'user{i}', password='password') for i in range(2)]
+
+    def toggle(self, user, photo_id=None):
+        self.client.force_login(user)
+        return self.client.post(
+            reverse('toggle_favorite', kwargs={'photo_id': photo_id or self.photo.pk})
+        )
+
+    def favorite_version(self):
+        return get_versions(['favorite'])['favorite']
+
+    def test_toggle_counts_per_user(self):
+        self.assertEqual(PhotoFavorite.toggle(self.users[0], self.photo.pk), (True, 1))
+        self.assertEqual(PhotoFavorite.toggle(self.users[1], self.photo.pk), (True, 2))
+        self.assertEqual(PhotoFavorite.toggle(self.users[0], self.photo.pk), (False, 1))
+
+        self.photo.refresh_from_db()
+        self.assertEqual(self.photo.favorite_count, 1)
+        self.assertEqual(
+            list(PhotoFavorite.objects.values_list('user', flat=True)), [self.users[1].pk]
+        )
+
+    def test_toggle_does_not_touch_photo(self):
+        updated_at = self.photo.updated_at
+        PhotoFavorite.toggle(self.users[0], self.photo.pk)
+        self.photo.refresh_from_db()
+        self.assertEqual(self.photo.updated_at, updated_at)
+        self.assertTrue(
+            ChangeLog.objects.filter(object_type='photo', object_id=self.photo.pk).exists()
+        )
+
+    def test_view_bumps_favorite_tag_only_between_zero_and_one(self):
+        version = self.favorite_version()
+        data = self.toggle(self.users[0]).json()
+        self.assertEqual((data['is_favorite'], data['favorite_count']), (True, 1))
+        self.assertNotEqual(self.favorite_version(), version)
+
+        version = self.favorite_version()
+        self.assertEqual(self.toggle(self.users[1]).json()['favorite_count'], 2)
+        self.assertEqual(self.toggle(self.users[1]).json()['favorite_count'], 1)
+        self.assertEqual(self.favorite_version(), version)
+
+        self.assertEqual(self.toggle(self.users[0]).json()['favorite_count'], 0)
+        self.assertNotEqual(self.favorite_version(), version)
+
+    def test_missing_photo_returns_404(self):
+        response = self.toggle(self.users[0], photo_id=self.photo.pk + 1000)
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(response.json()['success'])
+        self.assertFalse(PhotoFavorite.objects.exists())
+
+
+class FavoriteMigrationTests(TransactionTestCase):
+    """is_favorite から PhotoFavorite への移行（0011・0012）"""
+
+    migrate_from = [('main', '0010_favorite_count_index')]
+    migrate_to = [('main', '0012_remove_familyphoto_is_favorite')]
+
+    def setUp(self):
+        super().setUp()
+        executor = MigrationExecutor(connection)
+        self.addCleanup(self.migrate_to_latest)
+        executor.migrate(self.migrate_from)
+        self.old_apps = executor.loader.project_state(self.migrate_from).apps
+
+    def migrate_to_latest(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def create_legacy_photo(self, title, is_favorite, uploaded_by=None):
+        return self.old_apps.get_model('main', 'FamilyPhoto').objects.create(
+            title=title, image='legacy.jpg', taken_date=date(2024, 1, 1),
+            is_favorite=is_favorite, uploaded_by_id=uploaded_by and uploaded_by.pk,
+        ).pk
+
+    def migrate(self):
+        MigrationExecutor(connection).migrate(self.migrate_to)
+
+    def test_flag_becomes_favorite_of_uploader(self):
+        OldUser = self.old_apps.get_model('auth', 'User')
+        owner = OldUser.objects.create(username='owner')
+        admin = OldUser.objects.create(username='admin', is_superuser=True)
+        owned = self.create_legacy_photo('アップロード者あり', True, owner)
+        ownerless = self.create_legacy_photo('アップロード者なし', True)
+        plain = self.create_legacy_photo('お気に入りではない', False, owner)
+        self.migrate()
+
+        self.assertEqual(
+            set(PhotoFavorite.objects.values_list('photo', 'user')),
+            {(owned, owner.pk), (ownerless, admin.pk)},
+        )
+        self.assertEqual(
+            dict(FamilyPhoto.objects.values_list('pk', 'favorite_count')),
+            {owned: 1, ownerless: 1, plain: 0},
+        )
+
+    def test_flag_without_any_user_keeps_count(self):
+        photo_id = self.create_legacy_photo('ユーザーなし', True)
+        self.migrate()
+
+        self.assertFalse(PhotoFavorite.objects.exists())
+        self.assertEqual(FamilyPhoto.objects.get(pk=photo_id).favorite_count, 1)
+
+
+@override_settings(**FEATURE_CACHE)
+class ImageProcessingTests(FeatureTestMixin, TestCase):
+    """画像の変更の追跡（save_changed・image_processed）"""
+
+    def test_create_makes_thumbnail_and_size(self):
+        photo = self.create_photo()
+        self.assertTrue(self.media_exists(photo.thumbnail.name))
+        self.assertEqual((photo.width, photo.height), (50, 40))
+
+        photo = FamilyPhoto.objects.get(pk=photo.pk)
+        self.assertFalse(photo.image_changed())
+        self.assertEqual((photo.width, photo.height), (50, 40))
+
+    def test_save_changed_without_image_skips_processing(self):
+        photo = FamilyPhoto.objects.get(pk=self.create_photo().pk)
+        thumbnail, updated_at = photo.thumbnail.name, photo.updated_at
+
+        photo.title = '新しいタイトル'
+        with mock.patch.object(FamilyPhoto, 'image_processed') as image_processed:
+            photo.save_changed(['title', 'tags'])
+        image_processed.assert_not_called()
+
+        photo.refresh_from_db()
+        self.assertEqual(photo.title, '新しいタイトル')
+        self.assertGreater(photo.updated_at, updated_at)
+        self.assertEqual(photo.thumbnail.name, thumbnail)
+        self.assertTrue(self.media_exists(thumbnail))
+
+    def test_replacing_image_removes_old_files(self):
+        photo = FamilyPhoto.objects.get(pk=self.create_photo().pk)
+        old_image, old_thumbnail = photo.image.name, photo.thumbnail.name
+
+        photo.image = image_file('new.jpg', size=(30, 60))
+        self.assertTrue(photo.image_changed())
+        photo.save_changed(['image'])
+
+        self.assertFalse(self.media_exists(old_image))
+        self.assertFalse(self.media_exists(old_thumbnail))
+        self.assertTrue(self.media_exists(photo.thumbnail.name))
+        photo.refresh_from_db()
+        self.assertEqual((photo.width, photo.height), (30, 60))
+
+
+@override_settings(LIVE_UPDATES=True, LIVE_UPDATES_SOCKET_DIR=None, **FEATURE_CACHE)
+class LiveUpdateTests(FeatureTestMixin, TestCase):
+    """コミットされた変更だけがライブ更新で通知されること"""
+
+    def setUp(self):
+        super().setUp()
+        # 接続のイベントループの代わり（dispatch() はループに put を登録する）
+        self.loop = asyncio.new_event_loop()
+        self.addCleanup(self.loop.close)
+        self.subscription = self.loop.run_until_complete(self.subscribe())
+        self.addCleanup(self.subscription.close)
+
+    async def subscribe(self):
+        return live.subscribe()
+
+    def received(self):
+        messages = []
+        while (message := self.loop.run_until_complete(self.subscription.get(0.05))) is not None:
+            messages.append(message)
+        return messages
+
+    def test_committed_save_publishes_one_event(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            photo = self.create_photo(title='コミットする写真')
+
+        messages = self.received()
+        self.assertEqual(len(messages), 1)
+        self.assertEqual(
+            {key: messages[0][key] for key in ('type', 'action', 'pk', 'title')},
+            {'type': 'photo', 'action': 'created', 'pk': photo.pk, 'title': 'コミットする写真'},
+        )
+
+    def test_rolled_back_save_publishes_nothing(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            try:
+                with transaction.atomic():
+                    self.create_photo(title='ロールバックする写真')
+                    raise DatabaseError('ロールバック')
+            except DatabaseError:
+                pass
+
+        self.assertEqual(callbacks, [])
+        self.assertEqual(self.received(), [])
+        self.assertFalse(FamilyPhoto.objects.exists())
+
+
+@override_settings(**FEATURE_CACHE)
+class ApiTests(FeatureTestMixin, TestCase):
+    """JSON API の一覧・取得・一括操作"""
+
+    def setUp(self):
+        super().setUp()
+        self.tag = PhotoTag.objects.create(name='旅行', color='#ff0000')
+        self.photos = [
+            self.create_photo(title=f'写真{day}', taken_date=date(2024, 1, day)) for day in (1, 2, 3)
+        ]
+        self.photos[0].tags.add(self.tag)
+        self.private = self.create_photo(title='非公開', is_public=False)
+        self.staff = User.objects.create_user('staff', password='password', is_staff=True)
+        self.url = reverse('api_collection', kwargs={'resource': 'photos'})
+
+    def test_fields_and_include(self):
+        response = self.client.get(self.url, {'fields': 'title', 'include': 'tags'})
+        rows = {row['id']: row for row in response.json()['data']}
+        self.assertEqual(set(rows[self.photos[0].pk]), {'id', 'title', 'tags'})
+        self.assertEqual(
+            rows[self.photos[0].pk]['tags'],
+            [{'id': self.tag.pk, 'name': '旅行', 'color': '#ff0000'}],
+        )
+        self.assertEqual(rows[self.photos[1].pk]['tags'], [])
+
+    def test_unknown_field_is_rejected(self):
+        response = self.client.get(self.url, {'fields': 'password'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_cursor_pagination(self):
+        ids, url, params = [], self.url, {'limit': 1, 'fields': 'id'}
+        while url:
+            data = self.client.get(url, params).json()
+            self.assertLessEqual(len(data['data']), 1)
+            ids += [row['id'] for row in data['data']]
+            url, params = data['next'], None
+        # スタッフ以外には非公開の写真を返さない（撮影日の新しい順）
+        self.assertEqual(ids, [photo.pk for photo in reversed(self.photos)])
+
+        self.client.force_login(self.staff)
+        data = self.client.get(self.url, {'fields': 'id'}).json()
+        self.assertIn(self.private.pk, [row['id'] for row in data['data']])
+
+    def test_cursor_orders_same_day_like_gallery(self):
+        # 撮影日が同じ写真はアップロード日の新しい順（views.PHOTO_ORDERING と同じ）
+        first, second = self.create_photo(title='先'), self.create_photo(title='後')
+        FamilyPhoto.objects.filter(pk=first.pk).update(created_at=second.created_at + timedelta(days=1))
+        data = self.client.get(self.url, {'fields': 'id', 'taken_to': '2024-01-01'}).json()
+        self.assertEqual([row['id'] for row in data['data']][:2], [first.pk, second.pk])
+
+    def test_etag_not_modified(self):
+        url = reverse('api_item', kwargs={'resource': 'photos', 'pk': self.photos[0].pk})
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        FamilyPhoto.objects.filter(pk=self.photos[0].pk).update(title='変更')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def bulk(self, payload):
+        return self.client.post(
+            reverse('api_bulk', kwargs={'resource': 'photos'}),
+            json.dumps(payload), content_type='application/json',
+        )
+
+    def test_bulk_update_and_delete(self):
+        self.client.force_login(self.staff)
+        album = PhotoAlbum.objects.create(title='アルバム')
+        response = self.bulk({
+            'update': [
+                {'id': self.photos[0].pk, 'title': '更新1', 'album': album.pk},
+                {'id': self.photos[1].pk, 'title': '更新2', 'tags': [self.tag.pk]},
+            ],
+            'delete': [self.photos[2].pk],
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['deleted'], 1)
+
+        photos = FamilyPhoto.objects.in_bulk([photo.pk for photo in self.photos])
+        self.assertEqual((photos[self.photos[0].pk].title, photos[self.photos[0].pk].album), ('更新1', album))
+        # 指定しなかったフィールド（多対多を含む）はそのまま
+        self.assertEqual(list(photos[self.photos[0].pk].tags.all()), [self.tag])
+        self.assertEqual(list(photos[self.photos[1].pk].tags.all()), [self.tag])
+        self.assertNotIn(self.photos[2].pk, photos)
+
+    def test_bulk_error_rolls_back(self):
+        self.client.force_login(self.staff)
+        response = self.bulk({'update': [
+            {'id': self.photos[0].pk, 'title': '更新'},
+            {'id': self.photos[1].pk, 'album': 999999},
+        ]})
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()['errors']
+        self.assertEqual((errors['operation'], errors['index']), ('update', 1))
+        self.assertIn('album', errors['errors'])
+        self.photos[0].refresh_from_db()
+        self.assertEqual(self.photos[0].title, '写真1')
+
+    def test_bulk_requires_staff(self):
+        self.client.force_login(User.objects.create_user('member', password='password'))
+        self.assertEqual(self.bulk({'delete': [self.photos[0].pk]}).status_code, 403)
+        self.assertTrue(FamilyPhoto.objects.filter(pk=self.photos[0].pk).exists())
+
+    def category_request(self, method, path, payload):
+        return getattr(self.client, method)(
+            path, json.dumps(payload), content_type='application/json',
+        )
+
+    def test_member_can_only_create_categories(self):
+        self.client.force_login(User.objects.create_user('member', password='password'))
+        url = reverse('api_collection', kwargs={'resource': 'categories'})
+        response = self.category_request('post', url, {'name': '誕生日'})
+        self.assertEqual(response.status_code, 201)
+        category_id = response.json()['data']['id']
+        category_url = reverse('api_item', kwargs={'resource': 'categories', 'pk': category_id})
+        bulk_url = reverse('api_bulk', kwargs={'resource': 'categories'})
+
+        self.assertEqual(self.category_request('post', bulk_url, {'create': [{'name': '記念日'}]}).status_code, 200)
+        self.assertEqual(self.category_request('patch', category_url, {'name': '変更'}).status_code, 403)
+        self.assertEqual(self.client.delete(category_url).status_code, 403)
+        self.assertEqual(
+            self.category_request('post', bulk_url, {'delete': [category_id]}).status_code, 403,
+        )
+        self.assertEqual(
+            sorted(EventCategory.objects.values_list('name', flat=True)), ['記念日', '誕生日'],
+        )
+
+        self.client.force_login(self.staff)
+        self.assertEqual(self.category_request('patch', category_url, {'name': '変更'}).status_code, 200)
+        self.assertEqual(self.client.delete(category_url).status_code, 204)
+
+
+@override_settings(SYNC_SAFETY_LAG=60, **FEATURE_CACHE)
+class SyncApiTests(FeatureTestMixin, TestCase):
+    """差分同期（since= と未コミットかもしれない欠番）"""
+
+    def setUp(self):
+        super().setUp()
+        self.url = reverse('api_sync')
+
+    def sync(self, since):
+        return self.client.get(self.url, {'since': since}).json()
+
+    def test_changes_since_cursor(self):
+        cursor = self.client.get(self.url).json()['cursor']
+        photo = self.create_photo()
+        data = self.sync(cursor)
+        self.assertEqual([row['id'] for row in data['changes']['photos']['created']], [photo.pk])
+        self.assertFalse(data['has_more'])
+
+        # 前回の cursor 以降の変更だけを返す
+        cursor = data['cursor']
+        self.assertEqual(self.sync(cursor), {'changes': {}, 'cursor': cursor, 'has_more': False})
+
+        pk = photo.pk
+        photo.delete()
+        data = self.sync(cursor)
+        self.assertEqual(data['changes']['photos']['deleted'], [pk])
+
+    def test_private_photos_are_deleted_for_anonymous(self):
+        cursor = self.client.get(self.url).json()['cursor']
+        photo = self.create_photo(is_public=False)
+        self.assertEqual(self.sync(cursor)['changes']['photos']['deleted'], [photo.pk])
+
+    def test_reverse_clear_records_photos(self):
+        tag = PhotoTag.objects.create(name='旅行')
+        member = FamilyMember.objects.create(name='太郎', role='父')
+        photos = [self.create_photo(title=f'写真{i}') for i in range(2)]
+        other = self.create_photo(title='関係ない写真')
+        for photo in photos:
+            photo.tags.add(tag)
+            photo.family_members.add(member)
+
+        for related in (tag.familyphoto_set, member.familyphoto_set):
+            cursor = self.client.get(self.url).json()['cursor']
+            photo_tags = [object_tag('photo', photo.pk) for photo in photos]
+            versions = get_versions(photo_tags)
+            related.clear()
+
+            # 外された写真だけが変更として記録され、写真ごとのキャッシュも無効化される
+            updated = self.sync(cursor)['changes']['photos']['updated']
+            self.assertEqual(sorted(row['id'] for row in updated), [photo.pk for photo in photos])
+            self.assertNotIn(other.pk, [row['id'] for row in updated])
+            new_versions = get_versions(photo_tags)
+            self.assertTrue(all(new_versions[key] != versions[key] for key in photo_tags))
+
+    def test_recent_gap_holds_cursor(self):
+        photo = self.create_photo()
+        since = ChangeLog.objects.order_by('-seq').values_list('seq', flat=True).first()
+        for _ in range(3):
+            ChangeLog.record('photo', [photo.pk], ChangeLog.UPDATED)
+        first, middle, last = ChangeLog.objects.filter(seq__gt=since).values_list('seq', flat=True)
+        # 採番済みでまだコミットされていない行の代わりに、途中の行を消す
+        ChangeLog.objects.filter(seq=middle).delete()
+
+        data = self.sync(since)
+        self.assertEqual((data['cursor'], data['has_more']), (first, True))
+        self.assertEqual(api.latest_sync_cursor(), first)
+
+        # SYNC_SAFETY_LAG より古い欠番はロールバックされたものとみなす
+        ChangeLog.objects.filter(seq=last).update(
+            changed_at=timezone.now() - timedelta(seconds=120)
+        )
+        data = self.sync(since)
+        self.assertEqual((data['cursor'], data['has_more']), (last, False))
+        self.assertEqual(api.latest_sync_cursor(), last)
+
+
+@override_settings(**FEATURE_CACHE)
+class GalleryScrollTests(FeatureTestMixin, TestCase):
+    """無限スクロールの続き（X-Next-Url のカーソル）"""
+
+    def test_cursor_neither_repeats_nor_skips_ties(self):
+        photos = [
+            self.create_photo(title=f'写真{i}', taken_date=date(2024, 1, 1 + i % 2))
+            for i in range(views.PHOTO_BATCH_SIZE * 2 + 3)
+        ]
+        # 撮影日だけでなくアップロード日も同じ写真を作り、IDで並ぶようにする
+        FamilyPhoto.objects.filter(pk__in=[photo.pk for photo in photos[::3]]).update(
+            created_at=photos[0].created_at
+        )
+
+        ids, url, pages = [], reverse('photo_gallery_more'), 0
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids += [photo.pk for photo in response.context['photos']]
+            url, pages = response.get('X-Next-Url'), pages + 1
+
+        self.assertEqual(pages, 3)
+        self.assertEqual(
+            ids, list(FamilyPhoto.objects.order_by(*views.PHOTO_ORDERING).values_list('pk', flat=True))
+        )
+
+
+@override_settings(**FEATURE_CACHE)
+class AlbumManifestTests(FeatureTestMixin, TestCase):
+    """仮想スクロールのグリッド用のアルバムの写真一覧（album_manifest）"""
+
+    def setUp(self):
+        super().setUp()
+        self.album = PhotoAlbum.objects.create(title='アルバム')
+        self.url = reverse('album_manifest', kwargs={'pk': self.album.pk})
+
+    def test_dimensions_and_count(self):
+        wide = self.create_photo(title='横長', taken_date=date(2024, 1, 3), album=self.album)
+        tall = FamilyPhoto.objects.create(
+            title='縦長', image=image_file(size=(30, 60)), taken_date=date(2024, 1, 2), album=self.album,
+        )
+        unknown = self.create_photo(title='サイズ不明', taken_date=date(2024, 1, 1), album=self.album)
+        FamilyPhoto.objects.filter(pk=unknown.pk).update(width=None, height=None)
+        self.create_photo(title='非公開', album=self.album, is_public=False)
+        self.create_photo(title='別のアルバム')
+
+        data = self.client.get(self.url).json()
+        self.assertEqual(data['count'], 3)
+        self.assertEqual(
+            [photo[:2] + photo[3:] for photo in data['photos']],
+            [[wide.pk, 1.25, '横長'], [tall.pk, 0.5, '縦長'], [unknown.pk, None, 'サイズ不明']],
+        )
+        self.assertEqual(data['photos'][0][2], wide.thumbnail.name)
+        self.assertEqual(
+            data['photo_url'].replace('{id}', str(wide.pk)), reverse('photo_detail', kwargs={'pk': wide.pk})
+        )
+
+    def test_private_album_is_not_found(self):
+        PhotoAlbum.objects.filter(pk=self.album.pk).update(is_public=False)
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+
+@override_settings(**FEATURE_CACHE)
+class MemberCardTests(FeatureTestMixin, TestCase):
+    """家族メンバーカードの最新の写真（recent_by_member でまとめて読み込む）"""
+
+    def setUp(self):
+        super().setUp()
+        self.members = [FamilyMember.objects.create(name=f'メンバー{i}', role='息子') for i in range(3)]
+        self.photos = [self.create_photo(title=f'写真{day}', taken_date=date(2024, 1, day)) for day in range(1, 6)]
+        for photo in self.photos:
+            photo.family_members.add(self.members[0])
+        self.photos[0].family_members.add(self.members[1])
+        private = self.create_photo(title='非公開', taken_date=date(2024, 2, 1), is_public=False)
+        private.family_members.add(self.members[1])
+
+    def test_recent_photos_are_loaded_in_one_query(self):
+        with self.assertNumQueries(1):
+            recent = FamilyPhoto.recent_by_member([member.pk for member in self.members])
+        self.assertEqual(
+            {member_id: [photo.pk for photo in photos] for member_id, photos in recent.items()},
+            {
+                self.members[0].pk: [photo.pk for photo in self.photos[:1:-1]],
+                self.members[1].pk: [self.photos[0].pk],
+                self.members[2].pk: [],
+            },
+        )
+
+    def test_card_makes_no_queries_with_recent_photos(self):
+        recent = FamilyPhoto.recent_by_member([member.pk for member in self.members])
+        with self.assertNumQueries(0):
+            html = [member_card(member, show_photos=True, recent_photos=recent) for member in self.members]
+        self.assertIn('alt="写真5"', html[0])
+        self.assertNotIn('alt="写真2"', html[0])
+        self.assertNotIn('非公開', html[1])
+
+
+@override_settings(**FEATURE_CACHE)
+class AlbumSummaryTests(FeatureTestMixin, TestCase):
+    """アルバムの公開写真の枚数と一覧用のカバー（コミット後に計算し直す）"""
+
+    def setUp(self):
+        super().setUp()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.album = PhotoAlbum.objects.create(title='旅行')
+
+    def test_count_and_cover_follow_photos(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            older = self.create_photo(taken_date=date(2024, 1, 1), album=self.album)
+            newer = self.create_photo(taken_date=date(2024, 1, 2), album=self.album)
+            self.create_photo(taken_date=date(2024, 1, 3), album=self.album, is_public=False)
+        self.album.refresh_from_db()
+        self.assertEqual(self.album.public_photo_count, 2)
+        self.assertEqual(self.album.cover_thumbnail.name, newer.thumbnail.name)
+
+        # 別のアルバムへの移動は、移動元と移動先の両方を計算し直す
+        other = PhotoAlbum.objects.create(title='誕生日')
+        with self.captureOnCommitCallbacks(execute=True):
+            newer.album = other
+            newer.save()
+        self.album.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(
+            (self.album.public_photo_count, self.album.cover_thumbnail.name),
+            (1, older.thumbnail.name),
+        )
+        self.assertEqual(other.public_photo_count, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            older.delete()
+        self.album.refresh_from_db()
+        self.assertEqual((self.album.public_photo_count, self.album.cover_thumbnail.name), (0, ''))
+
+    def test_refresh_runs_once_per_transaction(self):
+        with mock.patch.object(
+            PhotoAlbum, 'refresh_summaries', wraps=PhotoAlbum.refresh_summaries
+        ) as refresh:
+            with self.captureOnCommitCallbacks(execute=True):
+                for day in (1, 2, 3):
+                    self.create_photo(taken_date=date(2024, 1, day), album=self.album)
+        refresh.assert_called_once_with({self.album.pk})
+        self.album.refresh_from_db()
+        self.assertEqual(self.album.public_photo_count, 3)
+
+    def test_mosaic_cover(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.album.cover_style = 'mosaic'
+            self.album.save()
+            for day in range(1, PhotoAlbum.mosaic_photo_count + 1):
+                self.create_photo(taken_date=date(2024, 1, day), album=self.album)
+        self.album.refresh_from_db()
+        self.assertTrue(self.album.cover_thumbnail.name.startswith(PhotoAlbum.mosaic_directory))
+        self.assertTrue(self.media_exists(self.album.cover_thumbnail.name))
+
+        # アルバムの削除で、作成したモザイクも削除する
+        name = self.album.cover_thumbnail.name
+        self.album.delete()
+        self.assertFalse(self.media_exists(name))
@@ -1,5 +1,9 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import api, views, async_views
+
+# ASGIで動かす場合は、読み取り中心のビューを非同期版にする
+read_views = async_views if settings.ASYNC_VIEWS else views
 
 urlpatterns = [
     # ホーム
@@ -11,15 +15,18 @@ urlpatterns = [
     path('family/<int:pk>/', views.family_detail, name='family_detail'),
     
     # フォトギャラリー
-    path('gallery/', views.photo_gallery, name='photo_gallery'),
-    path('gallery/photo/<int:pk>/', views.photo_detail, name='photo_detail'),
+    path('gallery/', read_views.photo_gallery, name='photo_gallery'),
+    path('gallery/more/', views.photo_gallery_more, name='photo_gallery_more'),
+    path('gallery/photo/<int:pk>/', read_views.photo_detail, name='photo_detail'),
     
     # アルバム
     path('albums/', views.album_list, name='album_list'),
     path('albums/<int:pk>/', views.album_detail, name='album_detail'),
+    path('albums/<int:pk>/more/', views.album_photos_more, name='album_photos_more'),
+    path('albums/<int:pk>/manifest/', views.album_manifest, name='album_manifest'),
     
     # イベント管理
-    path('events/', views.event_calendar, name='event_calendar'),
+    path('events/', read_views.event_calendar, name='event_calendar'),
     path('events/<int:event_id>/', views.event_detail, name='event_detail'),
     path('events/create/', views.EventCreateView.as_view(), name='event_create'),
     path('events/<int:pk>/edit/', views.EventUpdateView.as_view(), name='event_update'),
@@ -31,5 +38,22 @@ urlpatterns = [
     
     # Ajax機能
     path('ajax/toggle-favorite/<int:photo_id>/', views.toggle_favorite, name='toggle_favorite'),
-    path('api/upcoming-events/', views.upcoming_events_api, name='upcoming_events_api'),
+    path('api/upcoming-events/', read_views.upcoming_events_api, name='upcoming_events_api'),
+    path('api/photos/bulk/', views.bulk_edit_photos_api, name='bulk_edit_photos_api'),
+    
+    # JSON API（main.api）
+    path(f'api/{api.API_VERSION}/sync/', api.sync, name='api_sync'),
+    path(f'api/{api.API_VERSION}/<str:resource>/', api.collection, name='api_collection'),
+    path(f'api/{api.API_VERSION}/<str:resource>/bulk/', api.bulk, name='api_bulk'),
+    path(f'api/{api.API_VERSION}/<str:resource>/<int:pk>/', api.item, name='api_item'),
+    
+    # ライブ更新（Server-Sent Events、常に非同期）
+    path('live/', async_views.live_updates, name='live_updates'),
+    
+    # プロファイリング（スタッフのみ）
+    path('profiles/', views.profile_list, name='profile_list'),
+    path('profiles/<str:name>/', views.profile_download, name='profile_download'),
+    
+    # メトリクス（Prometheusの既定のパスに合わせて末尾のスラッシュなし）
+    path('metrics', views.metrics_view, name='metrics'),
 ]
@@ -0,0 +1,156 @@
+"""
+データのエクスポート・インポート（export_family / import_family）の共通処理
+
+アーカイブは1行1レコードのJSONL形式で、1行目はヘッダー。
+各レコードは {"model": "main.familyphoto", "fields": {...}} の形で、
+外部キーは「<列名>_id」のまま保存する。
+"""
+
+import datetime
+import gzip
+import json
+import sys
+from contextlib import contextmanager
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+
+from ..models import (
+    FamilyMember, PhotoTag, PhotoAlbum, FamilyPhoto, PhotoFavorite, EventCategory, FamilyEvent,
+)
+
+ARCHIVE_FORMAT = 'family-app-export'
+ARCHIVE_VERSION = 1
+
+# 出力順（外部キーの参照先が先に来るようにする）
+EXPORT_MODELS = [
+    FamilyMember,
+    PhotoTag,
+    PhotoAlbum,
+    EventCategory,
+    FamilyPhoto,
+    FamilyEvent,
+    FamilyPhoto.family_members.through,
+    FamilyPhoto.tags.through,
+    FamilyEvent.participants.through,
+    PhotoFavorite,
+]
+
+# ユーザーごとのデータ（--no-users では出力しない）
+USER_DATA_MODELS = [PhotoFavorite]
+
+# ユーザーは既存のユーザーとユーザー名で照合する
+USER_FIELDS = [
+    'id', 'username', 'password', 'email', 'first_name', 'last_name',
+    'is_staff', 'is_superuser', 'is_active', 'date_joined', 'last_login',
+]
+
+
+def model_label(model):
+    """モデルのラベルを返す（例: 'main.familyphoto'）"""
+    return model._meta.label_lower
+
+
+def export_fields(model):
+    """
+    エクスポートする列名の一覧を返す
+
+    中間テーブルは自動採番のidを含めない（インポート先で採番する）。
+
+    Args:
+        model: モデルクラス
+
+    Returns:
+        list: 列名（外部キーは attname）
+    """
+    fields = model._meta.concrete_fields
+    if model._meta.auto_created:
+        fields = [field for field in fields if not field.primary_key]
+    return [field.attname for field in fields]
+
+
+def media_fields(model):
+    """モデルのファイル（画像）フィールド名の一覧を返す"""
+    return [
+        field.attname for field in model._meta.concrete_fields
+        if field.get_internal_type() in ('FileField', 'ImageField')
+    ]
+
+
+class ArchiveJSONEncoder(DjangoJSONEncoder):
+    """日時をマイクロ秒まで保存するエンコーダ（DjangoJSONEncoderはミリ秒で切り捨てる）"""
+
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.time)):
+            return o.isoformat()
+        return super().default(o)
+
+
+def dumps(record):
+    """レコードをJSONLの1行に変換する"""
+    return json.dumps(record, cls=ArchiveJSONEncoder, ensure_ascii=False, separators=(',', ':'))
+
+
+@contextmanager
+def open_archive(path, mode):
+    """
+    アーカイブファイルを開く（.gzはgzip圧縮、'-'は標準入出力）
+
+    Args:
+        path (str): ファイルパス
+        mode (str): 'r' または 'w'
+    """
+    if path == '-':
+        stream = sys.stdin if mode == 'r' else sys.stdout
+        yield stream
+        return
+
+    if str(path).endswith('.gz'):
+        handle = gzip.open(path, f'{mode}t', encoding='utf-8')
+    else:
+        handle = open(path, mode, encoding='utf-8', newline='\n')
+    with handle:
+        yield handle
+
+
+def insert_raw(model, objs, batch_size=1000):
+    """
+    オブジェクトをまとめてINSERTする（auto_now / auto_now_add の値を上書きしない）
+
+    bulk_create はフィールドの pre_save を呼ぶため、エクスポート時の作成日・更新日が
+    現在時刻で上書きされてしまう。loaddata と同じ raw モードで、オブジェクトの値を
+    そのまま書き込む。フィールドの設定を書き換えないため、同じプロセスで動いている
+    他の処理には影響しない。主キーのないオブジェクトには、データベースが対応していれば
+    採番された主キーを設定する。
+
+    Args:
+        model: モデルクラス
+        objs (list): 保存するオブジェクト
+        batch_size (int): 1回のINSERTの最大件数
+    """
+    queryset = model._base_manager.all()
+    connection = connections[queryset.db]
+    opts = model._meta
+    groups = [
+        (opts.concrete_fields, None, [obj for obj in objs if obj.pk is not None]),
+        (
+            [field for field in opts.concrete_fields if field is not opts.auto_field],
+            opts.db_returning_fields if connection.features.can_return_rows_from_bulk_insert else None,
+            [obj for obj in objs if obj.pk is None],
+        ),
+    ]
+    for fields, returning_fields, group in groups:
+        if not group:
+            continue
+        size = min(batch_size, max(connection.ops.bulk_batch_size(fields, group), 1))
+        for start in range(0, len(group), size):
+            batch = group[start:start + size]
+            rows = queryset._insert(
+                batch, fields=fields, returning_fields=returning_fields, raw=True, using=queryset.db,
+            )
+            for obj, row in zip(batch, rows or ()):
+                for field, value in zip(returning_fields, row):
+                    setattr(obj, field.attname, value)
+            for obj in batch:
+                obj._state.adding = False
+                obj._state.db = queryset.db
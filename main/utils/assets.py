@@ -0,0 +1,85 @@
+"""
+静的ファイル（CSS / JavaScript）の圧縮
+
+collectstatic の後処理（main.storage）から呼び出され、
+ハッシュ付きファイル名を付ける前にファイルを圧縮する。
+"""
+
+import re
+
+# 文字列・url(...)・コメント（文字列やurlは圧縮せずにそのまま残す）
+_CSS_PROTECTED = re.compile(
+    r"""("(?:\\.|[^"\\\n])*"|'(?:\\.|[^'\\\n])*'|url\(\s*[^)'"\s][^)]*\))|/\*.*?\*/""",
+    re.S | re.I,
+)
+_CSS_WHITESPACE = re.compile(r'\s+')
+_CSS_PUNCTUATION = re.compile(r'\s*([{};,>])\s*')
+_CSS_COLON = re.compile(r':\s+')
+
+
+def _minify_css_code(text):
+    """文字列を含まないCSSの断片から不要な空白を取り除く"""
+    text = _CSS_WHITESPACE.sub(' ', text)
+    text = _CSS_PUNCTUATION.sub(r'\1', text)
+    text = _CSS_COLON.sub(':', text)
+    return text.replace(';}', '}')
+
+
+def minify_css(text):
+    """
+    CSSを圧縮する
+
+    コメントと不要な空白を取り除く。セレクタ中の「a :hover」のように
+    意味が変わる箇所を避けるため、コロンの前の空白は残す。
+    content: "a ; b" のような文字列と url(...) の中身は変更しない。
+
+    Args:
+        text (str): CSS
+
+    Returns:
+        str: 圧縮したCSS
+    """
+    parts = []
+    code = []
+    last = 0
+    for match in _CSS_PROTECTED.finditer(text):
+        code.append(text[last:match.start()])
+        last = match.end()
+        if match.group(1) is None:
+            # コメントはトークンの区切りとして空白に置き換える
+            code.append(' ')
+            continue
+        parts.append(_minify_css_code(''.join(code)))
+        parts.append(match.group(1))
+        code = []
+    code.append(text[last:])
+    parts.append(_minify_css_code(''.join(code)))
+    return ''.join(parts).strip() + '\n'
+
+
+def minify_js(text):
+    """
+    JavaScriptを圧縮する
+
+    文字列や正規表現を壊さないよう、行頭のインデント・空行・
+    行全体のコメントのみを取り除く控えめな圧縮にとどめる。
+
+    Args:
+        text (str): JavaScript
+
+    Returns:
+        str: 圧縮したJavaScript
+    """
+    lines = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith('//'):
+            continue
+        lines.append(line)
+    return '\n'.join(lines) + '\n'
+
+
+MINIFIERS = {
+    '.css': minify_css,
+    '.js': minify_js,
+}
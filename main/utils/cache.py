@@ -0,0 +1,444 @@
+"""
+バージョン付きキーによるキャッシュ無効化のユーティリティ
+
+モデルの変更時にタグ（例: 'photo', 'photo:12'）のバージョンを更新することで、
+そのタグに依存するキャッシュを一括で参照不能にする。
+キャッシュ本体を削除しないため、バックエンドを問わず安全に無効化できる。
+"""
+
+import hashlib
+import threading
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.cache import cc_delim_re, patch_cache_control, patch_vary_headers
+from django.views.decorators.http import condition
+
+from .. import routers
+from .helpers import aget_request_user
+from .metrics import CACHE_REQUESTS
+from .timing import record_cache
+
+VERSION_KEY_PREFIX = 'v:'
+
+
+def _version_key(tag):
+    return f'{VERSION_KEY_PREFIX}{tag}'
+
+
+def object_tag(namespace, pk):
+    """
+    個別オブジェクト用のタグ名を作成する
+
+    Args:
+        namespace (str): モデルの名前空間（例: 'photo'）
+        pk (int): 主キー
+
+    Returns:
+        str: タグ名（例: 'photo:12'）
+    """
+    return f'{namespace}:{pk}'
+
+
+def get_versions(tags):
+    """
+    タグの現在のバージョンをまとめて取得する
+
+    未登録のタグ（追い出された場合を含む）は現在時刻で初期化するため、
+    古いバージョンのキャッシュと衝突することはない。
+
+    Args:
+        tags (iterable): タグ名
+
+    Returns:
+        dict: タグ名 -> バージョン
+    """
+    tags = list(dict.fromkeys(tags))
+    if not tags:
+        return {}
+
+    keys = {_version_key(tag): tag for tag in tags}
+    found = cache.get_many(keys.keys())
+    versions = {keys[key]: value for key, value in found.items()}
+
+    missing = [tag for tag in tags if tag not in versions]
+    if missing:
+        initial = time.time_ns()
+        for tag in missing:
+            cache.add(_version_key(tag), initial, timeout=None)
+        found = cache.get_many([_version_key(tag) for tag in missing])
+        for tag in missing:
+            versions[tag] = found.get(_version_key(tag), initial)
+
+    return versions
+
+
+def bump_versions(*tags):
+    """
+    タグのバージョンを更新し、依存するキャッシュを無効化する
+
+    Args:
+        *tags (str): 無効化するタグ名
+    """
+    tags = list(dict.fromkeys(tag for tag in tags if tag))
+    if not tags:
+        return
+
+    version = time.time_ns()
+    cache.set_many({_version_key(tag): version for tag in tags}, timeout=None)
+
+
+def make_key(prefix, *parts, tags=()):
+    """
+    タグのバージョンを含んだキャッシュキーを作成する
+
+    Args:
+        prefix (str): キーの接頭辞
+        *parts: キーを構成する値
+        tags (iterable): 依存するタグ名
+
+    Returns:
+        str: キャッシュキー
+    """
+    versions = get_versions(tags)
+    raw = '|'.join(
+        [str(part) for part in parts]
+        + [f'{tag}={versions[tag]}' for tag in sorted(versions)]
+    )
+    digest = hashlib.md5(raw.encode('utf-8')).hexdigest()
+    return f'{prefix}:{digest}'
+
+
+def get_or_set(key, default, timeout=None):
+    """
+    キャッシュから値を取得し、なければ計算して保存する
+
+    ヒット・ミスは 'value:<キーの接頭辞>' の名前で記録する。
+
+    Args:
+        key (str): キャッシュキー（make_keyで作成したもの）
+        default (callable): 値を計算する関数
+        timeout (int): 有効期限（秒）。Noneの場合はCACHESの設定値
+
+    Returns:
+        キャッシュされた値
+    """
+    sentinel = object()
+    value = cache.get(key, sentinel)
+    record_cache_access(f'value:{key.rsplit(":", 1)[0]}', hit=value is not sentinel)
+    if value is sentinel:
+        value = default()
+        if timeout is None:
+            cache.set(key, value)
+        else:
+            cache.set(key, value, timeout)
+    return value
+
+
+def invalidate_all():
+    """キャッシュを全て破棄する（一括インポート後など）"""
+    cache.clear()
+
+
+# ========== キャッシュのヒット・ミス数 ==========
+
+_cache_stats = {}
+_cache_stats_lock = threading.Lock()
+
+
+def record_cache_access(name, hit):
+    """
+    キャッシュのヒット・ミスを記録する
+
+    Args:
+        name (str): キャッシュ名（例: 'fragment:photo_card', 'page:home'）
+        hit (bool): ヒットしたかどうか
+    """
+    record_cache(hit)
+    CACHE_REQUESTS.inc(cache=name, result='hit' if hit else 'miss')
+    with _cache_stats_lock:
+        stats = _cache_stats.setdefault(name, {'hits': 0, 'misses': 0})
+        stats['hits' if hit else 'misses'] += 1
+
+
+def cache_stats():
+    """
+    キャッシュのヒット・ミス数を取得する（プロセス単位）
+
+    Returns:
+        dict: キャッシュ名 -> {'hits': int, 'misses': int}
+    """
+    with _cache_stats_lock:
+        return {name: dict(stats) for name, stats in _cache_stats.items()}
+
+
+def reset_cache_stats():
+    """キャッシュのヒット・ミス数をリセットする"""
+    with _cache_stats_lock:
+        _cache_stats.clear()
+
+
+# ========== テンプレート断片のキャッシュ ==========
+
+def cached_fragment(name, parts, tags, render):
+    """
+    描画済みのテンプレート断片をキャッシュする
+
+    Args:
+        name (str): 断片名（統計とキーの接頭辞に使用）
+        parts (iterable): キーを構成する値（オブジェクトのpkやupdated_atなど）
+        tags (iterable): 依存するタグ名
+        render (callable): 断片を描画する関数
+
+    Returns:
+        str: 描画済みのHTML
+    """
+    key = make_key(f'fragment:{name}', *parts, tags=tags)
+    html = cache.get(key)
+    if html is not None:
+        record_cache_access(f'fragment:{name}', hit=True)
+        return html
+
+    record_cache_access(f'fragment:{name}', hit=False)
+    html = render()
+    cache.set(key, html)
+    return html
+
+
+# ========== 匿名ユーザー向けページキャッシュ ==========
+
+PAGE_CACHE_HEADER = 'X-Page-Cache'
+
+
+def add_cache_tags(request, *tags):
+    """
+    ページキャッシュのタグをビューの中から追加する
+
+    関連オブジェクトのpkなど、ビューを実行するまで分からないタグに使用する。
+
+    Args:
+        request: HttpRequest
+        *tags (str): タグ名
+    """
+    page_tags = getattr(request, '_page_cache_tags', None)
+    if page_tags is not None:
+        page_tags.update(tag for tag in tags if tag)
+
+
+def _page_base_key(request):
+    # 「今日」を基準に表示が変わるページがあるため日付もキーに含める
+    raw = f'{timezone.localdate()}|{request.build_absolute_uri()}'
+    return f'page:{hashlib.md5(raw.encode("utf-8")).hexdigest()}'
+
+
+def _page_key(request, base_key, vary_headers):
+    # Cookieは匿名ユーザーのみを対象にしているためキーに含めない
+    values = [request.headers.get(header, '') for header in vary_headers]
+    digest = hashlib.md5('|'.join(values).encode('utf-8')).hexdigest()
+    return f'{base_key}:{digest}'
+
+
+def _vary_headers(response):
+    if not response.has_header('Vary'):
+        return []
+    headers = cc_delim_re.split(response.headers['Vary'])
+    return sorted(
+        header for header in headers
+        if header and header.lower() != 'cookie'
+    )
+
+
+def _is_cacheable(request, response):
+    if response.status_code != 200 or response.streaming:
+        return False
+    if response.cookies or response.has_header('Set-Cookie'):
+        return False
+    if 'no-store' in response.get('Cache-Control', '') or 'private' in response.get('Cache-Control', ''):
+        return False
+    # ビューでメッセージが追加された場合（エラー表示など）はキャッシュしない
+    storage = getattr(request, '_messages', None)
+    if storage is not None and getattr(storage, 'added_new', False):
+        return False
+    return True
+
+
+def _lookup_page(request, cache_name):
+    """キャッシュ済みのページを取得する（タグのバージョンが変わっていれば None）"""
+    base_key = _page_base_key(request)
+    vary_headers = cache.get(f'{base_key}:vary')
+    if vary_headers is not None:
+        entry = cache.get(_page_key(request, base_key, vary_headers))
+        if entry is not None and get_versions(entry['versions']) == entry['versions']:
+            record_cache_access(cache_name, hit=True)
+            response = entry['response']
+            response[PAGE_CACHE_HEADER] = 'HIT'
+            return response
+
+    record_cache_access(cache_name, hit=False)
+    return None
+
+
+def _store_page(request, response, page_tags, versions, timeout):
+    """ビューの応答をタグのバージョンと一緒に保存する"""
+    response[PAGE_CACHE_HEADER] = 'MISS'
+    patch_vary_headers(response, ('Cookie',))
+
+    if _is_cacheable(request, response):
+        extra_tags = request._page_cache_tags - page_tags
+        versions.update(get_versions(extra_tags))
+        page_timeout = timeout if timeout is not None else getattr(
+            settings, 'PAGE_CACHE_TIMEOUT', 600
+        )
+        base_key = _page_base_key(request)
+        vary_headers = _vary_headers(response)
+        cache.set(f'{base_key}:vary', vary_headers, page_timeout)
+        cache.set(
+            _page_key(request, base_key, vary_headers),
+            {'response': response, 'versions': versions},
+            page_timeout,
+        )
+    return response
+
+
+def _skip_page_cache(request):
+    """ユーザー以外の条件でキャッシュを使わないかどうか（ユーザーの取得は最後に行う）"""
+    return (
+        not getattr(settings, 'PAGE_CACHE_ENABLED', True)
+        or request.method not in ('GET', 'HEAD')
+        or 'messages' in request.COOKIES
+    )
+
+
+def cache_public_page(*tags, timeout=None):
+    """
+    匿名ユーザーのGETリクエストに対してページ全体をキャッシュするデコレータ
+
+    キャッシュはタグのバージョンと一緒に保存され、取得時にバージョンが
+    変わっていれば破棄される。タグはURLの引数で書式化できる（例: 'photo:{pk}'）。
+    ログイン中のユーザーには常にビューを実行する。非同期ビューにも使用できる。
+
+    キャッシュがない場合のビューはプライマリから読み込む。遅延しているレプリカから
+    描画したページを更新後のタグのバージョンで保存すると、レプリカの遅延よりずっと長い
+    PAGE_CACHE_TIMEOUT の間、古いページを返し続けてしまうため。
+
+    Args:
+        *tags (str): ページが依存するタグ名
+        timeout (int): 有効期限（秒）。Noneの場合はPAGE_CACHE_TIMEOUT
+    """
+    def decorator(view_func):
+        cache_name = f'page:{view_func.__name__}'
+
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def async_wrapper(request, *args, **kwargs):
+                if _skip_page_cache(request) or (await aget_request_user(request)).is_authenticated:
+                    return await view_func(request, *args, **kwargs)
+
+                response = await sync_to_async(_lookup_page)(request, cache_name)
+                if response is not None:
+                    return response
+
+                routers.pin_to_primary()
+                page_tags = {tag.format(**kwargs) for tag in tags}
+                versions = await sync_to_async(get_versions)(page_tags)
+                request._page_cache_tags = set()
+                response = await view_func(request, *args, **kwargs)
+                return await sync_to_async(_store_page)(request, response, page_tags, versions, timeout)
+
+            return async_wrapper
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if _skip_page_cache(request) or request.user.is_authenticated:
+                return view_func(request, *args, **kwargs)
+
+            response = _lookup_page(request, cache_name)
+            if response is not None:
+                return response
+
+            routers.pin_to_primary()
+            # ビュー実行前のバージョンを保存し、実行中の変更を取りこぼさないようにする
+            page_tags = {tag.format(**kwargs) for tag in tags}
+            versions = get_versions(page_tags)
+            request._page_cache_tags = set()
+            response = view_func(request, *args, **kwargs)
+            return _store_page(request, response, page_tags, versions, timeout)
+
+        return wrapper
+
+    return decorator
+
+
+# ========== 条件付きGET（ETag / Last-Modified） ==========
+
+def make_etag(request, *parts, tags=()):
+    """
+    ページの検証子（ETag）を作成する
+
+    ログイン状態で表示が変わるため、ユーザーIDもETagに含める。
+
+    Args:
+        request: HttpRequest
+        *parts: 検証子を構成する値（updated_atの最大値など）
+        tags (iterable): 多対多の変更など、updated_atに現れない変更を検知するタグ名
+
+    Returns:
+        str: ETag（引用符なし）
+    """
+    versions = get_versions(tags)
+    raw = '|'.join(
+        [str(getattr(request.user, 'pk', None))]
+        + [str(part) for part in parts]
+        + [f'{tag}={versions[tag]}' for tag in sorted(versions)]
+    )
+    return hashlib.md5(raw.encode('utf-8')).hexdigest()
+
+
+def conditional_page(validators):
+    """
+    ETag / Last-Modified による条件付きGETに対応するデコレータ
+
+    validators(request, **kwargs) は (etag, last_modified) を返す関数で、
+    オブジェクトが存在しない場合は None を返す。一致した場合はビューを
+    実行せずに304を返す。非同期ビューでは validators をスレッドで実行する。
+
+    Args:
+        validators (callable): 検証子を計算する関数
+    """
+    def _validators(request, *args, **kwargs):
+        # etag_funcとlast_modified_funcで同じクエリを2回実行しないようにする
+        if not hasattr(request, '_page_validators'):
+            request._page_validators = validators(request, *args, **kwargs) or (None, None)
+        return request._page_validators
+
+    def decorator(view_func):
+        conditional_view = condition(
+            etag_func=lambda request, *args, **kwargs: _validators(request, *args, **kwargs)[0],
+            last_modified_func=lambda request, *args, **kwargs: _validators(request, *args, **kwargs)[1],
+        )(view_func)
+
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def async_wrapper(request, *args, **kwargs):
+                # 検証子のクエリを先にスレッドで実行しておき、condition からは結果だけを参照させる
+                await sync_to_async(_validators)(request, *args, **kwargs)
+                response = await conditional_view(request, *args, **kwargs)
+                patch_cache_control(response, no_cache=True)
+                return response
+
+            return async_wrapper
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            # ブラウザが毎回検証子で再検証するようにする
+            patch_cache_control(response, no_cache=True)
+            return response
+
+        return wrapper
+
+    return decorator
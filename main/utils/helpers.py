@@ -4,8 +4,11 @@ Utility functions for the main app.
 
 from datetime import date
 from django.core.exceptions import ValidationError
-from PIL import Image
+from PIL import Image, ImageOps
 import os
+import time
+
+from .metrics import IMAGE_PROCESSING_DURATION, IMAGES_PROCESSED, IMAGE_BYTES_SAVED
 
 
 def calculate_age(birth_date):
@@ -72,6 +75,8 @@ def resize_image(image_path, max_size=(800, 800)):
     if not os.path.exists(image_path):
         return
     
+    started = time.perf_counter()
+    original_size = os.path.getsize(image_path)
     try:
         with Image.open(image_path) as img:
             # アスペクト比を保持してリサイズ
@@ -82,6 +87,12 @@ def resize_image(image_path, max_size=(800, 800)):
     except Exception as e:
         # エラーログを出力（本番環境では適切なロガーを使用）
         print(f"画像リサイズエラー: {e}")
+        IMAGES_PROCESSED.inc(operation='resize', result='error')
+        return
+    
+    IMAGE_PROCESSING_DURATION.observe(time.perf_counter() - started, operation='resize')
+    IMAGES_PROCESSED.inc(operation='resize', result='ok')
+    IMAGE_BYTES_SAVED.inc(max(original_size - os.path.getsize(image_path), 0), operation='resize')
 
 
 def format_date_japanese(date_obj):
@@ -117,6 +128,19 @@ def get_month_name_japanese(month):
     return month_names.get(month, f"{month}月")
 
 
+def thumbnail_name(image_name):
+    """
+    画像のサムネイルのファイル名（ストレージ上の名前）
+
+    Args:
+        image_name (str): 元の画像のファイル名（例: gallery/2024/05/a.png）
+
+    Returns:
+        str: サムネイルのファイル名（例: thumbnails/gallery/2024/05/a.jpg）
+    """
+    return f'thumbnails/{os.path.splitext(image_name)[0]}.jpg'
+
+
 def create_thumbnail(image_path, thumbnail_path, size=(300, 300)):
     """
     画像のサムネイルを作成
@@ -129,6 +153,7 @@ def create_thumbnail(image_path, thumbnail_path, size=(300, 300)):
     Returns:
         bool: 作成成功したかどうか
     """
+    started = time.perf_counter()
     try:
         with Image.open(image_path) as img:
             # アスペクト比を保持してサムネイル作成
@@ -143,11 +168,55 @@ def create_thumbnail(image_path, thumbnail_path, size=(300, 300)):
                 img = background
             
             # サムネイル保存
+            os.makedirs(os.path.dirname(thumbnail_path), exist_ok=True)
             img.save(thumbnail_path, 'JPEG', quality=85, optimize=True)
-            return True
     except Exception as e:
         print(f"サムネイル作成エラー: {e}")
+        IMAGES_PROCESSED.inc(operation='thumbnail', result='error')
+        return False
+    
+    IMAGE_PROCESSING_DURATION.observe(time.perf_counter() - started, operation='thumbnail')
+    IMAGES_PROCESSED.inc(operation='thumbnail', result='ok')
+    saved = os.path.getsize(image_path) - os.path.getsize(thumbnail_path)
+    IMAGE_BYTES_SAVED.inc(max(saved, 0), operation='thumbnail')
+    return True
+
+
+def create_mosaic(image_paths, output_path, size=(400, 400)):
+    """
+    複数の画像を格子状に並べた1枚の画像を作成（アルバムのカバー用）
+    
+    4枚なら2×2のように、正方形に近い格子に中央を切り抜いて並べる。
+    
+    Args:
+        image_paths (list): 並べる画像のパス（左上から横に並べる）
+        output_path (str): 保存先のパス
+        size (tuple): 作成する画像のサイズ (幅, 高さ)
+        
+    Returns:
+        bool: 作成成功したかどうか
+    """
+    started = time.perf_counter()
+    columns = max(1, round(len(image_paths) ** 0.5))
+    rows = -(-len(image_paths) // columns)
+    cell = (size[0] // columns, size[1] // rows)
+    try:
+        mosaic = Image.new('RGB', (cell[0] * columns, cell[1] * rows), (255, 255, 255))
+        for index, image_path in enumerate(image_paths):
+            with Image.open(image_path) as img:
+                tile = ImageOps.fit(img.convert('RGB'), cell, Image.Resampling.LANCZOS)
+            mosaic.paste(tile, ((index % columns) * cell[0], (index // columns) * cell[1]))
+        
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        mosaic.save(output_path, 'JPEG', quality=85, optimize=True)
+    except Exception as e:
+        print(f"モザイク作成エラー: {e}")
+        IMAGES_PROCESSED.inc(operation='mosaic', result='error')
         return False
+    
+    IMAGE_PROCESSING_DURATION.observe(time.perf_counter() - started, operation='mosaic')
+    IMAGES_PROCESSED.inc(operation='mosaic', result='ok')
+    return True
 
 
 def get_image_info(image_path):
@@ -219,3 +288,23 @@ def is_image_file(filename):
     """
     image_extensions = ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp']
     return get_file_extension(filename) in image_extensions
+
+
+async def aget_request_user(request):
+    """
+    リクエストのユーザーを非同期で取得する
+    
+    request.auser() と request.user は別々にユーザーを取得するため、どちらかで
+    取得済みのユーザーを両方に保存し、テンプレートなどで再度クエリしないようにする。
+    
+    Args:
+        request: HttpRequest（AuthenticationMiddleware 適用後）
+        
+    Returns:
+        User or AnonymousUser: ユーザー
+    """
+    user = getattr(request, '_cached_user', None)
+    if user is None:
+        user = await request.auser()
+    request._cached_user = request._acached_user = user
+    return user
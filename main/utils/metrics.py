@@ -0,0 +1,375 @@
+"""
+Prometheus形式のメトリクス
+
+カウンター・ゲージ・ヒストグラムをプロセス内で集計し、/metrics で
+テキスト形式（version 0.0.4）として出力する。
+
+gunicorn など複数のワーカープロセスで動かす場合は METRICS_MULTIPROC_DIR を
+設定する。各プロセスは自分の値を「<pid>.json」に定期的（METRICS_FLUSH_INTERVAL秒ごと）
+に書き出し、/metrics は全てのファイルを合算して出力する。
+終了したプロセスのファイルは、カウンター・ヒストグラムを「aggregate.json」に合算してから
+削除する（ゲージは現在の値ではないため捨てる）。ファイルにはプロセスの開始時刻も
+書き出し、同じPIDが別のプロセスに再利用された場合も終了したものとして扱う
+（/proc がない環境ではPIDの存在だけを確認する）。複数プロセスでの集計はPOSIXのみ対応し、
+1プロセスで動かす場合（METRICS_MULTIPROC_DIR なし）はどの環境でも動作する。
+"""
+
+import atexit
+import bisect
+import json
+import math
+import os
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+
+# 応答時間など、秒単位のヒストグラムの既定のバケット
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_lock = threading.Lock()
+_metrics = {}
+_last_flush = 0.0
+
+
+class Metric:
+    """メトリクスの基底クラス"""
+
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        with _lock:
+            if name in _metrics:
+                raise ValueError(f'メトリクス {name} は既に登録されています')
+            _metrics[name] = self
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f'{self.name} のラベルは {self.labelnames} です')
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+
+class Counter(Metric):
+    """増加のみするカウンター"""
+
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with _lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """増減する値（複数プロセスでは実行中のプロセスの合計）"""
+
+    type = 'gauge'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with _lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    """値の分布（バケットごとの件数・合計・件数）"""
+
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with _lock:
+            # [バケットごとの件数..., +Infの件数, 合計]
+            entry = self.values.get(key)
+            if entry is None:
+                entry = self.values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            entry[index] += 1
+            entry[-1] += value
+
+
+# ========== 複数プロセスでの集計 ==========
+
+def _multiproc_dir():
+    directory = getattr(settings, 'METRICS_MULTIPROC_DIR', None)
+    return Path(directory) if directory else None
+
+
+def _process_start(pid):
+    """プロセスの開始時刻（/proc が無い環境では None）"""
+    try:
+        stat = Path(f'/proc/{pid}/stat').read_text()
+    except OSError:
+        return None
+    # コマンド名に空白や括弧が含まれる場合があるため、最後の「)」以降を分割する
+    return int(stat.rsplit(')', 1)[1].split()[19])
+
+
+def _snapshot():
+    with _lock:
+        return {
+            name: {json.dumps(key): value for key, value in metric.values.items()}
+            for name, metric in _metrics.items()
+        }
+
+
+def _write_json(path, data):
+    tmp_path = path.with_name(f'{path.name}.tmp')
+    tmp_path.write_text(json.dumps(data))
+    os.replace(tmp_path, path)
+
+
+def flush(force=False):
+    """
+    このプロセスの値をファイルに書き出す（METRICS_MULTIPROC_DIR 設定時のみ）
+
+    Args:
+        force (bool): 書き出し間隔に関係なく書き出す
+    """
+    global _last_flush
+    directory = _multiproc_dir()
+    if directory is None:
+        return
+
+    now = time.monotonic()
+    if not force and now - _last_flush < getattr(settings, 'METRICS_FLUSH_INTERVAL', 1.0):
+        return
+    _last_flush = now
+
+    directory.mkdir(parents=True, exist_ok=True)
+    pid = os.getpid()
+    _write_json(directory / f'{pid}.json', {
+        'start': _process_start(pid),
+        'metrics': _snapshot(),
+    })
+
+
+atexit.register(flush, force=True)
+
+
+def _pid_alive(pid, start):
+    """
+    プロセスが動いているかどうか
+
+    POSIX以外では os.kill がプロセスを終了させてしまうため確認せず、動いているものとする
+    （終了したプロセスのファイルは合算せずにそのまま残る）。
+    """
+    if os.name != 'posix':
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    # PIDが別のプロセスに再利用されていないか
+    return start is None or _process_start(pid) == start
+
+
+def _merge(metric, total, key, value):
+    if metric.type == 'histogram':
+        current = total.get(key)
+        total[key] = value if current is None else [a + b for a, b in zip(current, value)]
+    else:
+        total[key] = total.get(key, 0) + value
+
+
+def _merge_sources(sources):
+    totals = {name: {} for name in _metrics}
+    for source in sources:
+        for name, values in source.items():
+            metric = _metrics.get(name)
+            if metric is None:
+                continue
+            for raw_key, value in values.items():
+                _merge(metric, totals[name], tuple(json.loads(raw_key)), value)
+    return totals
+
+
+def _read_json(path):
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def _retire(directory, paths):
+    """
+    終了したプロセスのカウンター・ヒストグラムを aggregate.json に合算し、ファイルを削除する
+
+    複数のプロセスが同時に /metrics を処理しても二重に合算しないよう、ロックを取ってから
+    ファイルが残っているものだけを合算する。
+    """
+    # POSIXのみのモジュールのため、ここで読み込む（_pid_alive がPOSIX以外では呼ばせない）
+    import fcntl
+
+    with open(directory / 'aggregate.lock', 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        aggregate_path = directory / 'aggregate.json'
+        sources = [_read_json(aggregate_path) or {}]
+        retired = []
+        for path in paths:
+            data = _read_json(path)
+            if data is None:
+                continue
+            sources.append({
+                name: values for name, values in data['metrics'].items()
+                if name in _metrics and _metrics[name].type != 'gauge'
+            })
+            retired.append(path)
+        if not retired:
+            return
+
+        totals = _merge_sources(sources)
+        _write_json(aggregate_path, {
+            name: {json.dumps(list(key)): value for key, value in values.items()}
+            for name, values in totals.items() if values
+        })
+        for path in retired:
+            path.unlink(missing_ok=True)
+
+
+def collect():
+    """
+    全プロセスの値を合算する
+
+    Returns:
+        dict: メトリクス名 -> {ラベルのタプル: 値}
+    """
+    sources = [_snapshot()]
+
+    directory = _multiproc_dir()
+    if directory is not None and directory.is_dir():
+        dead = []
+        for path in directory.glob('*.json'):
+            pid = int(path.stem) if path.stem.isdigit() else None
+            if pid is None or pid == os.getpid():
+                continue
+            data = _read_json(path)
+            if data is None:
+                continue
+            if not _pid_alive(pid, data.get('start')):
+                dead.append(path)
+                continue
+            sources.append(data['metrics'])
+
+        if dead:
+            _retire(directory, dead)
+        sources.append(_read_json(directory / 'aggregate.json') or {})
+
+    return _merge_sources(sources)
+
+
+# ========== テキスト形式での出力 ==========
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value))
+
+
+def render(totals=None):
+    """
+    Prometheusのテキスト形式で出力する
+
+    Args:
+        totals (dict): collect() の結果（省略時は集計する）
+
+    Returns:
+        str: メトリクスのテキスト
+    """
+    if totals is None:
+        totals = collect()
+
+    lines = []
+    for name, metric in sorted(_metrics.items()):
+        lines.append(f'# HELP {name} {_escape(metric.documentation)}')
+        lines.append(f'# TYPE {name} {metric.type}')
+        for key, value in sorted(totals.get(name, {}).items()):
+            if metric.type == 'histogram':
+                cumulative = 0
+                for bound, count in zip(metric.buckets + (math.inf,), value[:-1]):
+                    cumulative += count
+                    labels = _format_labels(metric.labelnames, key, [('le', _format_value(bound))])
+                    lines.append(f'{name}_bucket{labels} {_format_value(cumulative)}')
+                labels = _format_labels(metric.labelnames, key)
+                lines.append(f'{name}_sum{labels} {_format_value(value[-1])}')
+                lines.append(f'{name}_count{labels} {_format_value(cumulative)}')
+            else:
+                lines.append(f'{name}{_format_labels(metric.labelnames, key)} {_format_value(value)}')
+
+    # キャッシュのヒット率（参照数から計算する）
+    lookups = {}
+    for (cache_name, result), count in totals.get(CACHE_REQUESTS.name, {}).items():
+        lookups.setdefault(cache_name, {})[result] = count
+    lines.append('# HELP family_cache_hit_ratio キャッシュのヒット率')
+    lines.append('# TYPE family_cache_hit_ratio gauge')
+    for cache_name, results in sorted(lookups.items()):
+        total = sum(results.values())
+        ratio = results.get('hit', 0) / total if total else 0
+        lines.append(f'family_cache_hit_ratio{_format_labels(["cache"], [cache_name])} {_format_value(ratio)}')
+
+    return '\n'.join(lines) + '\n'
+
+
+# ========== アプリのメトリクス ==========
+
+REQUESTS = Counter(
+    'family_http_requests_total', 'リクエスト数',
+    ['view', 'method', 'status'],
+)
+REQUEST_DURATION = Histogram(
+    'family_http_request_duration_seconds', 'リクエストの処理時間（秒）',
+    ['view'],
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    'family_http_requests_in_flight', '処理中のリクエスト数',
+)
+DB_QUERIES = Counter(
+    'family_db_queries_total', 'ビューが実行したクエリ数',
+    ['view'],
+)
+DB_TIME = Counter(
+    'family_db_time_seconds_total', 'ビューのクエリの実行時間の合計（秒）',
+    ['view'],
+)
+CACHE_REQUESTS = Counter(
+    'family_cache_requests_total', 'キャッシュの参照数',
+    ['cache', 'result'],
+)
+IMAGE_PROCESSING_DURATION = Histogram(
+    'family_image_processing_seconds', '画像処理の時間（秒）',
+    ['operation'],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+IMAGES_PROCESSED = Counter(
+    'family_images_processed_total', '処理した画像の数',
+    ['operation', 'result'],
+)
+IMAGE_BYTES_SAVED = Counter(
+    'family_image_bytes_saved_total', '画像処理で削減したバイト数',
+    ['operation'],
+)
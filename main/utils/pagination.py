@@ -0,0 +1,87 @@
+"""
+キーセットページネーション（カーソル）
+
+OFFSET を使わず、並び順のキーの値（カーソル）より後の行を取得する。
+JSON API の一覧（main.api）と、無限スクロールのHTML断片で使う。
+カーソルは並び順のキーの値のリストをJSONにして、URLセーフなBase64にしたもの。
+"""
+
+import base64
+import json
+from datetime import date
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+def _key_name(key):
+    return key.lstrip('-')
+
+
+def cursor_values(obj, ordering):
+    """
+    オブジェクトの並び順のキーの値
+
+    Args:
+        obj: モデルのインスタンス
+        ordering (tuple): 並び順（例: ('-taken_date', '-pk')）
+
+    Returns:
+        list: キーの値
+    """
+    return [getattr(obj, _key_name(key)) for key in ordering]
+
+
+def encode_cursor(values):
+    """並び順のキーの値をカーソルにする"""
+    raw = json.dumps(
+        [value.isoformat() if isinstance(value, date) else value for value in values],
+        separators=(',', ':'),
+    ).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode('ascii')
+
+
+def decode_cursor(model, ordering, cursor):
+    """
+    カーソルを並び順のキーの値に戻す
+
+    Args:
+        model: モデルクラス
+        ordering (tuple): 並び順
+        cursor (str): encode_cursor() のカーソル
+
+    Returns:
+        list: キーの値
+
+    Raises:
+        ValueError: カーソルが不正な場合
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != len(ordering):
+            raise ValueError(cursor)
+        return [
+            model._meta.get_field(_key_name(key)).to_python(value)
+            if _key_name(key) != 'pk' else int(value)
+            for key, value in zip(ordering, values)
+        ]
+    except (ValueError, TypeError, ValidationError):
+        raise ValueError(f'カーソルが不正です: {cursor}')
+
+
+def keyset_filter(ordering, values):
+    """
+    並び順でカーソルより後の行を取得する条件
+
+    例えば ('-taken_date', '-pk') なら
+    taken_date < d OR (taken_date = d AND pk < id)
+    """
+    condition = Q()
+    for index, key in enumerate(ordering):
+        lookup = 'lt' if key.startswith('-') else 'gt'
+        step = Q(**{f'{_key_name(key)}__{lookup}': values[index]})
+        for previous, value in zip(ordering[:index], values[:index]):
+            step &= Q(**{_key_name(previous): value})
+        condition |= step
+    return condition
@@ -0,0 +1,117 @@
+"""
+リクエストのプロファイル（cProfile）の保存と参照
+
+ProfilingMiddleware が作成したプロファイルを PROFILING_DIR に .prof 形式で保存する。
+ダウンロードしたファイルは snakeviz や `python -m pstats` で確認できる。
+"""
+
+import io
+import os
+import pstats
+import re
+import time
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+
+# 保存するファイル名（パストラバーサル対策のため、この形式以外は扱わない）
+PROFILE_NAME_RE = re.compile(r'^[0-9]{8}-[0-9]{6}-[a-z0-9_-]+-[0-9]+ms-[0-9a-f]{8}\.prof$')
+
+
+def profile_dir():
+    """プロファイルの保存先ディレクトリ"""
+    return Path(getattr(settings, 'PROFILING_DIR', settings.BASE_DIR / 'profiles'))
+
+
+def _slugify_path(path):
+    slug = re.sub(r'[^a-z0-9]+', '_', path.lower()).strip('_')
+    return slug[:60] or 'root'
+
+
+def save_profile(profiler, request, elapsed):
+    """
+    プロファイルを保存する
+
+    Args:
+        profiler (cProfile.Profile): 計測済みのプロファイラ
+        request: HttpRequest
+        elapsed (float): 処理時間（秒）
+
+    Returns:
+        str: 保存したファイル名
+    """
+    directory = profile_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+
+    name = '{}-{}-{}ms-{}.prof'.format(
+        time.strftime('%Y%m%d-%H%M%S'),
+        _slugify_path(request.path),
+        int(elapsed * 1000),
+        uuid.uuid4().hex[:8],
+    )
+    profiler.dump_stats(directory / name)
+    _remove_old_profiles(directory)
+    return name
+
+
+def _remove_old_profiles(directory):
+    """PROFILING_MAX_FILES を超えた古いプロファイルを削除する"""
+    max_files = getattr(settings, 'PROFILING_MAX_FILES', 200)
+    files = sorted(directory.glob('*.prof'), key=lambda path: path.stat().st_mtime)
+    for path in files[:max(len(files) - max_files, 0)]:
+        path.unlink(missing_ok=True)
+
+
+def list_profiles():
+    """
+    保存済みのプロファイルを新しい順に取得する
+
+    Returns:
+        list: {'name', 'size', 'modified'} の辞書のリスト
+    """
+    directory = profile_dir()
+    if not directory.is_dir():
+        return []
+
+    profiles = []
+    for entry in os.scandir(directory):
+        if PROFILE_NAME_RE.match(entry.name):
+            stat = entry.stat()
+            profiles.append({
+                'name': entry.name,
+                'size': stat.st_size,
+                'modified': stat.st_mtime,
+            })
+    return sorted(profiles, key=lambda profile: profile['modified'], reverse=True)
+
+
+def profile_path(name):
+    """
+    ファイル名からプロファイルのパスを取得する
+
+    Returns:
+        Path: ファイルのパス（不正な名前・存在しない場合は None）
+    """
+    if not PROFILE_NAME_RE.match(name):
+        return None
+    path = profile_dir() / name
+    return path if path.is_file() else None
+
+
+def profile_summary(path, sort='cumulative', limit=60):
+    """
+    プロファイルの集計をテキストで取得する
+
+    Args:
+        path (Path): プロファイルのパス
+        sort (str): 並び順（cumulative / tottime / calls）
+        limit (int): 表示する関数の数
+
+    Returns:
+        str: pstats の出力
+    """
+    output = io.StringIO()
+    stats = pstats.Stats(str(path), stream=output)
+    stats.strip_dirs().sort_stats(sort).print_stats(limit)
+    return output.getvalue()
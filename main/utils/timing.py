@@ -0,0 +1,153 @@
+"""
+リクエストごとの処理時間の計測
+
+RequestTimingMiddleware がリクエストの開始時に RequestMetrics を作成し、
+以下の計測結果を集計する。リクエストの外（管理コマンドなど）では何もしない。
+
+- DB: 接続ごとに登録する execute_wrapper でクエリ数と実行時間を計測する
+- テンプレート: TimedDjangoTemplates バックエンドで描画時間を計測する
+- キャッシュ: utils.cache からヒット・ミスを記録する
+"""
+
+import time
+from contextvars import ContextVar
+
+from django.template.backends.django import DjangoTemplates, Template
+
+_current_metrics = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    """1リクエスト分の計測結果"""
+
+    __slots__ = (
+        'started', 'queries', 'db_time', 'template_time', 'template_depth',
+        'cache_hits', 'cache_misses',
+    )
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def elapsed(self):
+        """リクエスト開始からの経過時間（秒）"""
+        return time.perf_counter() - self.started
+
+
+def start_request():
+    """
+    計測を開始する
+
+    Returns:
+        tuple: (RequestMetrics, end_request に渡すトークン)
+    """
+    metrics = RequestMetrics()
+    return metrics, _current_metrics.set(metrics)
+
+
+def end_request(token):
+    """計測を終了する"""
+    _current_metrics.reset(token)
+
+
+def current_metrics():
+    """実行中のリクエストの計測結果（リクエストの外では None）"""
+    return _current_metrics.get()
+
+
+def percentile(values, percent):
+    """
+    値の一覧から百分位数を求める（線形補間）
+
+    Args:
+        values (list): 値の一覧（空でないこと）
+        percent (float): 百分位（0〜100）
+
+    Returns:
+        float: 百分位数
+    """
+    values = sorted(values)
+    if len(values) == 1:
+        return values[0]
+    position = (len(values) - 1) * percent / 100
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def record_cache(hit):
+    """
+    キャッシュのヒット・ミスを実行中のリクエストに記録する
+
+    Args:
+        hit (bool): ヒットしたかどうか
+    """
+    metrics = _current_metrics.get()
+    if metrics is not None:
+        if hit:
+            metrics.cache_hits += 1
+        else:
+            metrics.cache_misses += 1
+
+
+# ========== DB ==========
+
+def query_timer(execute, sql, params, many, context):
+    """クエリ数と実行時間を計測する execute_wrapper"""
+    metrics = _current_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.db_time += time.perf_counter() - started
+        metrics.queries += 1
+
+
+def install_query_timer(sender, connection, **kwargs):
+    """
+    DB接続の作成時に query_timer を登録する（connection_created シグナル）
+
+    接続を再利用する場合（CONN_MAX_AGE）に重複して登録しないようにする。
+    """
+    if query_timer not in connection.execute_wrappers:
+        connection.execute_wrappers.append(query_timer)
+
+
+# ========== テンプレート ==========
+
+class TimedTemplate(Template):
+    """描画時間を計測するテンプレート"""
+
+    def render(self, context=None, request=None):
+        metrics = _current_metrics.get()
+        if metrics is None:
+            return super().render(context, request)
+
+        # テンプレートタグ内で描画する断片は、外側の描画時間に含まれるため数えない
+        metrics.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metrics.template_depth -= 1
+            if metrics.template_depth == 0:
+                metrics.template_time += time.perf_counter() - started
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """描画時間を計測する DjangoTemplates バックエンド"""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return TimedTemplate(template.template, self)
@@ -0,0 +1,124 @@
+"""
+計測・解析の対象にするビューのURL
+
+クエリ数・応答時間のテスト（main.tests）と実行計画の解析（manage.py explain_views）が、
+main/urls.py の全てのURLを同じ引数・同じリクエストで実行するために使う。
+URLを追加した場合は、引数が必要なら URL_OBJECTS か URL_KWARGS に、
+POSTで実行するなら POST_REQUESTS に追加する。
+"""
+
+import json
+
+from django.urls import reverse
+
+from .. import urls as main_urls
+from ..models import FamilyMember, FamilyPhoto, PhotoAlbum, PhotoTag, FamilyEvent
+from .profiling import list_profiles
+
+# POSTで実行するURL（URL名 -> リクエストの内容を返す関数）
+POST_REQUESTS = {
+    'toggle_favorite': lambda: {},
+    'bulk_edit_photos_api': lambda: {
+        'data': json.dumps({
+            'action': 'add_tags',
+            'photo_ids': list(FamilyPhoto.objects.values_list('pk', flat=True)[:100]),
+            'target_ids': list(PhotoTag.objects.values_list('pk', flat=True)[:3]),
+        }),
+        'content_type': 'application/json',
+    },
+    'api_bulk': lambda: {
+        'data': json.dumps({
+            'update': [
+                {'id': pk, 'location': '自宅'}
+                for pk in FamilyPhoto.objects.filter(is_public=True).values_list('pk', flat=True)[:3]
+            ],
+        }),
+        'content_type': 'application/json',
+    },
+}
+
+
+def _latest_profile():
+    profiles = list_profiles()
+    return {'name': profiles[0]['name']} if profiles else None
+
+
+# オブジェクト以外のURL引数（URL名 -> 引数を返す関数。対象がない場合は None を返す）
+URL_KWARGS = {
+    'api_collection': lambda: {'resource': 'photos'},
+    'api_bulk': lambda: {'resource': 'photos'},
+    'api_item': lambda: {'resource': 'photos'},
+    'profile_download': _latest_profile,
+}
+
+# URL引数に使うオブジェクト（URL名 -> クエリセットを返す関数。最も小さいpkを使う）
+URL_OBJECTS = {
+    'family_detail': lambda: FamilyMember.objects.filter(is_active=True),
+    'photo_detail': lambda: FamilyPhoto.objects.filter(is_public=True),
+    'album_detail': lambda: PhotoAlbum.objects.filter(is_public=True),
+    'album_photos_more': lambda: PhotoAlbum.objects.filter(is_public=True),
+    'album_manifest': lambda: PhotoAlbum.objects.filter(is_public=True),
+    'event_detail': lambda: FamilyEvent.objects.all(),
+    'event_update': lambda: FamilyEvent.objects.all(),
+    'event_delete': lambda: FamilyEvent.objects.all(),
+    'toggle_favorite': lambda: FamilyPhoto.objects.all(),
+    'api_item': lambda: FamilyPhoto.objects.filter(is_public=True),
+}
+
+
+def _url_kwargs(pattern):
+    """URLパターンの引数（対象のデータがない場合は None）"""
+    name = pattern.name
+    kwargs = URL_KWARGS[name]() if name in URL_KWARGS else {}
+    if kwargs is None:
+        return None
+
+    converters = set(pattern.pattern.converters) - set(kwargs)
+    if converters:
+        if name not in URL_OBJECTS:
+            raise KeyError(f'{name} の引数を URL_OBJECTS か URL_KWARGS に追加してください')
+        pk = URL_OBJECTS[name]().order_by('pk').values_list('pk', flat=True).first()
+        if pk is None:
+            return None
+        kwargs = {**kwargs, **{key: pk for key in converters}}
+    return kwargs
+
+
+def collect_urls(url_names=()):
+    """
+    main/urls.py のURLを、引数を埋めたパスにする
+
+    Args:
+        url_names (iterable): 対象のURL名（空の場合は全てのURL）
+
+    Returns:
+        tuple: ([(URL名, パス), ...], [対象のデータがないURL名, ...])
+    """
+    urls, missing = [], []
+    for pattern in main_urls.urlpatterns:
+        name = pattern.name
+        if not name or (url_names and name not in url_names):
+            continue
+        kwargs = _url_kwargs(pattern)
+        if kwargs is None:
+            missing.append(name)
+            continue
+        urls.append((name, reverse(name, kwargs=kwargs)))
+    return urls, missing
+
+
+def request_url(client, name, url):
+    """
+    URLを実行する（POST_REQUESTS のURLはPOST、それ以外はGET）
+
+    Args:
+        client: django.test.Client
+        name (str): URL名
+        url (str): パス
+
+    Returns:
+        HttpResponse: レスポンス
+    """
+    if name in POST_REQUESTS:
+        return client.post(url, **POST_REQUESTS[name]())
+    return client.get(url)
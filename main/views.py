@@ -1,21 +1,33 @@
 from django.shortcuts import render, get_object_or_404, redirect
-from django.http import HttpResponse, Http404, JsonResponse
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseBadRequest, Http404, JsonResponse, FileResponse
 from django.contrib import messages
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
-from django.db.models import Q, Count
-from django.urls import reverse_lazy
+from django.db.models import Q, Count, Max, Exists, OuterRef
+from django.urls import reverse, reverse_lazy
 from django.views.generic import DetailView, CreateView, UpdateView, DeleteView
 from django.views.decorators.http import require_http_methods
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
 from django.utils.decorators import method_decorator
 from django.utils import timezone
 from datetime import datetime, timedelta
-from .models import FamilyMember, FamilyPhoto, PhotoTag, PhotoAlbum, EventCategory, FamilyEvent
+from .models import FamilyMember, FamilyPhoto, PhotoFavorite, PhotoTag, PhotoAlbum, EventCategory, FamilyEvent
 from .forms import (
     FamilyMemberForm, FamilyPhotoForm, PhotoTagForm, PhotoAlbumForm,
     EventCategoryForm, FamilyEventForm, EventSearchForm
 )
 from .utils.helpers import get_role_emoji
+from .utils.cache import (
+    make_key, get_or_set, cache_public_page, add_cache_tags, object_tag,
+    make_etag, conditional_page, bump_versions
+)
+from .api import dumps
+from .bulk import apply_bulk_action, BulkEditError
+from .utils.pagination import cursor_values, decode_cursor, encode_cursor, keyset_filter
+from .utils.profiling import list_profiles, profile_path, profile_summary
+from .utils import metrics
+import json
 import logging
 
 # ロガーの設定
@@ -23,6 +35,7 @@ logger = logging.getLogger(__name__)
 
 # Create your views here.
 
+@cache_public_page('member', 'photo', 'album', 'tag', 'event', 'favorite')
 def home(request):
     """ホームページ"""
     try:
@@ -34,9 +47,9 @@ def home(request):
             is_public=True
         ).select_related('album').prefetch_related('tags', 'family_members')[:6]
         
-        # お気に入りの写真を取得
+        # 誰かがお気に入りにしている写真を取得
         favorite_photos = FamilyPhoto.objects.filter(
-            is_favorite=True,
+            favorite_count__gt=0,
             is_public=True
         ).select_related('album').prefetch_related('tags', 'family_members')[:3]
         
@@ -46,15 +59,19 @@ def home(request):
             start_date__gte=today
         ).select_related('category').prefetch_related('participants')[:5]
         
-        # 統計情報
-        stats = {
+        # 統計情報（モデルが変更されるまでキャッシュ）
+        stats_key = make_key(
+            'home_stats', today,
+            tags=['member', 'photo', 'album', 'tag', 'event'],
+        )
+        stats = get_or_set(stats_key, lambda: {
             'total_members': FamilyMember.get_active_members().count(),
             'total_photos': FamilyPhoto.objects.filter(is_public=True).count(),
             'total_albums': PhotoAlbum.objects.filter(is_public=True).count(),
             'total_tags': PhotoTag.objects.count(),
             'total_events': FamilyEvent.objects.count(),
             'upcoming_events': FamilyEvent.objects.filter(start_date__gte=today).count(),
-        }
+        })
         
         context = {
             'recent_members': recent_members,
@@ -76,6 +93,7 @@ def about(request):
     return render(request, 'main/about.html')
 
 
+@cache_public_page('member', 'photo')
 def family_list(request):
     """家族一覧ページ"""
     try:
@@ -115,6 +133,8 @@ def family_list(request):
         
         context = {
             'family_members': family_members,
+            # カードに表示する最新の写真（ページ分を1クエリで読み込む）
+            'recent_photos': FamilyPhoto.recent_by_member([member.pk for member in family_members]),
             'search_query': search_query,
             'role_filter': role_filter,
             'role_choices': role_choices,
@@ -129,6 +149,22 @@ def family_list(request):
         return render(request, 'main/family_list.html', {'family_members': []})
 
 
+def _family_detail_validators(request, pk):
+    """家族メンバー詳細の検証子（メンバーと写っている公開写真の更新日時・枚数）"""
+    # 最新ではない写真の削除は更新日時の最大値に現れないため、枚数も含める
+    row = FamilyMember.objects.filter(pk=pk, is_active=True).annotate(
+        photos_updated=Max('familyphoto__updated_at', filter=Q(familyphoto__is_public=True)),
+        public_count=Count('familyphoto', filter=Q(familyphoto__is_public=True)),
+    ).values_list('updated_at', 'photos_updated', 'public_count').first()
+    if row is None:
+        return None
+    
+    last_modified = max(value for value in row[:2] if value)
+    etag = make_etag(request, *row, tags=[object_tag('member', pk)])
+    return etag, last_modified
+
+
+@conditional_page(_family_detail_validators)
 def family_detail(request, pk):
     """家族メンバー詳細ページ"""
     try:
@@ -138,7 +174,7 @@ def family_detail(request, pk):
         member_photos = FamilyPhoto.objects.filter(
             family_members=member,
             is_public=True
-        ).select_related('album').prefetch_related('tags').order_by('-taken_date')[:10]
+        ).select_related('album').prefetch_related('tags').order_by('-taken_date', '-created_at')[:10]
         
         context = {
             'member': member,
@@ -160,68 +196,159 @@ def family_detail(request, pk):
 
 # ========== フォトギャラリー関連ビュー ==========
 
+def _with_favorited(photos, user):
+    """
+    ログイン中のユーザーがお気に入りにしているかどうか（is_favorited）を付与する
+    
+    サブクエリで判定するため、写真の件数に関係なくクエリは増えない。
+    """
+    if not user.is_authenticated:
+        return photos
+    return photos.annotate(is_favorited=Exists(
+        PhotoFavorite.objects.filter(user=user, photo=OuterRef('pk'))
+    ))
+
+
+# フォトギャラリー・アルバムの写真の並び順（無限スクロールのカーソルのキー）
+PHOTO_ORDERING = ('-taken_date', '-created_at', '-pk')
+# 1ページ（無限スクロールでは1回の読み込み）に表示する写真の数
+PHOTO_BATCH_SIZE = 12
+
+
+def _next_batch_url(request, url_name, photo, **kwargs):
+    """
+    写真の続きを読み込むURL（無限スクロール用）
+
+    Args:
+        request: 今のリクエスト（検索・フィルターの条件を引き継ぐ）
+        url_name (str): 続きを返すビューのURL名
+        photo: 最後に表示した写真
+        **kwargs: URLの引数
+    """
+    params = request.GET.copy()
+    params.pop('page', None)
+    params['cursor'] = encode_cursor(cursor_values(photo, PHOTO_ORDERING))
+    return f"{reverse(url_name, kwargs=kwargs)}?{params.urlencode()}"
+
+
+def _photo_batch(request, photos, item_template, url_name, **kwargs):
+    """
+    カーソルより後の写真1回分のHTML断片を返す（無限スクロール用）
+
+    続きがある場合は、次の断片のURLを X-Next-Url ヘッダーで返す。
+
+    Args:
+        photos: PHOTO_ORDERING で並べた写真のクエリセット
+        item_template (str): 写真1枚分のテンプレート
+        url_name (str): 続きを返すビューのURL名
+        **kwargs: URLの引数
+    """
+    cursor = request.GET.get('cursor')
+    if cursor:
+        try:
+            values = decode_cursor(FamilyPhoto, PHOTO_ORDERING, cursor)
+        except ValueError:
+            return HttpResponseBadRequest('cursor が不正です')
+        photos = photos.filter(keyset_filter(PHOTO_ORDERING, values))
+
+    # 続きがあるかどうかを知るため1件多く読み込む
+    photos = list(photos[:PHOTO_BATCH_SIZE + 1])
+    context = {
+        'photos': photos[:PHOTO_BATCH_SIZE],
+        'item_template': item_template,
+        'lazy': True,
+    }
+    response = render(request, 'main/components/photo_batch.html', context)
+    if len(photos) > PHOTO_BATCH_SIZE:
+        response['X-Next-Url'] = _next_batch_url(
+            request, url_name, photos[PHOTO_BATCH_SIZE - 1], **kwargs
+        )
+    return response
+
+
+def _gallery_queryset(request):
+    """
+    フォトギャラリーの写真のクエリセットと、適用したフィルターを返す
+    
+    Returns:
+        tuple: (クエリセット, 検索語, フィルターの辞書)
+    """
+    # 基本のクエリセット
+    photos = _with_favorited(FamilyPhoto.objects.filter(is_public=True).select_related(
+        'album'
+    ).prefetch_related('tags', 'family_members').order_by(*PHOTO_ORDERING), request.user)
+    
+    # フィルタリング
+    search_query = request.GET.get('search', '')
+    tag_filter = request.GET.get('tag', '')
+    member_filter = request.GET.get('member', '')
+    album_filter = request.GET.get('album', '')
+    year_filter = request.GET.get('year', '')
+    favorite_only = request.GET.get('favorite', '')
+    
+    if search_query:
+        photos = photos.filter(
+            Q(title__icontains=search_query) |
+            Q(description__icontains=search_query) |
+            Q(location__icontains=search_query)
+        )
+    
+    if tag_filter:
+        photos = photos.filter(tags__id=tag_filter)
+    
+    if member_filter:
+        photos = photos.filter(family_members__id=member_filter)
+    
+    if album_filter:
+        photos = photos.filter(album__id=album_filter)
+    
+    if year_filter:
+        photos = photos.filter(taken_date__year=year_filter)
+    
+    if favorite_only:
+        # ログイン中は自分のお気に入り、それ以外は誰かがお気に入りにしている写真
+        if request.user.is_authenticated:
+            photos = photos.filter(is_favorited=True)
+        else:
+            photos = photos.filter(favorite_count__gt=0)
+    
+    current_filters = {
+        'tag': tag_filter,
+        'member': member_filter,
+        'album': album_filter,
+        'year': year_filter,
+        'favorite': favorite_only,
+    }
+    return photos, search_query, current_filters
+
+
+def _gallery_filter_data():
+    """フィルター用のデータ（クエリセット）"""
+    return {
+        'tags': PhotoTag.objects.all().order_by('name'),
+        'members': FamilyMember.get_active_members().order_by('name'),
+        'albums': PhotoAlbum.objects.filter(is_public=True).order_by('title'),
+        'years': FamilyPhoto.objects.filter(is_public=True).dates('taken_date', 'year', order='DESC'),
+    }
+
+
+@cache_public_page('photo', 'tag', 'member', 'album', 'favorite')
 def photo_gallery(request):
     """フォトギャラリー一覧ページ"""
     try:
-        # 基本のクエリセット
-        photos = FamilyPhoto.objects.filter(is_public=True).select_related(
-            'album'
-        ).prefetch_related('tags', 'family_members').order_by('-taken_date')
-        
-        # フィルタリング
-        search_query = request.GET.get('search', '')
-        tag_filter = request.GET.get('tag', '')
-        member_filter = request.GET.get('member', '')
-        album_filter = request.GET.get('album', '')
-        year_filter = request.GET.get('year', '')
-        favorite_only = request.GET.get('favorite', '')
-        
-        if search_query:
-            photos = photos.filter(
-                Q(title__icontains=search_query) |
-                Q(description__icontains=search_query) |
-                Q(location__icontains=search_query)
-            )
-        
-        if tag_filter:
-            photos = photos.filter(tags__id=tag_filter)
-        
-        if member_filter:
-            photos = photos.filter(family_members__id=member_filter)
-        
-        if album_filter:
-            photos = photos.filter(album__id=album_filter)
-        
-        if year_filter:
-            photos = photos.filter(taken_date__year=year_filter)
-        
-        if favorite_only:
-            photos = photos.filter(is_favorite=True)
+        photos, search_query, current_filters = _gallery_queryset(request)
         
-        # ページネーション
-        paginator = Paginator(photos, 12)  # 1ページに12枚
+        # ページネーション（JavaScriptが無効な場合用。有効な場合は無限スクロールで続きを読み込む）
+        paginator = Paginator(photos, PHOTO_BATCH_SIZE)
         page_number = request.GET.get('page')
         page_obj = paginator.get_page(page_number)
         
-        # フィルター用のデータ
-        filter_data = {
-            'tags': PhotoTag.objects.all().order_by('name'),
-            'members': FamilyMember.get_active_members().order_by('name'),
-            'albums': PhotoAlbum.objects.filter(is_public=True).order_by('title'),
-            'years': FamilyPhoto.objects.filter(is_public=True).dates('taken_date', 'year', order='DESC'),
-        }
-        
         context = {
             'page_obj': page_obj,
-            'filter_data': filter_data,
+            'filter_data': _gallery_filter_data(),
             'search_query': search_query,
-            'current_filters': {
-                'tag': tag_filter,
-                'member': member_filter,
-                'album': album_filter,
-                'year': year_filter,
-                'favorite': favorite_only,
-            }
+            'current_filters': current_filters,
+            'next_batch_url': _gallery_next_batch_url(request, page_obj),
         }
         
         return render(request, 'main/photo_gallery.html', context)
@@ -232,25 +359,76 @@ def photo_gallery(request):
         return render(request, 'main/photo_gallery.html', {'page_obj': None})
 
 
+def _gallery_next_batch_url(request, page_obj):
+    """表示中のページの続きを読み込むURL（最後のページならNone）"""
+    if not page_obj.has_next():
+        return None
+    return _next_batch_url(request, 'photo_gallery_more', page_obj[-1])
+
+
+@cache_public_page('photo', 'tag', 'member', 'album', 'favorite')
+def photo_gallery_more(request):
+    """フォトギャラリーの続き（無限スクロールで読み込むHTML断片）"""
+    photos, _, _ = _gallery_queryset(request)
+    return _photo_batch(
+        request, photos, 'main/components/gallery_photo_item.html', 'photo_gallery_more'
+    )
+
+
+def _photo_detail_validators(request, pk):
+    """写真詳細の検証子（写真とアルバムの更新日時）"""
+    row = FamilyPhoto.objects.filter(pk=pk, is_public=True).values_list(
+        'updated_at', 'album_id', 'album__updated_at'
+    ).first()
+    if row is None:
+        return None
+    
+    updated_at, album_id, album_updated_at = row
+    last_modified = max(value for value in (updated_at, album_updated_at) if value)
+    # タグ・メンバーの付け替えや関連写真の変更はタグのバージョンで検知する
+    tags = [object_tag('photo', pk), 'tag', 'member']
+    if album_id:
+        tags.append(object_tag('album', album_id))
+    etag = make_etag(request, *row, tags=tags)
+    return etag, last_modified
+
+
+def _photo_detail_queryset(user):
+    return _with_favorited(FamilyPhoto.objects.filter(is_public=True).select_related(
+        'album'
+    ).prefetch_related('tags', 'family_members'), user)
+
+
+def _related_photos(photo):
+    """関連写真（同じアルバムまたは同じタグの写真）"""
+    return FamilyPhoto.objects.filter(
+        Q(album=photo.album) | Q(tags__in=photo.tags.all()),
+        is_public=True
+    ).exclude(id=photo.id).distinct().select_related('album')[:6]
+
+
+def _photo_cache_tags(photo):
+    """写真詳細ページが依存するアルバム・タグ・メンバーのタグ名"""
+    return [
+        object_tag('album', photo.album_id) if photo.album_id else None,
+        *[object_tag('tag', tag.pk) for tag in photo.tags.all()],
+        *[object_tag('member', member.pk) for member in photo.family_members.all()],
+    ]
+
+
+@conditional_page(_photo_detail_validators)
+@cache_public_page('photo:{pk}')
 def photo_detail(request, pk):
     """写真詳細ページ"""
     try:
-        photo = get_object_or_404(
-            FamilyPhoto.objects.filter(is_public=True).select_related(
-                'album'
-            ).prefetch_related('tags', 'family_members'),
-            pk=pk
-        )
+        photo = get_object_or_404(_photo_detail_queryset(request.user), pk=pk)
         
-        # 関連写真（同じアルバムまたは同じタグの写真）
-        related_photos = FamilyPhoto.objects.filter(
-            Q(album=photo.album) | Q(tags__in=photo.tags.all()),
-            is_public=True
-        ).exclude(id=photo.id).distinct().select_related('album')[:6]
+        # アルバム・タグ・メンバーの変更でこのページのキャッシュを無効化する
+        add_cache_tags(request, *_photo_cache_tags(photo))
         
         context = {
             'photo': photo,
-            'related_photos': related_photos,
+            'related_photos': _related_photos(photo),
         }
         
         return render(request, 'main/photo_detail.html', context)
@@ -267,12 +445,14 @@ def photo_detail(request, pk):
 
 # ========== アルバム関連ビュー ==========
 
+@cache_public_page('album')
 def album_list(request):
     """アルバム一覧ページ"""
     try:
-        albums = PhotoAlbum.objects.filter(is_public=True).annotate(
-            photo_count=Count('photos')
-        ).select_related('created_by').order_by('-created_at')
+        # 枚数とカバーは写真の変更時に計算済みのため、アルバムの読み込みだけの1クエリで済む
+        albums = PhotoAlbum.objects.filter(is_public=True).select_related(
+            'created_by'
+        ).order_by('-created_at')
         
         # 検索機能
         search_query = request.GET.get('search', '')
@@ -295,6 +475,28 @@ def album_list(request):
         return render(request, 'main/album_list.html', {'albums': []})
 
 
+def _album_detail_validators(request, pk):
+    """アルバム詳細の検証子（アルバムと公開写真の更新日時・枚数）"""
+    row = PhotoAlbum.objects.filter(pk=pk, is_public=True).annotate(
+        photos_updated=Max('photos__updated_at', filter=Q(photos__is_public=True)),
+        public_count=Count('photos', filter=Q(photos__is_public=True)),
+    ).values_list('updated_at', 'photos_updated', 'public_count').first()
+    if row is None:
+        return None
+    
+    last_modified = max(value for value in row[:2] if value)
+    etag = make_etag(request, *row, tags=[object_tag('album', pk), 'tag', 'member', 'favorite'])
+    return etag, last_modified
+
+
+def _album_photos(album_id):
+    """アルバム内の公開写真"""
+    return FamilyPhoto.objects.filter(album_id=album_id, is_public=True).select_related(
+        'album'
+    ).prefetch_related('tags', 'family_members').order_by(*PHOTO_ORDERING)
+
+
+@conditional_page(_album_detail_validators)
 def album_detail(request, pk):
     """アルバム詳細ページ"""
     try:
@@ -304,12 +506,10 @@ def album_detail(request, pk):
         )
         
         # アルバム内の写真を取得
-        photos = album.photos.filter(is_public=True).select_related(
-            'album'
-        ).prefetch_related('tags', 'family_members').order_by('-taken_date')
+        photos = _album_photos(album.pk)
         
-        # ページネーション
-        paginator = Paginator(photos, 12)
+        # ページネーション（JavaScriptが無効な場合用。有効な場合は無限スクロールで続きを読み込む）
+        paginator = Paginator(photos, PHOTO_BATCH_SIZE)
         page_number = request.GET.get('page')
         page_obj = paginator.get_page(page_number)
         
@@ -317,6 +517,13 @@ def album_detail(request, pk):
             'album': album,
             'page_obj': page_obj,
         }
+        if page_obj.paginator.count >= settings.VIRTUAL_GRID_MIN_PHOTOS:
+            # 写真の多いアルバムは、表示中の行だけをDOMに置く仮想スクロールのグリッドにする
+            context['manifest_url'] = reverse('album_manifest', kwargs={'pk': album.pk})
+        elif page_obj.has_next():
+            context['next_batch_url'] = _next_batch_url(
+                request, 'album_photos_more', page_obj[-1], pk=album.pk
+            )
         
         return render(request, 'main/album_detail.html', context)
     
@@ -330,19 +537,69 @@ def album_detail(request, pk):
         return redirect('album_list')
 
 
+@conditional_page(_album_detail_validators)
+def album_photos_more(request, pk):
+    """アルバムの写真の続き（無限スクロールで読み込むHTML断片）"""
+    if not PhotoAlbum.objects.filter(pk=pk, is_public=True).exists():
+        raise Http404
+    return _photo_batch(
+        request, _album_photos(pk), 'main/components/album_photo_item.html',
+        'album_photos_more', pk=pk
+    )
+
+
+@conditional_page(_album_detail_validators)
+def album_manifest(request, pk):
+    """
+    アルバムの全ての写真の配置情報（仮想スクロールのグリッド用のJSON）
+
+    写真ごとに [ID, 縦横比, サムネイルのパス, タイトル] だけを1クエリで読み込んで返す。
+    サムネイルのパスは media_url からの相対パスで、サイズが分からない写真の縦横比は null。
+    """
+    if not PhotoAlbum.objects.filter(pk=pk, is_public=True).exists():
+        raise Http404
+    
+    rows = FamilyPhoto.objects.filter(album_id=pk, is_public=True).order_by(
+        *PHOTO_ORDERING
+    ).values_list('pk', 'width', 'height', 'thumbnail', 'image', 'title')
+    photos = [
+        [photo_id, round(width / height, 3) if width and height else None, thumbnail or image, title]
+        for photo_id, width, height, thumbnail, image, title in rows
+    ]
+    data = {
+        'count': len(photos),
+        'media_url': settings.MEDIA_URL,
+        # 写真詳細のURL（{id} を写真のIDに置き換える）
+        'photo_url': reverse('photo_detail', kwargs={'pk': 0}).replace('/0/', '/{id}/'),
+        'photos': photos,
+    }
+    return HttpResponse(dumps(data), content_type='application/json')
+
+
 @login_required
 @require_http_methods(["POST"])
 def toggle_favorite(request, photo_id):
-    """写真のお気に入り状態を切り替える（Ajax用）"""
+    """ログイン中のユーザーのお気に入りを切り替える（Ajax用）"""
+    if not FamilyPhoto.objects.filter(id=photo_id).exists():
+        return JsonResponse({
+            'success': False,
+            'message': '指定された写真が見つかりません'
+        }, status=404)
+    
     try:
-        photo = get_object_or_404(FamilyPhoto, id=photo_id)
-        photo.is_favorite = not photo.is_favorite
-        photo.save()
+        is_favorite, favorite_count = PhotoFavorite.toggle(request.user, photo_id)
+        # お気に入り数を表示する写真詳細ページのキャッシュ・ETagを更新する
+        tags = [object_tag('photo', photo_id)]
+        if favorite_count == int(is_favorite):
+            # 0件⇔1件の変化で「お気に入りの写真」の一覧（ホーム・ギャラリー・アルバム）が変わる
+            tags.append('favorite')
+        bump_versions(*tags)
         
         return JsonResponse({
             'success': True,
-            'is_favorite': photo.is_favorite,
-            'message': 'お気に入りに追加しました' if photo.is_favorite else 'お気に入りから削除しました'
+            'is_favorite': is_favorite,
+            'favorite_count': favorite_count,
+            'message': 'お気に入りに追加しました' if is_favorite else 'お気に入りから削除しました'
         })
     except Exception as e:
         return JsonResponse({
@@ -351,96 +608,180 @@ def toggle_favorite(request, photo_id):
         })
 
 
+@login_required
+@require_http_methods(["POST"])
+def bulk_edit_photos_api(request):
+    """
+    写真のタグ・家族メンバー・アルバムを一括で変更する（JSON API、スタッフのみ）
+    
+    リクエスト例:
+        {"action": "add_tags", "photo_ids": [1, 2, 3], "target_ids": [5]}
+        {"action": "set_album", "photo_ids": [1, 2, 3], "album_id": 4}
+    """
+    if not request.user.is_staff:
+        return JsonResponse({
+            'success': False,
+            'message': 'この操作を行う権限がありません'
+        }, status=403)
+    
+    try:
+        data = json.loads(request.body)
+        action = data['action']
+        photo_ids = [int(pk) for pk in data['photo_ids']]
+        target_ids = [int(pk) for pk in data.get('target_ids', [])]
+        album_id = data.get('album_id')
+        album_id = int(album_id) if album_id is not None else None
+    except (ValueError, TypeError, KeyError) as e:
+        return JsonResponse({
+            'success': False,
+            'message': f'リクエストが不正です: {str(e)}'
+        }, status=400)
+    
+    try:
+        changed = apply_bulk_action(action, photo_ids, target_ids=target_ids, album_id=album_id)
+    except BulkEditError as e:
+        return JsonResponse({
+            'success': False,
+            'message': str(e)
+        }, status=400)
+    
+    logger.info('写真の一括編集: user=%s action=%s photos=%d changed=%d',
+                request.user.username, action, len(photo_ids), changed)
+    return JsonResponse({
+        'success': True,
+        'action': action,
+        'photo_count': len(photo_ids),
+        'changed': changed,
+    })
+
+
 # ========================================
 # イベント管理ビュー
 # ========================================
 
+def _calendar_events(search_form):
+    """
+    検索条件を適用したイベントのクエリセットを返す
+    
+    フォームの検証（選択肢の確認）でクエリを実行する。
+    """
+    # イベント一覧のクエリ
+    events = FamilyEvent.objects.select_related(
+        'category', 'created_by'
+    ).prefetch_related('participants')
+    
+    # 検索・フィルタリング
+    if search_form and search_form.is_valid():
+        search = search_form.cleaned_data.get('search')
+        category = search_form.cleaned_data.get('category')
+        participants = search_form.cleaned_data.get('participants')
+        priority = search_form.cleaned_data.get('priority')
+        date_from = search_form.cleaned_data.get('date_from')
+        date_to = search_form.cleaned_data.get('date_to')
+        upcoming_only = search_form.cleaned_data.get('upcoming_only')
+        
+        if search:
+            events = events.filter(
+                Q(title__icontains=search) | 
+                Q(description__icontains=search) |
+                Q(location__icontains=search)
+            )
+        
+        if category:
+            events = events.filter(category=category)
+        
+        if participants:
+            events = events.filter(participants=participants)
+        
+        if priority:
+            events = events.filter(priority=priority)
+        
+        if date_from:
+            events = events.filter(start_date__gte=date_from)
+        
+        if date_to:
+            events = events.filter(start_date__lte=date_to)
+        
+        if upcoming_only:
+            today = timezone.now().date()
+            events = events.filter(start_date__gte=today)
+    else:
+        # デフォルトで今後のイベントを表示
+        today = timezone.now().date()
+        events = events.filter(start_date__gte=today)
+    
+    # 並び替え
+    return events.order_by('start_date', 'start_time', 'title')
+
+
+def _week_events(events, today):
+    """
+    今日と今週（今日を除く）のイベントのクエリセットを返す
+    
+    Returns:
+        tuple: (今日のイベント, 今週のイベント)
+    """
+    this_week_start = today - timedelta(days=today.weekday())
+    this_week_end = this_week_start + timedelta(days=6)
+    
+    today_events = events.filter(start_date=today)
+    this_week_events = events.filter(
+        start_date__range=[this_week_start, this_week_end]
+    ).exclude(start_date=today)
+    return today_events, this_week_events
+
+
+def _events_page(events, page):
+    """イベントのページ（範囲外のページ番号は先頭・末尾に丸める）"""
+    paginator = Paginator(events, 10)  # 1ページあたり10イベント
+    try:
+        return paginator.page(page)
+    except PageNotAnInteger:
+        return paginator.page(1)
+    except EmptyPage:
+        return paginator.page(paginator.num_pages)
+
+
+def _category_stats():
+    """カテゴリ統計"""
+    return EventCategory.objects.annotate(
+        event_count=Count('familyevent')
+    ).order_by('-event_count')
+
+
+def _event_calendar_error(e):
+    """エラーが発生した場合のシンプルなエラーページ"""
+    from django.http import HttpResponse
+    return HttpResponse(f"""
+    <html>
+    <head><title>エラー - イベントカレンダー</title></head>
+    <body style="font-family: Arial, sans-serif; padding: 2rem;">
+        <h1>⚠️ エラーが発生しました</h1>
+        <p>イベントカレンダーの読み込み中にエラーが発生しました。</p>
+        <p><strong>エラー詳細:</strong> {str(e)}</p>
+        <a href="/" style="background: #3498db; color: white; padding: 0.5rem 1rem; text-decoration: none; border-radius: 4px;">🏠 ホームに戻る</a>
+    </body>
+    </html>
+    """)
+
+
 def event_calendar(request):
     """イベントカレンダー"""
     try:
         # 検索フォーム
         search_form = EventSearchForm(request.GET or None)
-        
-        # イベント一覧のクエリ
-        events = FamilyEvent.objects.select_related(
-            'category', 'created_by'
-        ).prefetch_related('participants')
-        
-        # 検索・フィルタリング
-        if search_form and search_form.is_valid():
-            search = search_form.cleaned_data.get('search')
-            category = search_form.cleaned_data.get('category')
-            participants = search_form.cleaned_data.get('participants')
-            priority = search_form.cleaned_data.get('priority')
-            date_from = search_form.cleaned_data.get('date_from')
-            date_to = search_form.cleaned_data.get('date_to')
-            upcoming_only = search_form.cleaned_data.get('upcoming_only')
-            
-            if search:
-                events = events.filter(
-                    Q(title__icontains=search) | 
-                    Q(description__icontains=search) |
-                    Q(location__icontains=search)
-                )
-            
-            if category:
-                events = events.filter(category=category)
-            
-            if participants:
-                events = events.filter(participants=participants)
-            
-            if priority:
-                events = events.filter(priority=priority)
-            
-            if date_from:
-                events = events.filter(start_date__gte=date_from)
-            
-            if date_to:
-                events = events.filter(start_date__lte=date_to)
-            
-            if upcoming_only:
-                today = timezone.now().date()
-                events = events.filter(start_date__gte=today)
-        else:
-            # デフォルトで今後のイベントを表示
-            today = timezone.now().date()
-            events = events.filter(start_date__gte=today)
-        
-        # 並び替え
-        events = events.order_by('start_date', 'start_time', 'title')
+        events = _calendar_events(search_form)
         
         # 今日と今週のイベント
         today = timezone.now().date()
-        this_week_start = today - timedelta(days=today.weekday())
-        this_week_end = this_week_start + timedelta(days=6)
-        
-        today_events = events.filter(start_date=today)
-        this_week_events = events.filter(
-            start_date__range=[this_week_start, this_week_end]
-        ).exclude(start_date=today)
-        
-        # ページネーション
-        paginator = Paginator(events, 10)  # 1ページあたり10イベント
-        page = request.GET.get('page')
-        
-        try:
-            events_page = paginator.page(page)
-        except PageNotAnInteger:
-            events_page = paginator.page(1)
-        except EmptyPage:
-            events_page = paginator.page(paginator.num_pages)
-        
-        # カテゴリ統計
-        category_stats = EventCategory.objects.annotate(
-            event_count=Count('familyevent')
-        ).order_by('-event_count')
+        today_events, this_week_events = _week_events(events, today)
         
         context = {
             'search_form': search_form,
-            'events': events_page,
+            'events': _events_page(events, request.GET.get('page')),
             'today_events': today_events,
             'this_week_events': this_week_events,
-            'category_stats': category_stats,
+            'category_stats': _category_stats(),
             'today': today,
         }
         
@@ -448,21 +789,22 @@ def event_calendar(request):
         
     except Exception as e:
         logger.error(f"イベントカレンダーでエラー: {str(e)}")
-        # エラーが発生した場合はシンプルなエラーページを表示
-        from django.http import HttpResponse
-        return HttpResponse(f"""
-        <html>
-        <head><title>エラー - イベントカレンダー</title></head>
-        <body style="font-family: Arial, sans-serif; padding: 2rem;">
-            <h1>⚠️ エラーが発生しました</h1>
-            <p>イベントカレンダーの読み込み中にエラーが発生しました。</p>
-            <p><strong>エラー詳細:</strong> {str(e)}</p>
-            <a href="/" style="background: #3498db; color: white; padding: 0.5rem 1rem; text-decoration: none; border-radius: 4px;">🏠 ホームに戻る</a>
-        </body>
-        </html>
-        """)
+        return _event_calendar_error(e)
+
+
+def _event_detail_validators(request, event_id):
+    """イベント詳細の検証子（イベントとカテゴリの更新日時）"""
+    row = FamilyEvent.objects.filter(id=event_id).values_list('updated_at').first()
+    if row is None:
+        return None
+    
+    # 関連イベント・カテゴリ・参加者の変更はタグのバージョンで検知する
+    tags = [object_tag('event', event_id), 'event', 'category', 'member']
+    etag = make_etag(request, row[0], tags=tags)
+    return etag, row[0]
 
 
+@conditional_page(_event_detail_validators)
 def event_detail(request, event_id):
     """イベント詳細"""
     try:
@@ -574,33 +916,39 @@ class CategoryCreateView(CreateView):
         return super().form_valid(form)
 
 
+def _upcoming_events(days):
+    """今日から指定日数後までのイベントのクエリセット"""
+    today = timezone.now().date()
+    end_date = today + timedelta(days=days)
+    
+    return FamilyEvent.objects.filter(
+        start_date__range=[today, end_date]
+    ).select_related('category').prefetch_related('participants')
+
+
+def _event_data(event):
+    """API用のイベントの辞書"""
+    return {
+        'id': event.id,
+        'title': event.title,
+        'start_date': event.start_date.isoformat(),
+        'start_time': event.start_time.strftime('%H:%M') if event.start_time else None,
+        'category': {
+            'name': event.category.name if event.category else '',
+            'emoji': event.category.emoji if event.category else '📅',
+            'color': event.category.color if event.category else '#3498db',
+        },
+        'participants': [p.name for p in event.participants.all()],
+        'priority': event.get_priority_emoji(),
+        'is_today': event.is_today(),
+    }
+
+
 def upcoming_events_api(request):
     """今後のイベントAPI（Ajax用）"""
     try:
         days = int(request.GET.get('days', 7))  # デフォルト7日間
-        today = timezone.now().date()
-        end_date = today + timedelta(days=days)
-        
-        events = FamilyEvent.objects.filter(
-            start_date__range=[today, end_date]
-        ).select_related('category').prefetch_related('participants')
-        
-        events_data = []
-        for event in events:
-            events_data.append({
-                'id': event.id,
-                'title': event.title,
-                'start_date': event.start_date.isoformat(),
-                'start_time': event.start_time.strftime('%H:%M') if event.start_time else None,
-                'category': {
-                    'name': event.category.name if event.category else '',
-                    'emoji': event.category.emoji if event.category else '📅',
-                    'color': event.category.color if event.category else '#3498db',
-                },
-                'participants': [p.name for p in event.participants.all()],
-                'priority': event.get_priority_emoji(),
-                'is_today': event.is_today(),
-            })
+        events_data = [_event_data(event) for event in _upcoming_events(days)]
         
         return JsonResponse({
             'success': True,
@@ -613,3 +961,68 @@ def upcoming_events_api(request):
             'success': False,
             'message': f'エラーが発生しました: {str(e)}'
         })
+
+
+# ========================================
+# プロファイリング（スタッフのみ）
+# ========================================
+
+PROFILE_SORT_CHOICES = [
+    ('cumulative', '累積時間'),
+    ('tottime', '関数内の時間'),
+    ('calls', '呼び出し回数'),
+]
+
+
+@staff_member_required
+def profile_list(request):
+    """保存済みのプロファイル一覧と集計結果"""
+    profiles = list_profiles()
+    for profile in profiles:
+        profile['modified_at'] = datetime.fromtimestamp(profile['modified'], tz=timezone.get_current_timezone())
+    
+    selected = request.GET.get('name')
+    sort = request.GET.get('sort', 'cumulative')
+    if sort not in dict(PROFILE_SORT_CHOICES):
+        sort = 'cumulative'
+    
+    summary = None
+    if selected:
+        path = profile_path(selected)
+        if path is None:
+            raise Http404('プロファイルが見つかりません')
+        summary = profile_summary(path, sort=sort)
+    
+    context = {
+        'profiles': profiles,
+        'selected': selected,
+        'summary': summary,
+        'sort': sort,
+        'sort_choices': PROFILE_SORT_CHOICES,
+    }
+    return render(request, 'main/profile_list.html', context)
+
+
+@staff_member_required
+def profile_download(request, name):
+    """プロファイル（.prof）をダウンロードする"""
+    path = profile_path(name)
+    if path is None:
+        raise Http404('プロファイルが見つかりません')
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=name)
+
+
+# ========================================
+# メトリクス（Prometheus）
+# ========================================
+
+def metrics_view(request):
+    """Prometheus形式のメトリクス（スタッフ、または METRICS_ALLOWED_IPS からのみ）"""
+    allowed_ips = getattr(settings, 'METRICS_ALLOWED_IPS', ['127.0.0.1', '::1'])
+    if request.META.get('REMOTE_ADDR') not in allowed_ips and not request.user.is_staff:
+        raise Http404()
+    
+    return HttpResponse(
+        metrics.render(),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
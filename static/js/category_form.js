@@ -0,0 +1,18 @@
+document.addEventListener('DOMContentLoaded', function() {
+    const colorInput = document.getElementById('id_color');
+    const colorPreview = document.getElementById('color-preview');
+
+    // 色プレビューを更新する関数
+    function updateColorPreview() {
+        if (colorInput.value) {
+            colorPreview.style.backgroundColor = colorInput.value;
+        }
+    }
+
+    // 初期値設定
+    updateColorPreview();
+
+    // 色が変更されたときにプレビューを更新
+    colorInput.addEventListener('input', updateColorPreview);
+    colorInput.addEventListener('change', updateColorPreview);
+});
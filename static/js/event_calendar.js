@@ -0,0 +1,27 @@
+document.addEventListener('DOMContentLoaded', function() {
+    // 今後のイベントAPI呼び出し（サンプル）
+    function loadUpcomingEvents() {
+        fetch('/api/upcoming-events/?days=7')
+            .then(response => response.json())
+            .then(data => {
+                if (data.success) {
+                    console.log(`今後7日間のイベント: ${data.count}件`);
+                }
+            })
+            .catch(error => console.error('Error:', error));
+    }
+
+    // 初回読み込み時に実行
+    loadUpcomingEvents();
+
+    // イベントが変更された時だけ再取得する（ライブ更新、static/js/live_updates.js）
+    let reloadTimer = null;
+    document.addEventListener('family:change', function(e) {
+        if (e.detail.type !== 'event') {
+            return;
+        }
+        // 連続した変更はまとめて1回にする
+        clearTimeout(reloadTimer);
+        reloadTimer = setTimeout(loadUpcomingEvents, 500);
+    });
+});
@@ -0,0 +1,12 @@
+document.addEventListener('DOMContentLoaded', function() {
+    // 削除ボタンに確認処理を追加
+    const deleteForm = document.querySelector('form');
+    if (deleteForm) {
+        deleteForm.addEventListener('submit', function(e) {
+            const confirmed = confirm('本当にこのイベントを削除しますか？この操作は取り消すことができません。');
+            if (!confirmed) {
+                e.preventDefault();
+            }
+        });
+    }
+});
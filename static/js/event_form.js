@@ -0,0 +1,48 @@
+document.addEventListener('DOMContentLoaded', function() {
+    const allDayCheckbox = document.getElementById('id_is_all_day');
+    const startTimeGroup = document.getElementById('start-time-group');
+    const endTimeGroup = document.getElementById('end-time-group');
+    const repeatSelect = document.getElementById('id_repeat');
+    const repeatUntilGroup = document.getElementById('repeat-until-group');
+    const reminderCheckbox = document.getElementById('id_is_reminder_enabled');
+    const reminderMinutesGroup = document.getElementById('reminder-minutes-group');
+
+    // 終日設定の切り替え
+    function toggleTimeFields() {
+        if (allDayCheckbox.checked) {
+            startTimeGroup.style.display = 'none';
+            endTimeGroup.style.display = 'none';
+        } else {
+            startTimeGroup.style.display = 'block';
+            endTimeGroup.style.display = 'block';
+        }
+    }
+
+    // 繰り返し設定の切り替え
+    function toggleRepeatUntil() {
+        if (repeatSelect.value === 'none') {
+            repeatUntilGroup.style.display = 'none';
+        } else {
+            repeatUntilGroup.style.display = 'block';
+        }
+    }
+
+    // リマインダー設定の切り替え
+    function toggleReminder() {
+        if (reminderCheckbox.checked) {
+            reminderMinutesGroup.style.display = 'block';
+        } else {
+            reminderMinutesGroup.style.display = 'none';
+        }
+    }
+
+    // イベントリスナー設定
+    allDayCheckbox.addEventListener('change', toggleTimeFields);
+    repeatSelect.addEventListener('change', toggleRepeatUntil);
+    reminderCheckbox.addEventListener('change', toggleReminder);
+
+    // 初期状態設定
+    toggleTimeFields();
+    toggleRepeatUntil();
+    toggleReminder();
+});
@@ -0,0 +1,126 @@
+// 無限スクロール
+// .infinite-scroll の data-next-url から続きのHTML断片を読み込み、data-target の要素に追加する。
+// 続きの断片のURLはレスポンスの X-Next-Url ヘッダーで返される（最後ならヘッダーなし）。
+// 末尾が画面の2つ分手前に来たら次の断片を先読みし、1/2つ分手前に来たら追加する。
+// IntersectionObserver が使えない場合は、ページネーションのリンクをそのまま使う。
+(function() {
+    if (!window.IntersectionObserver || !window.fetch) {
+        return;
+    }
+
+    const PREFETCH_MARGIN = '200% 0px';
+    const APPEND_MARGIN = '50% 0px';
+
+    function fetchBatch(url) {
+        return fetch(url, {
+            credentials: 'same-origin',
+            headers: {'X-Requested-With': 'XMLHttpRequest'},
+        }).then(response => {
+            if (!response.ok) {
+                throw new Error(`HTTP ${response.status}`);
+            }
+            return response.text().then(html => ({
+                html: html,
+                nextUrl: response.headers.get('X-Next-Url'),
+            }));
+        });
+    }
+
+    function setup(sentinel) {
+        const target = document.querySelector(sentinel.dataset.target);
+        if (!target) {
+            return;
+        }
+
+        const pagination = sentinel.parentElement.querySelector('.pagination-nav');
+        let nextUrl = sentinel.dataset.nextUrl;
+        let pending = null;
+        let appending = false;
+
+        sentinel.hidden = false;
+        if (pagination) {
+            pagination.hidden = true;
+        }
+
+        function prefetch() {
+            if (nextUrl && !pending) {
+                pending = fetchBatch(nextUrl);
+                // 失敗は追加する時に扱う
+                pending.catch(() => {});
+            }
+            return pending;
+        }
+
+        function finish() {
+            prefetchObserver.disconnect();
+            appendObserver.disconnect();
+            sentinel.remove();
+        }
+
+        function fail(error) {
+            console.error('続きの写真を読み込めませんでした:', error);
+            prefetchObserver.disconnect();
+            appendObserver.disconnect();
+            sentinel.classList.remove('loading');
+            sentinel.querySelector('.infinite-scroll-status').textContent = '続きを読み込めませんでした';
+            if (pagination) {
+                pagination.hidden = false;
+            }
+        }
+
+        // 末尾が見え続けている場合にも通知されるよう、監視をやり直す
+        function observeAgain() {
+            prefetchObserver.unobserve(sentinel);
+            appendObserver.unobserve(sentinel);
+            prefetchObserver.observe(sentinel);
+            appendObserver.observe(sentinel);
+        }
+
+        function append() {
+            if (appending || !nextUrl) {
+                return;
+            }
+            appending = true;
+            sentinel.classList.add('loading');
+
+            prefetch().then(batch => {
+                target.insertAdjacentHTML('beforeend', batch.html);
+                nextUrl = batch.nextUrl;
+                pending = null;
+                appending = false;
+                sentinel.classList.remove('loading');
+
+                if (nextUrl) {
+                    observeAgain();
+                } else {
+                    finish();
+                }
+            }).catch(fail);
+        }
+
+        const prefetchObserver = new IntersectionObserver(entries => {
+            if (entries.some(entry => entry.isIntersecting)) {
+                prefetch();
+            }
+        }, {rootMargin: PREFETCH_MARGIN});
+
+        const appendObserver = new IntersectionObserver(entries => {
+            if (entries.some(entry => entry.isIntersecting)) {
+                append();
+            }
+        }, {rootMargin: APPEND_MARGIN});
+
+        prefetchObserver.observe(sentinel);
+        appendObserver.observe(sentinel);
+    }
+
+    function init() {
+        document.querySelectorAll('.infinite-scroll[data-next-url]').forEach(setup);
+    }
+
+    if (document.readyState === 'loading') {
+        document.addEventListener('DOMContentLoaded', init);
+    } else {
+        init();
+    }
+})();
@@ -0,0 +1,64 @@
+// ライブ更新（Server-Sent Events）
+// 写真・アルバム・イベントの変更を受け取り、document に family:change イベントとして通知する。
+// body の data-live-types に含まれる種類の変更があれば、再読み込みを促すお知らせを表示する。
+(function() {
+    const url = document.body.dataset.liveUrl;
+    if (!url || !window.EventSource) {
+        return;
+    }
+
+    const types = (document.body.dataset.liveTypes || '').split(' ').filter(Boolean);
+    const LABELS = {photo: '写真', album: 'アルバム', event: 'イベント'};
+    const ACTIONS = {created: '追加', updated: '更新', deleted: '削除'};
+    let notice = null;
+
+    function showNotice(text) {
+        if (!notice) {
+            notice = document.createElement('div');
+            notice.className = 'live-notice';
+            notice.setAttribute('role', 'status');
+
+            const message = document.createElement('span');
+            const reload = document.createElement('button');
+            reload.type = 'button';
+            reload.className = 'live-notice-reload';
+            reload.textContent = '再読み込み';
+            reload.addEventListener('click', () => location.reload());
+
+            const close = document.createElement('button');
+            close.type = 'button';
+            close.className = 'live-notice-close';
+            close.setAttribute('aria-label', '閉じる');
+            close.textContent = '×';
+            close.addEventListener('click', function() {
+                notice.remove();
+                notice = null;
+            });
+
+            notice.append(message, reload, close);
+            document.body.appendChild(notice);
+        }
+        notice.querySelector('span').textContent = text;
+    }
+
+    // ライブ更新が無効な場合はサーバーが204を返し、再接続しない
+    const source = new EventSource(url);
+
+    source.addEventListener('change', function(e) {
+        const change = JSON.parse(e.data);
+        document.dispatchEvent(new CustomEvent('family:change', {detail: change}));
+
+        if (types.includes(change.type)) {
+            const title = change.title ? `「${change.title}」` : '';
+            showNotice(`${LABELS[change.type]}${title}が${ACTIONS[change.action]}されました`);
+        }
+    });
+
+    // 通知を取りこぼした場合
+    source.addEventListener('reset', function() {
+        source.close();
+        if (types.length) {
+            showNotice('新しい変更があります');
+        }
+    });
+})();
@@ -0,0 +1,75 @@
+// お気に入り切り替え機能
+document.addEventListener('DOMContentLoaded', function() {
+    const favoriteBtn = document.querySelector('.btn-favorite');
+
+    if (favoriteBtn) {
+        favoriteBtn.addEventListener('click', function() {
+            const photoId = this.dataset.photoId;
+
+            fetch(`/ajax/toggle-favorite/${photoId}/`, {
+                method: 'POST',
+                headers: {
+                    'X-CSRFToken': document.querySelector('[name=csrfmiddlewaretoken]').value,
+                    'Content-Type': 'application/json',
+                },
+            })
+            .then(response => response.json())
+            .then(data => {
+                if (data.success) {
+                    // ボタンの表示を更新
+                    this.innerHTML = (data.is_favorite ? '❤️' : '🤍') +
+                        ' お気に入り <span class="favorite-count">' + data.favorite_count + '</span>';
+                    this.classList.toggle('active', data.is_favorite);
+
+                    // 通知表示
+                    showNotification(data.message, 'success');
+                } else {
+                    showNotification('エラーが発生しました: ' + data.message, 'error');
+                }
+            })
+            .catch(error => {
+                console.error('Error:', error);
+                showNotification('エラーが発生しました。', 'error');
+            });
+        });
+    }
+});
+
+// 通知表示関数
+function showNotification(message, type = 'success') {
+    const notification = document.createElement('div');
+    notification.textContent = message;
+    notification.style.cssText = `
+        position: fixed;
+        top: 20px;
+        right: 20px;
+        background: ${type === 'success' ? '#27ae60' : '#e74c3c'};
+        color: white;
+        padding: 15px 25px;
+        border-radius: 10px;
+        z-index: 1000;
+        animation: slideIn 0.3s ease;
+        font-weight: 500;
+        box-shadow: 0 4px 15px rgba(0,0,0,0.2);
+    `;
+    document.body.appendChild(notification);
+
+    setTimeout(() => {
+        notification.style.animation = 'slideOut 0.3s ease';
+        setTimeout(() => notification.remove(), 300);
+    }, 3000);
+}
+
+// アニメーション用CSS
+const style = document.createElement('style');
+style.textContent = `
+    @keyframes slideIn {
+        from { transform: translateX(100%); opacity: 0; }
+        to { transform: translateX(0); opacity: 1; }
+    }
+    @keyframes slideOut {
+        from { transform: translateX(0); opacity: 1; }
+        to { transform: translateX(100%); opacity: 0; }
+    }
+`;
+document.head.appendChild(style);
@@ -0,0 +1,60 @@
+// お気に入り切り替え機能
+// 無限スクロールで追加された写真のボタンにも効くよう、document で click を受け取る
+document.addEventListener('click', function(event) {
+    const button = event.target.closest('.favorite-btn');
+    if (!button) {
+        return;
+    }
+    const photoId = button.dataset.photoId;
+
+    fetch(`/ajax/toggle-favorite/${photoId}/`, {
+        method: 'POST',
+        headers: {
+            'X-CSRFToken': document.querySelector('[name=csrfmiddlewaretoken]').value,
+            'Content-Type': 'application/json',
+        },
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            button.innerHTML = data.is_favorite ? '❤️' : '🤍';
+            button.classList.toggle('active', data.is_favorite);
+
+            // 簡単な通知表示
+            const notification = document.createElement('div');
+            notification.textContent = data.message;
+            notification.style.cssText = `
+                position: fixed;
+                top: 20px;
+                right: 20px;
+                background: #27ae60;
+                color: white;
+                padding: 10px 20px;
+                border-radius: 5px;
+                z-index: 1000;
+                animation: slideIn 0.3s ease;
+            `;
+            document.body.appendChild(notification);
+
+            setTimeout(() => {
+                notification.remove();
+            }, 3000);
+        } else {
+            alert('エラーが発生しました: ' + data.message);
+        }
+    })
+    .catch(error => {
+        console.error('Error:', error);
+        alert('エラーが発生しました。');
+    });
+});
+
+// CSS for notification animation
+const style = document.createElement('style');
+style.textContent = `
+    @keyframes slideIn {
+        from { transform: translateX(100%); }
+        to { transform: translateX(0); }
+    }
+`;
+document.head.appendChild(style);
@@ -0,0 +1,177 @@
+// 仮想スクロールのグリッド（写真の多いアルバム用）
+// .virtual-grid の data-manifest-url から全ての写真の [ID, 縦横比, サムネイル, タイトル] を1回で読み込み、
+// 縦横比を保ったまま幅いっぱいに並べた行の位置を先に計算する。DOMには画面の近くの行だけを置き、
+// スクロールに合わせて入れ替えるため、写真が何千枚あっても要素の数とメモリは一定に保たれる。
+// 読み込めなかった場合は、data-replace のグリッドとページネーションをそのまま使う。
+(function() {
+    if (!window.fetch) {
+        return;
+    }
+
+    const ROW_HEIGHT = 180;  // 行の高さの目安（px）
+    const GAP = 8;  // .virtual-grid-row の gap と同じ値
+    const OVERSCAN = 1;  // 画面の上下に余分に描画する範囲（画面の高さの倍数）
+    const DEFAULT_RATIO = 4 / 3;  // サイズが分からない写真の縦横比
+
+    // 写真を行に分け、各行の位置と高さを計算する
+    function layout(photos, width) {
+        const rows = [];
+        let start = 0;
+        let top = 0;
+        while (start < photos.length) {
+            let end = start;
+            let ratios = 0;
+            while (end < photos.length) {
+                ratios += photos[end].ratio;
+                end += 1;
+                if (ratios * ROW_HEIGHT + GAP * (end - start - 1) >= width) {
+                    break;
+                }
+            }
+            const gaps = GAP * (end - start - 1);
+            // 最後の行が埋まらない場合は、目安の高さのまま左に寄せる
+            const height = ratios * ROW_HEIGHT + gaps >= width ? (width - gaps) / ratios : ROW_HEIGHT;
+            rows.push({start: start, end: end, top: top, height: height});
+            top += height + GAP;
+            start = end;
+        }
+        return {rows: rows, height: Math.max(top - GAP, 0)};
+    }
+
+    // 範囲の上端より下にある最初の行（二分探索）
+    function firstVisibleRow(rows, top) {
+        let low = 0;
+        let high = rows.length;
+        while (low < high) {
+            const middle = (low + high) >> 1;
+            if (rows[middle].top + rows[middle].height < top) {
+                low = middle + 1;
+            } else {
+                high = middle;
+            }
+        }
+        return low;
+    }
+
+    function setup(container, manifest) {
+        const photos = manifest.photos.map(([id, ratio, path, title]) => ({
+            ratio: ratio || DEFAULT_RATIO,
+            src: encodeURI(manifest.media_url + path),
+            title: title,
+            url: manifest.photo_url.replace('{id}', id),
+        }));
+
+        const inner = document.createElement('div');
+        inner.className = 'virtual-grid-inner';
+        container.appendChild(inner);
+
+        const replaced = document.querySelector(container.dataset.replace);
+        const pagination = container.parentElement.querySelector('.pagination-nav');
+        if (replaced) {
+            replaced.hidden = true;
+        }
+        if (pagination) {
+            pagination.hidden = true;
+        }
+        container.hidden = false;
+
+        let width = 0;
+        let current = {rows: [], height: 0};
+        let rendered = new Map();  // 行の番号 -> 要素
+        let scheduled = false;
+
+        function renderRow(row) {
+            const element = document.createElement('div');
+            element.className = 'virtual-grid-row';
+            element.style.top = `${row.top}px`;
+            element.style.height = `${row.height}px`;
+            for (let index = row.start; index < row.end; index++) {
+                const photo = photos[index];
+                const link = document.createElement('a');
+                link.className = 'virtual-grid-item';
+                link.href = photo.url;
+                link.style.width = `${photo.ratio * row.height}px`;
+                const image = document.createElement('img');
+                image.src = photo.src;
+                image.alt = photo.title;
+                image.decoding = 'async';
+                link.appendChild(image);
+                element.appendChild(link);
+            }
+            return element;
+        }
+
+        function update() {
+            scheduled = false;
+            const offset = -inner.getBoundingClientRect().top;
+            const viewport = window.innerHeight;
+            const rows = current.rows;
+            const first = firstVisibleRow(rows, offset - viewport * OVERSCAN);
+            let last = first;
+            while (last < rows.length && rows[last].top <= offset + viewport * (1 + OVERSCAN)) {
+                last += 1;
+            }
+
+            rendered.forEach((element, index) => {
+                if (index < first || index >= last) {
+                    element.remove();
+                    rendered.delete(index);
+                }
+            });
+            for (let index = first; index < last; index++) {
+                if (!rendered.has(index)) {
+                    const element = renderRow(rows[index]);
+                    inner.appendChild(element);
+                    rendered.set(index, element);
+                }
+            }
+        }
+
+        function schedule() {
+            if (!scheduled) {
+                scheduled = true;
+                window.requestAnimationFrame(update);
+            }
+        }
+
+        function relayout() {
+            const newWidth = inner.clientWidth;
+            if (newWidth === width) {
+                return;
+            }
+            width = newWidth;
+            current = layout(photos, width);
+            inner.style.height = `${current.height}px`;
+            rendered.forEach(element => element.remove());
+            rendered = new Map();
+            update();
+        }
+
+        relayout();
+        window.addEventListener('scroll', schedule, {passive: true});
+        window.addEventListener('resize', () => {
+            relayout();
+            schedule();
+        });
+    }
+
+    function init() {
+        document.querySelectorAll('.virtual-grid[data-manifest-url]').forEach(container => {
+            fetch(container.dataset.manifestUrl, {credentials: 'same-origin'})
+                .then(response => {
+                    if (!response.ok) {
+                        throw new Error(`HTTP ${response.status}`);
+                    }
+                    return response.json();
+                })
+                .then(manifest => setup(container, manifest))
+                .catch(error => console.error('写真の一覧を読み込めませんでした:', error));
+        });
+    }
+
+    if (document.readyState === 'loading') {
+        document.addEventListener('DOMContentLoaded', init);
+    } else {
+        init();
+    }
+})();